@@ -1,3 +1,5 @@
+import time
+STARTUP_STARTED_AT = time.perf_counter() # Taken before the imports below, for the startup timing report
 import sys
 import os
 import json
@@ -5,13 +7,18 @@ from PyQt5.QtWidgets import QApplication
 from PyQt5.QtCore import QSettings
 
 from ui.main_window import MainWindow # MainWindow now takes version and developer
-from core.translation import load_translations
-from core.constants import DEFAULT_MODEL, SETTINGS_FILE_NAME, LANGS_DIR_NAME, ASSETS_DIR_NAME
+from core.batch_runner import OPERATIONS as BATCH_OPERATIONS
+from core.startup_timing import StartupTimer, FirstPaintWatcher
+from core.constants import (DEFAULT_MODEL, SETTINGS_FILE_NAME, LANGS_DIR_NAME, ASSETS_DIR_NAME,
+                            DEFAULT_MAX_CONCURRENT_REQUESTS, STARTUP_TIMING_ENV_VAR, STARTUP_TIMING_FLAG,
+                            STARTUP_CHECK_FLAG, DEFAULT_STARTUP_BUDGET_MS, FAKE_BACKEND_ENV_VAR,
+                            PROJECT_ROOT_ENV_VAR)
 
 APP_VERSION_CONST = "1.0"
 APP_DEVELOPER_CONST = "Mohammed Alhaji"
 
 PROJECT_ROOT = os.path.dirname(os.path.abspath(__file__))
+DATA_ROOT = os.environ.get(PROJECT_ROOT_ENV_VAR) or PROJECT_ROOT # Settings, docs, logs and caches (tests use a temp folder)
 
 LANGS_DIR_APP = os.path.join(PROJECT_ROOT, ASSETS_DIR_NAME, LANGS_DIR_NAME)
 
@@ -38,17 +45,49 @@ def create_default_lang_files_if_missing():
             except IOError as e:
                 print(f"Could not create default language file {lang_file_path}: {e}")
 
+def parse_startup_flags(argv):
+    # Removes the startup timing flags from argv. Returns (timing enabled, budget in ms or None, remaining argv).
+    timing_enabled = os.environ.get(STARTUP_TIMING_ENV_VAR, "") not in ("", "0")
+    budget_ms = None
+    remaining_argv = []
+    for arg in argv:
+        if arg == STARTUP_TIMING_FLAG:
+            timing_enabled = True
+        elif arg == STARTUP_CHECK_FLAG or arg.startswith(STARTUP_CHECK_FLAG + "="):
+            timing_enabled = True
+            budget_ms = float(arg.partition("=")[2] or DEFAULT_STARTUP_BUDGET_MS)
+        else:
+            remaining_argv.append(arg)
+    return timing_enabled, budget_ms, remaining_argv
+
+def use_fake_backend_if_requested():
+    # Serves every request from core.fake_backend when the environment asks for it (offline demos, CI).
+    spec = os.environ.get(FAKE_BACKEND_ENV_VAR, "")
+    if spec in ("", "0"):
+        return
+    from core.client_pool import model_pool
+    from core.fake_backend import FakeGeminiBackend
+    model_pool.set_backend(FakeGeminiBackend.from_spec("" if spec == "1" else spec))
+    print(f"Using the local fake Gemini backend ({FAKE_BACKEND_ENV_VAR}={spec}).", file=sys.stderr)
+
 def main():
 
-    app = QApplication(sys.argv)
+    use_fake_backend_if_requested()
+    if len(sys.argv) > 1 and sys.argv[1] in BATCH_OPERATIONS: # Headless batch mode: no QApplication, no widgets
+        from core.batch_cli import main as batch_main
+        sys.exit(batch_main(sys.argv[1:], DATA_ROOT))
+
+    timing_enabled, startup_budget_ms, qt_argv = parse_startup_flags(sys.argv)
+    startup_timer = StartupTimer(STARTUP_STARTED_AT) if timing_enabled else None
+    if startup_timer: startup_timer.mark("imports")
+
+    app = QApplication(qt_argv)
     app.setStyle("Fusion")
+    if startup_timer: startup_timer.mark("QApplication")
 
-    os.makedirs(os.path.join(PROJECT_ROOT, "docs"), exist_ok=True)
-    os.makedirs(os.path.join(PROJECT_ROOT, "logs"), exist_ok=True)
-    os.makedirs(os.path.join(PROJECT_ROOT, ASSETS_DIR_NAME), exist_ok=True) # Ensure assets dir
-    create_default_lang_files_if_missing()
+    create_default_lang_files_if_missing() # The docs, logs and assets folders are created by MainWindow
 
-    settings_file_path_app = os.path.join(PROJECT_ROOT, SETTINGS_FILE_NAME)
+    settings_file_path_app = os.path.join(DATA_ROOT, SETTINGS_FILE_NAME)
     settings = QSettings(settings_file_path_app, QSettings.IniFormat)
 
     if not settings.contains("language"):
@@ -57,15 +96,34 @@ def main():
         settings.setValue("api_key", "")
     if not settings.contains("gemini_model"):
         settings.setValue("gemini_model", DEFAULT_MODEL) # From core.constants
+    if not settings.contains("stream_responses"):
+        settings.setValue("stream_responses", True)
+    if not settings.contains("response_cache_enabled"):
+        settings.setValue("response_cache_enabled", True)
+    if not settings.contains("max_concurrent_requests"):
+        settings.setValue("max_concurrent_requests", DEFAULT_MAX_CONCURRENT_REQUESTS)
 
-    initial_lang = settings.value("language", "en")
-    load_translations(initial_lang)
+    # Translations are loaded by MainWindow from the same setting
 
     main_window = MainWindow(
         app_version_str=APP_VERSION_CONST,
-        developer_name_str=APP_DEVELOPER_CONST
+        developer_name_str=APP_DEVELOPER_CONST,
+        project_root=DATA_ROOT
     )
+    if startup_timer: startup_timer.mark("main window built")
     main_window.show()
+
+    if startup_timer:
+        def on_first_paint():
+            startup_timer.mark("first paint")
+            startup_timer.report()
+            if startup_budget_ms is not None: # Check mode: report against the budget and exit
+                elapsed_ms = startup_timer.elapsed_ms()
+                over_budget = elapsed_ms > startup_budget_ms
+                print(f"Cold start {elapsed_ms:.0f} ms, budget {startup_budget_ms:.0f} ms: "
+                      f"{'OVER BUDGET' if over_budget else 'OK'}", file=sys.stderr)
+                app.exit(1 if over_budget else 0)
+        FirstPaintWatcher(main_window, on_first_paint)
     sys.exit(app.exec_())
 
 if __name__ == '__main__':
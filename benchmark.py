@@ -0,0 +1,285 @@
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import tempfile
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Headless by default, also on CI machines
+from PyQt5.QtWidgets import QApplication, QTextEdit
+from PyQt5.QtCore import QTimer
+
+from core.client_pool import model_pool
+from core.fake_backend import FakeGeminiBackend
+from core.rate_limiter import set_rate_limit_overrides
+from core.hedging import set_hedging_options
+from core.context_cache import context_cache
+from core.tracing import percentile
+from core.prompts import build_debug_prompt
+from core.constants import DEFAULT_MODEL, AVAILABLE_MODELS, DEFAULT_HEDGE_PERCENTILE
+
+APP_VERSION = "benchmark"
+STAGES = ("prompt_build", "queue_wait", "first_chunk", "generate", "render", "log_write", "end_to_end")
+UNTHROTTLED_RPM, UNTHROTTLED_TPM = 1000000, 10 ** 12 # The benchmark measures the pipeline, not the quota
+
+def sample_code(number, lines):
+
+    body = "\n".join(f"    total += values[{i}] * {number + i}  # step {i}" for i in range(lines))
+    return f"def compute_{number}(values):\n    total = 0\n{body}\n    return total / len(values)\n"
+
+def sample_docs(tokens):
+    # About tokens worth of project docs, sent with every request like the docs folder's content.
+    lines, line_number = [], 0
+    while len(lines) * 16 < tokens: # Lines of about 64 characters, 16 tokens at 4 characters per token
+        line_number += 1
+        lines.append(f"Rule {line_number}: functions named compute_* must return a float value. ")
+    return "\n".join(lines)
+
+def build_arg_parser():
+
+    parser = argparse.ArgumentParser(
+        description="Runs the request pipeline (prompt build, GeminiWorker, render, log write) headlessly "
+                    "against the local fake backend and reports p50/p95 latency per stage and throughput."
+    )
+    parser.add_argument("-n", "--requests", type=int, default=40)
+    parser.add_argument("-j", "--concurrency", type=int, default=4, help="Requests in flight at once.")
+    parser.add_argument("--model", default=DEFAULT_MODEL)
+    parser.add_argument("--input-lines", type=int, default=200, help="Lines of generated code per prompt.")
+    parser.add_argument("--latency-ms", type=float, default=300.0, help="Fake time to first chunk.")
+    parser.add_argument("--chunks", type=int, default=8, help="Fake streamed chunks per response.")
+    parser.add_argument("--chunk-interval-ms", type=float, default=25.0)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Share of requests failing with a 500.")
+    parser.add_argument("--rate-limit-rate", type=float, default=0.0,
+                        help="Share of requests failing with ResourceExhausted (retried by the worker).")
+    parser.add_argument("--retry-after", type=float, default=1.0, help="Retry hint of rate-limit faults, seconds.")
+    parser.add_argument("--tail-rate", type=float, default=0.0, help="Share of slow requests.")
+    parser.add_argument("--tail-latency-ms", type=float, default=5000.0, help="Fake time to first chunk when slow.")
+    parser.add_argument("--hedge", metavar="BACKUP_MODEL", choices=AVAILABLE_MODELS, default=None,
+                        help="Hedge slow requests with this model.")
+    parser.add_argument("--hedge-percentile", type=int, default=DEFAULT_HEDGE_PERCENTILE)
+    parser.add_argument("--docs-tokens", type=int, default=0, help="Send about this many tokens of docs context.")
+    parser.add_argument("--prefill-ms-per-1k", type=float, default=0.0,
+                        help="Fake time to first chunk added per 1000 uncached prompt tokens.")
+    parser.add_argument("--no-context-cache", action="store_true", help="Always send the docs context inline.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--no-stream", action="store_true")
+    parser.add_argument("--async-engine", action="store_true", help="Run the requests on the asyncio engine.")
+    parser.add_argument("--keep-rate-limits", action="store_true", help="Apply the model's real RPM/TPM limits.")
+    parser.add_argument("--timeout", type=float, default=300.0, help="Seconds before the run is abandoned.")
+    parser.add_argument("--json", metavar="PATH", help="Also write the report as JSON ('-' for stdout).")
+    parser.add_argument("--max-p95-ms", type=float, default=0,
+                        help="Exit with status 1 if the end-to-end p95 exceeds this (for CI).")
+    return parser
+
+class PipelineBenchmark:
+    # Drives MainWindow.start_gemini_task and times each stage by wrapping the window's pipeline callbacks.
+
+    def __init__(self, app, window, args):
+        self.app = app
+        self.window = window
+        self.args = args
+        self.records = {} # result display -> per-request timestamps and durations
+        self.retries = 0
+        self._logging_record = None
+        self._started_at = None
+        self._completed = 0
+
+        self._on_gemini_started = window._on_gemini_started
+        self._on_gemini_chunk = window._on_gemini_chunk
+        self._on_gemini_finished = window._on_gemini_finished
+        self._on_gemini_error = window._on_gemini_error
+        self._log_interaction = window._log_interaction
+        window._on_gemini_started = self._timed_started
+        window._on_gemini_chunk = self._timed_chunk
+        window._on_gemini_finished = self._timed_finished
+        window._on_gemini_error = self._timed_error
+        window._log_interaction = self._timed_log
+        window.job_scheduler.job_retrying.connect(self._count_retry)
+
+    def run(self):
+
+        self._started_at = time.perf_counter()
+        for number in range(self.args.requests):
+            self._submit(number)
+        QTimer.singleShot(int(self.args.timeout * 1000), self.app.quit)
+        if self._completed < self.args.requests:
+            self.app.exec_()
+        return time.perf_counter() - self._started_at
+
+    def _submit(self, number):
+
+        display = QTextEdit() # One result display per request, so requests run side by side
+        record = {"submitted": time.perf_counter(), "first_chunk": None, "error": None}
+        self.records[display] = record
+        prompt_text = build_debug_prompt(sample_code(number, self.args.input_lines))
+        self.window.start_gemini_task(prompt_text, display, "benchmark")
+        record["prompt_build"] = time.perf_counter() - record["submitted"]
+
+    def _timed_started(self, display, job_state):
+
+        self.records[display]["started"] = time.perf_counter()
+        self._on_gemini_started(display, job_state)
+
+    def _timed_chunk(self, chunk_text, display, job_state):
+
+        record = self.records[display]
+        if record["first_chunk"] is None:
+            record["first_chunk"] = time.perf_counter()
+        self._on_gemini_chunk(chunk_text, display, job_state)
+
+    def _timed_finished(self, result_markdown, display, *args, **kwargs):
+
+        record = self.records[display]
+        record["finished"] = time.perf_counter()
+        self._logging_record = record
+        self._on_gemini_finished(result_markdown, display, *args, **kwargs)
+        self._logging_record = None
+        record["render"] = time.perf_counter() - record["finished"] - record.get("log_write", 0)
+        self._complete(record)
+
+    def _timed_error(self, error_msg, display, *args, **kwargs):
+
+        record = self.records[display]
+        record["error"] = error_msg
+        self._on_gemini_error(error_msg, display, *args, **kwargs)
+        self._complete(record)
+
+    def _timed_log(self, *args, **kwargs):
+
+        logged_at = time.perf_counter()
+        self._log_interaction(*args, **kwargs)
+        if self._logging_record is not None:
+            self._logging_record["log_write"] = time.perf_counter() - logged_at
+
+    def _count_retry(self, *_):
+
+        self.retries += 1
+
+    def _complete(self, record):
+
+        record["done"] = time.perf_counter()
+        self._completed += 1
+        if self._completed == self.args.requests:
+            self.app.quit()
+
+    def stage_durations(self):
+        # Seconds per stage over the successful requests.
+        durations = {stage: [] for stage in STAGES}
+        for record in self.records.values():
+            if record["error"] or "done" not in record:
+                continue
+            durations["prompt_build"].append(record["prompt_build"])
+            durations["queue_wait"].append(record["started"] - record["submitted"] - record["prompt_build"])
+            if record["first_chunk"] is not None:
+                durations["first_chunk"].append(record["first_chunk"] - record["started"])
+            durations["generate"].append(record["finished"] - record["started"])
+            durations["render"].append(record["render"])
+            durations["log_write"].append(record.get("log_write", 0))
+            durations["end_to_end"].append(record["done"] - record["submitted"])
+        return durations
+
+    def report(self, wall_seconds):
+
+        succeeded = sum(1 for record in self.records.values() if "done" in record and not record["error"])
+        traces = self.window.tracer.recent()
+        hedged = [trace.attributes for trace in traces if "hedged_to" in trace.attributes]
+        failed = sum(1 for record in self.records.values() if record["error"])
+        stages = {}
+        for stage, values in self.stage_durations().items():
+            if values:
+                stages[stage] = {
+                    "count": len(values),
+                    "p50_ms": round(percentile(values, 50) * 1000, 2),
+                    "p95_ms": round(percentile(values, 95) * 1000, 2),
+                    "max_ms": round(max(values) * 1000, 2),
+                }
+        return {
+            "requests": self.args.requests, "succeeded": succeeded, "failed": failed,
+            "timed_out": self.args.requests - succeeded - failed, "retries": self.retries,
+            "hedged": len(hedged),
+            "hedges_won": sum(1 for attributes in hedged if attributes.get("answered_by") == attributes["hedged_to"]),
+            "context_cached": sum(1 for trace in traces if trace.attributes.get("context_cached")),
+            "wall_seconds": round(wall_seconds, 3),
+            "throughput_rps": round(succeeded / wall_seconds, 3) if wall_seconds else 0.0,
+            "stages": stages,
+            "config": {name: value for name, value in vars(self.args).items() if name != "json"},
+        }
+
+def print_report(report, stream):
+
+    print(f"{report['succeeded']}/{report['requests']} succeeded, {report['failed']} failed, "
+          f"{report['timed_out']} timed out, {report['retries']} retries in {report['wall_seconds']:.2f} s "
+          f"({report['throughput_rps']:.2f} requests/s)", file=stream)
+    if report["hedged"]:
+        print(f"{report['hedged']} requests hedged, {report['hedges_won']} answered by the backup model", file=stream)
+    if report["context_cached"]:
+        print(f"{report['context_cached']} requests used the cached docs context", file=stream)
+    print(f"{'stage':<14}{'count':>7}{'p50 ms':>11}{'p95 ms':>11}{'max ms':>11}", file=stream)
+    for stage in STAGES:
+        values = report["stages"].get(stage)
+        if values:
+            print(f"{stage:<14}{values['count']:>7}{values['p50_ms']:>11.1f}{values['p95_ms']:>11.1f}"
+                  f"{values['max_ms']:>11.1f}", file=stream)
+
+def main(argv=None):
+
+    args = build_arg_parser().parse_args(argv)
+    app = QApplication(sys.argv[:1])
+    model_pool.set_backend(FakeGeminiBackend(
+        latency_ms=args.latency_ms, chunks=args.chunks, chunk_interval_ms=args.chunk_interval_ms,
+        error_rate=args.error_rate, rate_limit_rate=args.rate_limit_rate,
+        retry_after_seconds=args.retry_after, seed=args.seed, tail_rate=args.tail_rate,
+        tail_latency_ms=args.tail_latency_ms, prefill_ms_per_1k_tokens=args.prefill_ms_per_1k
+    ))
+
+    from ui.main_window import MainWindow
+    project_root = tempfile.mkdtemp(prefix="devmate-benchmark-") # Keeps the user's logs and caches untouched
+    window = MainWindow(APP_VERSION, APP_VERSION, project_root=project_root)
+    window.api_key = "benchmark"
+    window.current_model_name = args.model
+    window.stream_responses = not args.no_stream
+    window.async_engine_enabled = args.async_engine
+    window.response_cache_enabled = False # Every request must reach the backend
+    window.job_scheduler.set_max_in_flight(args.concurrency)
+    if not args.keep_rate_limits: # After MainWindow, which applies the (empty) settings' overrides
+        set_rate_limit_overrides(UNTHROTTLED_RPM, UNTHROTTLED_TPM)
+    set_hedging_options(bool(args.hedge), args.hedge, args.hedge_percentile)
+    context_cache.configure(not args.no_context_cache)
+    if args.docs_tokens:
+        window.docs_content_cache = sample_docs(args.docs_tokens)
+
+    benchmark = PipelineBenchmark(app, window, args)
+    try:
+        wall_seconds = benchmark.run()
+    finally:
+        window.job_scheduler.shutdown(2000)
+        if window.async_engine is not None:
+            window.async_engine.shutdown()
+        window.docs_loader.stop(2000)
+        for tab in window.feature_tabs.values():
+            tab.stop_attach_loaders(2000)
+        # Same order as MainWindow.closeEvent; the log and the interaction store hold files in project_root
+        window.log_writer.close(2.0)
+        window.interaction_writer.close(2.0)
+        window.tracer.close(2.0)
+        context_cache.close()
+        window.interaction_store.close()
+        shutil.rmtree(project_root, ignore_errors=True)
+
+    report = benchmark.report(wall_seconds)
+    print_report(report, sys.stdout if args.json != "-" else sys.stderr)
+    if args.json:
+        if args.json == "-":
+            print(json.dumps(report, indent=2))
+        else:
+            with open(args.json, 'w', encoding='utf-8') as f:
+                json.dump(report, f, indent=2)
+
+    end_to_end = report["stages"].get("end_to_end")
+    if args.max_p95_ms and (not end_to_end or end_to_end["p95_ms"] > args.max_p95_ms):
+        print(f"End-to-end p95 is over the budget of {args.max_p95_ms:.0f} ms.", file=sys.stderr)
+        return 1
+    return 0
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,382 @@
+import time
+import asyncio
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+from .translation import tr
+from .markdown_render import render_markdown
+from .client_pool import model_pool
+from .context_cache import context_cache
+from .rate_limiter import get_rate_limiter, retry_hint_seconds, backoff_delay
+from .token_counter import estimate_tokens, input_token_limit
+from .tracing import span
+from .hedging import latency_history, hedge_backup_model, hedge_delay_seconds
+from .gemini_worker import (RequestTimeout, resolve_model_name, request_timeout_seconds, build_full_prompt,
+                            build_task_prompt, api_error_message, hedge_model)
+from .constants import RATE_LIMIT_MAX_RETRIES, DEFAULT_ASYNC_MAX_CONCURRENCY
+
+class AsyncGeminiEngine:
+    # Runs requests as coroutines on one asyncio loop in a background thread, through the SDK's async
+    # generate path, so many requests share a thread instead of taking one each. At most max_concurrency
+    # requests are on the wire at once; the rest wait for a slot. generate() is awaited on the engine's
+    # loop; other threads use submit() (returns a concurrent.futures.Future) or run() (blocks).
+
+    def __init__(self, max_concurrency=DEFAULT_ASYNC_MAX_CONCURRENCY):
+        self.max_concurrency = max(1, int(max_concurrency))
+        self._loop = None
+        self._thread = None
+        self._lock = threading.Lock()
+        self._active = 0 # Slots in use; only touched on the loop
+        self._slot_waiters = []
+
+    @property
+    def loop(self):
+
+        self.start()
+        return self._loop
+
+    def start(self):
+        # Starts the loop thread; submit() and run() do this on first use.
+        with self._lock:
+            if self._thread is not None:
+                return
+            ready = threading.Event()
+            self._thread = threading.Thread(target=self._run_loop, args=(ready,), daemon=True, name="gemini-async")
+            self._thread.start()
+        ready.wait()
+
+    def _run_loop(self, ready):
+
+        loop = asyncio.new_event_loop()
+        asyncio.set_event_loop(loop)
+        self._loop = loop
+        ready.set()
+        try:
+            loop.run_forever()
+            pending = asyncio.all_tasks(loop)
+            for task in pending:
+                task.cancel()
+            loop.run_until_complete(asyncio.gather(*pending, return_exceptions=True))
+        finally:
+            loop.close()
+
+    def submit(self, coroutine):
+        # Schedules a coroutine on the engine's loop from any thread; cancel() the returned future to abort it.
+        return asyncio.run_coroutine_threadsafe(coroutine, self.loop)
+
+    def run(self, coroutine, timeout_seconds=None):
+        # Runs a coroutine on the engine's loop and blocks the calling thread until it returns.
+        return self.submit(coroutine).result(timeout_seconds)
+
+    def set_max_concurrency(self, max_concurrency):
+
+        self.max_concurrency = max(1, int(max_concurrency))
+        if self._loop is not None:
+            self._loop.call_soon_threadsafe(self._wake_slot_waiters)
+
+    def shutdown(self, timeout_seconds=2.0):
+        # Cancels every request and stops the loop thread. Returns True if it ended within the timeout.
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop, self._thread = None, None
+        if thread is None:
+            return True
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout_seconds)
+        return not thread.is_alive()
+
+    async def generate(self, api_key, model_name, prompt_text, docs_context="", stream=True,
+                       on_chunk=None, on_retry=None, trace=None):
+        # One request; returns {"text", "error", "prompt_tokens", "response_tokens", "model"} like
+        # batch_runner.run_prompt, "model" being the model that answered (the backup after a hedge it won).
+        # on_chunk(text) and on_retry(retry number, delay) are called on the engine's loop.
+        # Cancelling the awaiting task aborts the request, including an open response stream.
+        model_name = resolve_model_name(model_name)
+        outcome = {"text": None, "error": None, "prompt_tokens": None, "response_tokens": None, "model": model_name}
+        if not api_key:
+            outcome["error"] = tr("status_api_key_missing")
+            return outcome
+        with span(trace, "prompt_build"):
+            full_prompt = build_full_prompt(prompt_text, docs_context)
+            estimated_tokens, token_limit = estimate_tokens(full_prompt), input_token_limit(model_name)
+        if estimated_tokens > token_limit: # The API would reject it, but only after a slow upload
+            outcome["error"] = tr("input_over_budget_err", tokens=estimated_tokens, budget=token_limit)
+            return outcome
+
+        await self._acquire_slot()
+        try:
+            try:
+                with span(trace, "model_setup"): # Configuring the SDK can block, so it runs off the loop
+                    model = await asyncio.get_running_loop().run_in_executor(
+                        None, model_pool.get_model, api_key, model_name
+                    )
+            except Exception as e:
+                outcome["error"] = tr("api_request_failed_err", f"API Key config error: {e}")
+                return outcome
+            prompt, inline = full_prompt, None
+            if context_cache.is_eligible(model_name, docs_context):
+                with span(trace, "context_cache"): # The upload blocks, so it runs off the loop as well
+                    cached_model = await asyncio.get_running_loop().run_in_executor(
+                        None, context_cache.model_for, api_key, model_name, docs_context
+                    )
+                if cached_model is not None:
+                    inline = (model, full_prompt)
+                    model, prompt = cached_model, build_task_prompt(prompt_text)
+                    if trace is not None:
+                        trace.set(context_cached=True)
+            timeout_seconds = request_timeout_seconds(model_name)
+
+            def hedge(backup_model_name): # Blocks (quota check, model setup), so it runs off the loop
+                return hedge_model(api_key, backup_model_name, prompt_text, docs_context, full_prompt)
+
+            try:
+                result_text, response, outcome["model"] = await self._generate_with_retries(
+                    model, model_name, prompt, estimated_tokens, stream, timeout_seconds, on_chunk, on_retry, trace,
+                    inline, hedge
+                )
+            except Exception as e:
+                outcome["error"] = tr("api_request_failed_err", api_error_message(e, timeout_seconds))
+                return outcome
+        finally:
+            self._release_slot()
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None:
+            outcome["prompt_tokens"] = getattr(usage, "prompt_token_count", 0) or 0
+            outcome["response_tokens"] = getattr(usage, "candidates_token_count", 0) or 0
+        if result_text:
+            outcome["text"] = result_text
+        else:
+            outcome["error"] = tr("api_request_failed_err", "No content generated by API.")
+        return outcome
+
+    async def _generate_with_retries(self, model, model_name, prompt, estimated_tokens, stream,
+                                     timeout_seconds, on_chunk, on_retry, trace, inline=None, hedge=None):
+        # Same policy as GeminiWorker._generate_with_retries: shared rate limiter, ResourceExhausted retried
+        # with backoff until something has been streamed. prompt goes to model as is; estimated_tokens
+        # covers the full prompt, cached docs included. inline is the (pooled model, full prompt) to switch
+        # to if model's cached docs are gone from the server; hedge(backup model name) gives the
+        # (model, prompt) to hedge with, or None. Returns (result text, response, model name that answered).
+        from google.api_core import exceptions as google_api_core_exceptions
+        limiter = get_rate_limiter(model_name)
+        state = {"chunks_emitted": False}
+        attempt = 0
+        while True:
+            with span(trace, "rate_limit_wait"):
+                await limiter.acquire_async(estimated_tokens)
+            try:
+                result_text, response = await asyncio.wait_for(
+                    self._hedged_attempt(model, model_name, prompt, stream, timeout_seconds, on_chunk, trace, state,
+                                         hedge),
+                    timeout_seconds
+                )
+            except asyncio.TimeoutError:
+                raise RequestTimeout(f"No answer within {timeout_seconds} s")
+            except google_api_core_exceptions.ResourceExhausted as e:
+                if attempt >= RATE_LIMIT_MAX_RETRIES or state["chunks_emitted"]:
+                    raise
+                delay = backoff_delay(attempt, retry_hint_seconds(e))
+                limiter.pause(delay) # The next acquire_async waits it out, with every other request to the model
+                attempt += 1
+                if on_retry:
+                    on_retry(attempt, delay)
+                continue
+            except google_api_core_exceptions.NotFound:
+                if inline is None or state["chunks_emitted"]:
+                    raise
+                context_cache.discard(model)
+                (model, prompt), inline = inline, None
+                continue
+            usage = getattr(response, "usage_metadata", None)
+            prompt_tokens = getattr(usage, "prompt_token_count", 0) if usage is not None else 0
+            if prompt_tokens:
+                limiter.settle(estimated_tokens, prompt_tokens)
+            return result_text, response, state.pop("answered_by", model_name)
+
+    async def _hedged_attempt(self, model, model_name, prompt, stream, timeout_seconds, on_chunk, trace, state,
+                              hedge=None):
+        # Same race as GeminiWorker._hedged_attempt, as tasks on the loop: if the primary model has produced
+        # no output within the hedge delay, the backup model is asked too; the first to produce output
+        # answers and the other task is cancelled. Returns like _attempt; a won hedge is recorded in
+        # state["answered_by"].
+        backup_model_name = hedge_backup_model(model_name) if hedge is not None else None
+        if backup_model_name is None:
+            return await self._attempt(model, model_name, prompt, stream, timeout_seconds, on_chunk, trace, state)
+
+        contenders = {} # task -> model name
+        race = {"winner": None}
+
+        def start(contender_model_name, contender_model, contender_prompt, contender_timeout, span_prefix):
+            def claim():
+                if race["winner"] is None:
+                    race["winner"] = task
+                    for other in contenders:
+                        if other is not task:
+                            other.cancel()
+                return race["winner"] is task
+
+            task = asyncio.ensure_future(self._attempt(
+                contender_model, contender_model_name, contender_prompt, stream, contender_timeout, on_chunk, trace,
+                state, claim, span_prefix
+            ))
+            contenders[task] = contender_model_name
+            return task
+
+        try:
+            primary = start(model_name, model, prompt, timeout_seconds, "")
+            hedge_delay = hedge_delay_seconds(model_name)
+            await asyncio.wait([primary], timeout=hedge_delay)
+            if race["winner"] is None and not primary.done():
+                backup = await asyncio.get_running_loop().run_in_executor(None, hedge, backup_model_name)
+                if backup is not None and race["winner"] is None and not primary.done():
+                    if trace is not None:
+                        trace.set(hedged_to=backup_model_name, hedge_delay_ms=round(hedge_delay * 1000, 2))
+                    start(backup_model_name, *backup, request_timeout_seconds(backup_model_name), "backup_")
+
+            pending, unanswered, first_error = set(contenders), [], None
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for task in done:
+                    if task.cancelled(): # Lost the race
+                        continue
+                    if task is race["winner"]:
+                        result = task.result()
+                        state["answered_by"] = contenders[task]
+                        if trace is not None and len(contenders) > 1:
+                            trace.set(answered_by=contenders[task])
+                        return result
+                    if race["winner"] is None: # Failed (or came back empty) before producing anything
+                        error = task.exception()
+                        first_error = first_error or error
+                        if error is None:
+                            unanswered.append(task.result())
+            if unanswered: # Came back without text, like an unhedged request could
+                return unanswered[0]
+            raise first_error
+        finally:
+            for task in contenders:
+                task.cancel()
+
+    async def _attempt(self, model, model_name, prompt, stream, timeout_seconds, on_chunk, trace, state,
+                       claim=None, span_prefix=""):
+        # One API call. claim(), when given, runs before the first output is passed on; False means another
+        # hedge contender answered first and the text comes back as None.
+        started_at = time.perf_counter()
+
+        def on_first_output():
+            latency_history.record(model_name, time.perf_counter() - started_at)
+            return claim is None or claim()
+
+        with span(trace, span_prefix + "network"):
+            # Generation config and safety settings are bound to the pooled model
+            response = await model.generate_content_async(
+                prompt, stream=stream, request_options={"timeout": timeout_seconds}
+            )
+        with span(trace, span_prefix + ("stream" if stream else "response_read")):
+            if not stream:
+                result_text = response.text
+                return (result_text if on_first_output() else None), response
+            parts = []
+            async for chunk in response:
+                try:
+                    chunk_text = chunk.text
+                except ValueError: # Chunk without text parts (e.g. finish reason only)
+                    chunk_text = ""
+                if chunk_text:
+                    if not parts and not on_first_output():
+                        return None, response
+                    parts.append(chunk_text)
+                    state["chunks_emitted"] = True
+                    if on_chunk:
+                        on_chunk(chunk_text)
+            return "".join(parts), response
+
+    async def _acquire_slot(self):
+
+        while self._active >= self.max_concurrency:
+            waiter = asyncio.get_running_loop().create_future()
+            self._slot_waiters.append(waiter)
+            try:
+                await waiter
+            finally:
+                if waiter in self._slot_waiters:
+                    self._slot_waiters.remove(waiter)
+        self._active += 1
+
+    def _release_slot(self):
+
+        self._active -= 1
+        self._wake_slot_waiters()
+
+    def _wake_slot_waiters(self):
+        # Wakes one waiter per free slot; woken waiters that have not run yet already count as taking one.
+        free_slots = self.max_concurrency - self._active
+        for waiter in self._slot_waiters:
+            if free_slots <= 0:
+                break
+            if not waiter.done():
+                waiter.set_result(None)
+            free_slots -= 1
+
+async_engine = AsyncGeminiEngine()
+
+class AsyncGeminiWorker(QObject):
+    # GeminiWorker counterpart that runs on the AsyncGeminiEngine: run() schedules the request and returns
+    # at once, so the job scheduler gives it no thread of its own. Signals are emitted from the engine's
+    # thread and reach GUI-thread slots queued; done follows finished/error, and also a cancellation.
+
+    runs_on_engine = True
+
+    chunk_received = pyqtSignal(str)
+    usage_reported = pyqtSignal(int, int) # prompt tokens, response tokens
+    retrying = pyqtSignal(int, float) # retry number, delay in seconds
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    done = pyqtSignal()
+
+    def __init__(self, api_key, model_name_from_settings, prompt_text, docs_context="", stream=True, trace=None,
+                 engine=None):
+        super().__init__()
+        self.engine = engine or async_engine
+        self.api_key = api_key
+        self.model_name = resolve_model_name(model_name_from_settings)
+        self.prompt_text = prompt_text
+        self.docs_context = docs_context
+        self.stream = stream
+        self.trace = trace
+        self.answered_by = self.model_name # Model the finished answer came from; the backup after a won hedge
+        self._future = None
+        self._is_running = True
+
+    def run(self):
+
+        if not self._is_running: return
+        self._future = self.engine.submit(self._run())
+        self._future.add_done_callback(lambda _future: self.done.emit())
+
+    def stop(self):
+        # Safe to call from any thread; cancels the request's task, which closes its connection.
+        self._is_running = False
+        if self._future is not None:
+            self._future.cancel()
+
+    async def _run(self):
+
+        outcome = await self.engine.generate(
+            self.api_key, self.model_name, self.prompt_text, self.docs_context, self.stream,
+            on_chunk=self._emit_chunk, on_retry=self.retrying.emit, trace=self.trace
+        )
+        if not self._is_running: return
+        if outcome["text"]:
+            self.answered_by = outcome["model"]
+            if outcome["prompt_tokens"] is not None:
+                self.usage_reported.emit(outcome["prompt_tokens"], outcome["response_tokens"])
+            with span(self.trace, "markdown_render"): # Warm the render cache off the GUI thread
+                await asyncio.get_running_loop().run_in_executor(None, render_markdown, outcome["text"])
+            if self._is_running: self.finished.emit(outcome["text"])
+        else:
+            self.error.emit(outcome["error"])
+
+    def _emit_chunk(self, chunk_text):
+
+        if self._is_running:
+            self.chunk_received.emit(chunk_text)
@@ -0,0 +1,200 @@
+import os
+import sys
+import json
+import argparse
+from PyQt5.QtCore import QSettings
+
+from .batch_runner import BatchRunner, OPERATIONS, collect_input_files, input_extensions
+from .docs_loader import DocsLoader
+from .response_cache import ResponseCache
+from .rate_limiter import set_rate_limit_overrides
+from .hedging import set_hedging_options
+from .client_pool import model_pool
+from .context_cache import context_cache
+from .gemini_worker import resolve_model_name, set_request_timeout_override
+from .token_counter import estimate_tokens
+from .translation import load_translations
+from .constants import (DEFAULT_MODEL, SETTINGS_FILE_NAME, DOCS_DIR_NAME, CACHE_DIR_NAME, RESPONSE_CACHE_DIR_NAME,
+                        DOCS_INDEX_FILE_NAME, DOCS_MANIFEST_FILE_NAME, DEFAULT_MAX_CONCURRENT_REQUESTS,
+                        DEFAULT_DOCS_TOP_K, DEFAULT_DOCS_TOKEN_BUDGET, OVERSIZE_STRATEGIES,
+                        DEFAULT_OVERSIZE_STRATEGY, AVAILABLE_MODELS, DEFAULT_HEDGE_BACKUP_MODEL,
+                        DEFAULT_HEDGE_PERCENTILE, DEFAULT_CONTEXT_CACHE_TTL_MINUTES)
+
+RESULT_FILE_SUFFIX = ".md"
+
+def build_arg_parser():
+
+    parser = argparse.ArgumentParser(
+        prog="app.py",
+        description="Run an AI Dev Helper operation headlessly over files, directories or glob patterns."
+    )
+    parser.add_argument("operation", choices=OPERATIONS)
+    parser.add_argument("targets", nargs="+", help="Files, directories (searched recursively) or glob patterns.")
+    parser.add_argument("-j", "--jobs", type=int, default=None,
+                        help="Concurrent requests (default: max_concurrent_requests from the settings).")
+    parser.add_argument("--model", default=None, help="Gemini model (default: the model chosen in the settings).")
+    parser.add_argument("--api-key", default=None,
+                        help="API key (default: $GEMINI_API_KEY, then the key stored in the settings).")
+    output = parser.add_mutually_exclusive_group()
+    output.add_argument("-o", "--output-dir", default=None,
+                        help="Write one <file>.<operation>.md per input, mirroring the input tree.")
+    output.add_argument("--jsonl", default="-", help="Write one JSON object per input to this file ('-' = stdout).")
+    parser.add_argument("--source-lib", help="convert: library the code uses now.")
+    parser.add_argument("--target-lib", help="convert: library to convert to.")
+    parser.add_argument("--source-lang", help="translate: source language (default: guessed from the extension).")
+    parser.add_argument("--target-lang", help="translate: language to translate to.")
+    parser.add_argument("--libraries", default="", help="generate: required/suggested libraries.")
+    parser.add_argument("--oversize", choices=OVERSIZE_STRATEGIES, default=None,
+                        help="What to do with inputs over the token budget (default: the settings value).")
+    parser.add_argument("--max-input-tokens", type=int, default=None,
+                        help="Input token budget per request (default: the settings value, 0 = model limit).")
+    parser.add_argument("--timeout", type=int, default=None,
+                        help="Seconds before one API attempt is abandoned (default: settings, then per model).")
+    parser.add_argument("--hedge", metavar="BACKUP_MODEL", choices=AVAILABLE_MODELS, default=None,
+                        help="Also send slow requests to this model and keep the first answer (default: settings).")
+    parser.add_argument("--async-engine", action="store_true",
+                        help="Run the requests on the asyncio engine (default: the settings value).")
+    parser.add_argument("--no-docs", action="store_true", help="Do not send project docs as context.")
+    parser.add_argument("--no-cache", action="store_true", help="Do not read or write the response cache.")
+    parser.add_argument("--refresh-cache", action="store_true", help="Ignore cached responses but store new ones.")
+    return parser
+
+def _common_root(paths):
+
+    if len(paths) == 1:
+        return os.path.dirname(paths[0])
+    return os.path.commonpath(paths)
+
+def _result_file_path(result, output_dir, root):
+
+    relative_path = os.path.relpath(result["path"], root)
+    return os.path.join(output_dir, f"{relative_path}.{result['operation']}{RESULT_FILE_SUFFIX}")
+
+def _docs_context_selector(project_root, settings, api_key, model_name):
+    # Same docs context as the GUI: retrieved chunks when retrieval is on, otherwise (or while the docs
+    # are cached on the server for model_name) every doc.
+    # Returns (prompt text -> docs context, tokens to reserve for it), or (None, 0) without docs.
+    cache_dir = os.path.join(project_root, CACHE_DIR_NAME)
+    docs_loader = DocsLoader(
+        os.path.join(project_root, DOCS_DIR_NAME),
+        os.path.join(cache_dir, DOCS_INDEX_FILE_NAME),
+        os.path.join(cache_dir, DOCS_MANIFEST_FILE_NAME),
+        watch=False
+    )
+    docs_loader.refresh_now()
+    if not docs_loader.file_count():
+        return None, 0
+    docs_text = docs_loader.docs_text()
+    if not settings.value("docs_retrieval_enabled", True, type=bool):
+        return (lambda prompt_text: docs_text), estimate_tokens(docs_text)
+    top_k = settings.value("docs_top_k", DEFAULT_DOCS_TOP_K, type=int)
+    token_budget = settings.value("docs_token_budget", DEFAULT_DOCS_TOKEN_BUDGET, type=int)
+
+    def select_docs_context(prompt_text):
+        if context_cache.will_cache(api_key, model_name, docs_text):
+            return docs_text
+        return docs_loader.select_context(prompt_text, top_k, token_budget)
+
+    if context_cache.is_eligible(model_name, docs_text): # The whole docs may go with any prompt
+        return select_docs_context, estimate_tokens(docs_text)
+    return select_docs_context, min(token_budget, estimate_tokens(docs_text))
+
+def main(argv, project_root):
+    # Headless entry point; returns the process exit code (0 = every file succeeded).
+    parser = build_arg_parser()
+    args = parser.parse_args(argv)
+    if args.operation == "convert" and not (args.source_lib and args.target_lib):
+        parser.error("convert requires --source-lib and --target-lib")
+    if args.operation == "translate" and not args.target_lang:
+        parser.error("translate requires --target-lang")
+
+    settings = QSettings(os.path.join(project_root, SETTINGS_FILE_NAME), QSettings.IniFormat)
+    load_translations(settings.value("language", "en"))
+    set_rate_limit_overrides(settings.value("rate_limit_rpm", 0, type=int), settings.value("rate_limit_tpm", 0, type=int))
+    set_request_timeout_override(
+        args.timeout if args.timeout is not None else settings.value("request_timeout_seconds", 0, type=int)
+    )
+    set_hedging_options(
+        bool(args.hedge) or settings.value("hedging_enabled", False, type=bool),
+        args.hedge or settings.value("hedge_backup_model", DEFAULT_HEDGE_BACKUP_MODEL),
+        settings.value("hedge_percentile", DEFAULT_HEDGE_PERCENTILE, type=int)
+    )
+    api_key = args.api_key or os.environ.get("GEMINI_API_KEY") or settings.value("api_key", "")
+    if not api_key:
+        print("No API key: pass --api-key, set GEMINI_API_KEY or save one in the settings.", file=sys.stderr)
+        return 2
+
+    paths = collect_input_files(args.targets, input_extensions(args.operation))
+    if not paths:
+        print("No input files matched.", file=sys.stderr)
+        return 2
+
+    model_name = resolve_model_name(args.model or settings.value("gemini_model", DEFAULT_MODEL))
+    model_pool.warm_up_in_background(api_key, model_name) # Overlaps the handshake with the docs index load
+    context_cache.configure(
+        settings.value("context_cache_enabled", True, type=bool),
+        settings.value("context_cache_ttl_minutes", DEFAULT_CONTEXT_CACHE_TTL_MINUTES, type=int)
+    )
+
+    response_cache = None
+    if not args.no_cache and settings.value("response_cache_enabled", True, type=bool):
+        response_cache = ResponseCache(os.path.join(project_root, CACHE_DIR_NAME, RESPONSE_CACHE_DIR_NAME))
+    select_docs_context, docs_token_reserve = ((None, 0) if args.no_docs
+                                               else _docs_context_selector(project_root, settings, api_key,
+                                                                           model_name))
+    concurrency = args.jobs or settings.value("max_concurrent_requests", DEFAULT_MAX_CONCURRENT_REQUESTS, type=int)
+    engine = None
+    if args.async_engine or settings.value("async_engine_enabled", False, type=bool):
+        from .async_engine import async_engine as engine
+        engine.set_max_concurrency(concurrency)
+    runner = BatchRunner(
+        api_key,
+        model_name,
+        args.operation,
+        options={"source_lib": args.source_lib, "target_lib": args.target_lib, "source_lang": args.source_lang,
+                 "target_lang": args.target_lang, "libraries": args.libraries},
+        concurrency=concurrency,
+        select_docs_context=select_docs_context,
+        response_cache=response_cache,
+        bypass_cache=args.refresh_cache,
+        max_input_tokens=(args.max_input_tokens if args.max_input_tokens is not None
+                          else settings.value("max_input_tokens", 0, type=int)),
+        oversize_strategy=args.oversize or settings.value("oversize_strategy", DEFAULT_OVERSIZE_STRATEGY),
+        docs_token_reserve=docs_token_reserve,
+        engine=engine
+    )
+
+    root = _common_root(paths)
+    jsonl_file = None
+    if not args.output_dir:
+        jsonl_file = sys.stdout if args.jsonl == "-" else open(args.jsonl, 'w', encoding='utf-8')
+    completed = {"count": 0, "failed": 0}
+
+    def on_result(result):
+        completed["count"] += 1
+        if result["status"] != "ok":
+            completed["failed"] += 1
+        if jsonl_file is not None:
+            jsonl_file.write(json.dumps(result, ensure_ascii=False) + "\n")
+            jsonl_file.flush()
+        elif result["status"] == "ok":
+            output_path = _result_file_path(result, args.output_dir, root)
+            os.makedirs(os.path.dirname(output_path), exist_ok=True)
+            with open(output_path, 'w', encoding='utf-8') as f:
+                f.write(result["response"])
+        detail = "cached" if result["cached"] else f"{result['latency_ms']} ms"
+        if result["status"] != "ok":
+            detail = result["error"].splitlines()[0] if result["error"] else "error"
+        print(f"[{completed['count']}/{len(paths)}] {result['status']} {os.path.relpath(result['path'], root)} ({detail})",
+              file=sys.stderr)
+
+    try:
+        runner.run(paths, on_result)
+    finally:
+        if engine is not None:
+            engine.shutdown()
+        context_cache.close() # The run's cached docs are of no use to the next one
+        if jsonl_file is not None and jsonl_file is not sys.stdout:
+            jsonl_file.close()
+    print(f"{len(paths) - completed['failed']} succeeded, {completed['failed']} failed.", file=sys.stderr)
+    return 1 if completed["failed"] else 0
@@ -0,0 +1,230 @@
+import os
+import glob
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from .gemini_worker import GeminiWorker, build_full_prompt, resolve_model_name
+from .response_cache import ResponseCache
+from .code_chunker import split_source
+from .targeted_convert import plan_targeted_conversion, apply_targeted_conversion, converted_file_markdown
+from .token_counter import fit_input, input_token_limit, estimate_tokens
+from .prompts import (build_summarize_prompt, build_summarize_chunk_prompt, build_summarize_reduce_prompt,
+                      build_debug_prompt, build_convert_prompt, build_translate_prompt, build_generate_prompt,
+                      guess_language, LANGUAGE_BY_EXTENSION)
+from .constants import (GENERATION_CONFIG, DEFAULT_MAX_CONCURRENT_REQUESTS, SUMMARY_CHUNK_THRESHOLD_CHARS,
+                        SUMMARY_CHUNK_MAX_CHARS, DEFAULT_OVERSIZE_STRATEGY, OVERSIZE_STRATEGY_BLOCK,
+                        OVERSIZE_STRATEGY_CHUNK, SKIPPED_DIR_NAMES)
+
+OPERATIONS = ("summarize", "debug", "convert", "translate", "generate")
+DESCRIPTION_FILE_EXTENSIONS = (".txt", ".md") # Inputs of "generate" are function descriptions
+def input_extensions(operation):
+
+    return DESCRIPTION_FILE_EXTENSIONS if operation == "generate" else tuple(LANGUAGE_BY_EXTENSION)
+
+def collect_input_files(targets, extensions):
+    # Expands files, directories (recursively) and glob patterns into a sorted list of unique paths.
+    # Explicit file arguments are always kept; directory and glob matches are filtered by extension.
+    found = set()
+    for target in targets:
+        if os.path.isfile(target):
+            found.add(os.path.abspath(target))
+            continue
+        if os.path.isdir(target):
+            for root, dirs, files in os.walk(target):
+                dirs[:] = sorted(d for d in dirs if not d.startswith(".") and d not in SKIPPED_DIR_NAMES)
+                found.update(
+                    os.path.abspath(os.path.join(root, filename))
+                    for filename in files if filename.lower().endswith(extensions)
+                )
+            continue
+        for match in glob.glob(target, recursive=True):
+            if os.path.isfile(match) and match.lower().endswith(extensions):
+                found.add(os.path.abspath(match))
+    return sorted(found)
+
+def run_prompt(api_key, model_name, prompt_text, docs_context=""):
+    # Runs one GeminiWorker to completion in the calling thread.
+    # Returns {"text", "error", "prompt_tokens", "response_tokens", "model"}; exactly one of text/error is set,
+    # and "model" is the model that answered (the backup model after a hedge it won).
+    worker = GeminiWorker(api_key, model_name, prompt_text, docs_context, stream=False)
+    outcome = {"text": None, "error": None, "prompt_tokens": None, "response_tokens": None}
+    worker.finished.connect(lambda text: outcome.update(text=text))
+    worker.error.connect(lambda message: outcome.update(error=message))
+    worker.usage_reported.connect(lambda prompt_tokens, response_tokens: outcome.update(
+        prompt_tokens=prompt_tokens, response_tokens=response_tokens
+    ))
+    worker.run()
+    outcome["model"] = worker.answered_by
+    if outcome["text"] is None and outcome["error"] is None:
+        outcome["error"] = "No content generated by API."
+    return outcome
+
+class BatchRunner:
+    # Runs one operation over many files on a thread pool, reusing the GUI prompts and GeminiWorker.
+    # With an engine (core.async_engine.AsyncGeminiEngine) the requests themselves run on its asyncio loop.
+
+    def __init__(self, api_key, model_name, operation, options=None, concurrency=DEFAULT_MAX_CONCURRENT_REQUESTS,
+                 select_docs_context=None, response_cache=None, bypass_cache=False, max_input_tokens=0,
+                 oversize_strategy=DEFAULT_OVERSIZE_STRATEGY, docs_token_reserve=0, engine=None):
+        if operation not in OPERATIONS:
+            raise ValueError(f"Unknown operation '{operation}'")
+        self.api_key = api_key
+        self.model_name = resolve_model_name(model_name)
+        self.operation = operation
+        self.options = options or {}
+        self.concurrency = max(1, concurrency)
+        self.select_docs_context = select_docs_context # prompt text -> docs context, or None for no docs
+        self.response_cache = response_cache
+        self.bypass_cache = bypass_cache
+        self.oversize_strategy = oversize_strategy
+        self.engine = engine
+        self.token_budget = max(0, input_token_limit(self.model_name, max_input_tokens) - docs_token_reserve)
+
+    def run(self, paths, on_result=None):
+        # Processes every path and returns the results in input order.
+        # on_result(result) is called from the calling thread as each file completes.
+        results = [None] * len(paths)
+        with ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix="batch") as pool:
+            futures = {pool.submit(self.process_file, path): position for position, path in enumerate(paths)}
+            for future in as_completed(futures):
+                result = future.result()
+                results[futures[future]] = result
+                if on_result:
+                    on_result(result)
+        return results
+
+    def process_file(self, path):
+
+        started_at = time.monotonic()
+        result = {
+            "path": path, "operation": self.operation, "model": self.model_name, "status": "ok",
+            "response": "", "error": "", "cached": False, "chunks": 1,
+            "latency_ms": 0, "prompt_tokens": None, "response_tokens": None
+        }
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                text = f.read().strip()
+        except (OSError, UnicodeDecodeError) as e:
+            text, result["error"] = "", f"Could not read file: {e}"
+        if not text and not result["error"]:
+            result["error"] = "Empty input."
+
+        if not result["error"]:
+            outcome = self._process_text(path, text, result)
+            result["response"] = outcome["text"] or ""
+            result["error"] = outcome["error"] or ""
+
+        result["status"] = "error" if result["error"] else "ok"
+        result["latency_ms"] = int((time.monotonic() - started_at) * 1000)
+        return result
+
+    def build_prompt(self, path, text):
+
+        if self.operation == "summarize":
+            return build_summarize_prompt(text)
+        if self.operation == "debug":
+            return build_debug_prompt(text)
+        if self.operation == "convert":
+            return build_convert_prompt(text, self.options["source_lib"], self.options["target_lib"])
+        if self.operation == "translate":
+            source_lang = self.options.get("source_lang") or guess_language(path) or "Python"
+            return build_translate_prompt(text, source_lang, self.options["target_lang"])
+        return build_generate_prompt(text, self.options.get("libraries", ""))
+
+    def _process_text(self, path, text, result):
+        # Same decisions as the tabs: map-reduce for large summaries, then the oversize strategy.
+        if self.operation == "summarize" and len(text) > SUMMARY_CHUNK_THRESHOLD_CHARS:
+            chunks = split_source(text, SUMMARY_CHUNK_MAX_CHARS)
+            if len(chunks) > 1:
+                return self._summarize_in_chunks(chunks, result)
+        if self.operation == "convert":
+            plan = plan_targeted_conversion(text, self.options["source_lib"], self.options["target_lib"])
+            if plan is not None and estimate_tokens(plan[0]) <= self.token_budget:
+                return self._convert_targeted(text, plan, result)
+        build_prompt = lambda input_text: self.build_prompt(path, input_text)
+        strategy, payload = fit_input(
+            text, build_prompt, self.token_budget, self.oversize_strategy, allow_chunking=self.operation != "generate"
+        )
+        if strategy == OVERSIZE_STRATEGY_BLOCK:
+            return {"text": None, "error": (f"Input is about {estimate_tokens(build_prompt(text))} tokens, "
+                                            f"over the budget of {self.token_budget} tokens.")}
+        if strategy != OVERSIZE_STRATEGY_CHUNK:
+            return self._generate(build_prompt(payload), result)
+        if self.operation == "summarize":
+            return self._summarize_in_chunks(payload, result)
+        result["chunks"] = len(payload)
+        parts = []
+        for first_line, last_line, chunk_code in payload:
+            outcome = self._generate(build_prompt(chunk_code), result)
+            if outcome["error"]:
+                return outcome
+            parts.append(f"### Lines {first_line}-{last_line}\n\n{outcome['text']}")
+        return {"text": "\n\n".join(parts), "error": None}
+
+    def _convert_targeted(self, text, plan, result):
+        # Same as the Convert tab: only the regions using the source library are sent, then spliced back.
+        prompt_text, regions = plan
+
+        def merge(answer):
+            try:
+                return converted_file_markdown(apply_targeted_conversion(text, regions, answer))
+            except ValueError as e:
+                raise ValueError(f"Could not merge the converted regions: {e}") from e
+
+        return self._generate(prompt_text, result, parse=merge)
+
+    def _summarize_in_chunks(self, chunks, result):
+        # Same map-reduce flow as the Summarize tab; chunks run in sequence inside this file's pool slot.
+        result["chunks"] = len(chunks)
+        summaries = []
+        for number, (first_line, last_line, chunk_code) in enumerate(chunks, start=1):
+            outcome = self._generate(
+                build_summarize_chunk_prompt(chunk_code, number, len(chunks), first_line, last_line), result
+            )
+            if outcome["error"]:
+                return outcome
+            summaries.append(outcome["text"])
+        return self._generate(build_summarize_reduce_prompt(summaries), result)
+
+    def _generate(self, prompt_text, result, parse=None):
+        # One request through the response cache; token counts accumulate on result. parse(answer), if
+        # given, turns the answer into the result text; an answer it rejects with ValueError is not cached.
+        docs_context = self.select_docs_context(prompt_text) if self.select_docs_context else ""
+        cache_key = None
+        if self.response_cache is not None:
+            cache_key = ResponseCache.make_key(
+                self.model_name, build_full_prompt(prompt_text, docs_context), docs_context, GENERATION_CONFIG
+            )
+            cached_text = None if self.bypass_cache else self.response_cache.get(cache_key)
+            if cached_text is not None:
+                result["cached"] = True
+                return self._parse_answer(cached_text, parse)
+
+        if self.engine is not None:
+            outcome = self.engine.run(
+                self.engine.generate(self.api_key, self.model_name, prompt_text, docs_context, stream=False)
+            )
+        else:
+            outcome = run_prompt(self.api_key, self.model_name, prompt_text, docs_context)
+        for field in ("prompt_tokens", "response_tokens"):
+            if outcome[field] is not None:
+                result[field] = (result[field] or 0) + outcome[field]
+        if not outcome["text"]:
+            return outcome
+        parsed = self._parse_answer(outcome["text"], parse)
+        if cache_key and parsed["text"] is not None:
+            if outcome["model"] != self.model_name: # The backup model won a hedge; cache it as its answer
+                cache_key = ResponseCache.make_key(
+                    outcome["model"], build_full_prompt(prompt_text, docs_context), docs_context, GENERATION_CONFIG
+                )
+            self.response_cache.put(cache_key, outcome["text"], outcome["model"])
+        return dict(outcome, **parsed)
+
+    def _parse_answer(self, answer, parse):
+
+        if parse is None:
+            return {"text": answer, "error": None}
+        try:
+            return {"text": parse(answer), "error": None}
+        except ValueError as e:
+            return {"text": None, "error": str(e)}
@@ -0,0 +1,133 @@
+import threading
+
+from .constants import GENERATION_CONFIG
+
+WARM_UP_TEXT = "ping"
+
+def safety_settings():
+    # Built on demand: the SDK import costs most of a second, so it waits for the first request
+    # (or the background warm-up) instead of delaying the window.
+    from google.generativeai.types import HarmCategory, HarmBlockThreshold
+    return {
+        HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+        HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
+    }
+
+class GeminiBackend:
+    # Creates real Gemini models. genai.configure() drops the SDK's cached clients (and their open
+    # connections), so it only runs when a different key is first used instead of on every request.
+
+    def __init__(self):
+        self._configured_key = None
+
+    def _configure(self, api_key):
+
+        import google.generativeai as genai
+        if api_key != self._configured_key:
+            genai.configure(api_key=api_key)
+            self._configured_key = api_key
+        return genai
+
+    def create_model(self, api_key, model_name):
+
+        from google.generativeai import types
+        genai = self._configure(api_key)
+        return self._bind_client(genai.GenerativeModel(
+            model_name,
+            generation_config=types.GenerationConfig(**GENERATION_CONFIG),
+            safety_settings=safety_settings()
+        ))
+
+    def create_cached_content(self, api_key, model_name, prefix_text, ttl_seconds):
+        # Uploads prefix_text as cached content for model_name; see core.context_cache.
+        import datetime
+        from google.generativeai import caching
+        self._configure(api_key)
+        return caching.CachedContent.create(
+            model_name, display_name="devmate-docs", contents=[prefix_text],
+            ttl=datetime.timedelta(seconds=ttl_seconds)
+        )
+
+    def extend_cached_content(self, cached_content, ttl_seconds):
+
+        import datetime
+        cached_content.update(ttl=datetime.timedelta(seconds=ttl_seconds))
+
+    def delete_cached_content(self, cached_content):
+
+        cached_content.delete()
+
+    def create_model_from_cache(self, api_key, model_name, cached_content):
+        # Model whose requests are prefixed with cached_content (which was created for model_name).
+        from google.generativeai import types
+        genai = self._configure(api_key)
+        return self._bind_client(genai.GenerativeModel.from_cached_content(
+            cached_content,
+            generation_config=types.GenerationConfig(**GENERATION_CONFIG),
+            safety_settings=safety_settings()
+        ))
+
+    def _bind_client(self, model):
+
+        from google.generativeai import client as genai_client
+        try:
+            # The SDK would otherwise resolve the client lazily from whichever key is configured at
+            # first use; binding it now keeps models created for different keys apart.
+            model._client = genai_client.get_default_generative_client()
+        except Exception as e:
+            print(f"Warning: could not create the Gemini client up front, it will be created on first use: {e}")
+        return model
+
+class ModelPool:
+    # Process-wide, thread-safe cache of ready model objects keyed by (api_key, model name).
+    # Models come from a pluggable backend: anything with create_model(api_key, model_name) returning an
+    # object with generate_content(prompt, stream=...) and count_tokens(text) like the SDK's GenerativeModel.
+    # Models over cached content are not pooled here; core.context_cache keeps them with their handles.
+
+    def __init__(self, backend=None):
+        self._lock = threading.Lock()
+        self._backend = backend or GeminiBackend()
+        self._models = {}
+
+    @property
+    def backend(self):
+
+        return self._backend
+
+    def set_backend(self, backend):
+        # Swaps the backend (e.g. for core.fake_backend.FakeGeminiBackend); cached models are dropped.
+        with self._lock:
+            self._backend = backend or GeminiBackend()
+            self._models.clear()
+
+    def get_model(self, api_key, model_name):
+
+        with self._lock:
+            model = self._models.get((api_key, model_name))
+            if model is None:
+                model = self._backend.create_model(api_key, model_name)
+                self._models[(api_key, model_name)] = model
+            return model
+
+    def warm_up(self, api_key, model_name):
+        # Opens the model's connection ahead of the first real request (count_tokens is free and fast).
+        try:
+            self.get_model(api_key, model_name).count_tokens(WARM_UP_TEXT)
+            return True
+        except Exception as e:
+            print(f"Warning: warming up the Gemini connection failed: {e}")
+            return False
+
+    def warm_up_in_background(self, api_key, model_name):
+
+        if api_key:
+            threading.Thread(target=self.warm_up, args=(api_key, model_name), daemon=True).start()
+
+    def clear(self):
+
+        with self._lock:
+            self._models.clear()
+
+model_pool = ModelPool()
@@ -0,0 +1,91 @@
+import re
+import ast
+
+_DEFINITION_RE = re.compile(
+    r"^(?:export\s+)?(?:async\s+)?(?:def|class|function|func|fn|pub\s+fn|impl|interface|struct|"
+    r"public|private|protected|static)\b"
+)
+
+def _node_boundaries(nodes, into_classes=False):
+    # Start lines (0-based) of statements, with decorators kept on their definition. With into_classes,
+    # classes add the starts of their members too, so an oversized class can be split between them.
+    boundaries = []
+    for node in nodes:
+        start = node.lineno
+        for decorator in getattr(node, "decorator_list", []):
+            start = min(start, decorator.lineno)
+        boundaries.append(start - 1)
+        if into_classes and isinstance(node, ast.ClassDef):
+            boundaries.extend(_node_boundaries(node.body))
+    return boundaries
+
+def _generic_boundaries(lines):
+    # Unparseable or non-Python source: split before unindented definitions, else at blank lines.
+    boundaries = [index for index, line in enumerate(lines) if _DEFINITION_RE.match(line)]
+    if not boundaries:
+        boundaries = [index + 1 for index, line in enumerate(lines) if not line.strip()]
+    return sorted(set([0] + [b for b in boundaries if 0 < b < len(lines)]))
+
+def _segments(lines, boundaries):
+
+    boundaries = sorted(set([0] + [b for b in boundaries if 0 < b < len(lines)]))
+    ends = boundaries[1:] + [len(lines)]
+    return [(start, end) for start, end in zip(boundaries, ends) if start < end]
+
+def _split_oversized(lines, start, end, max_chars, tree_node=None):
+    # Splits one segment that is larger than max_chars: classes at member boundaries, others by lines.
+    if isinstance(tree_node, ast.ClassDef):
+        member_starts = [b for b in _node_boundaries([tree_node], into_classes=True) if start < b < end]
+        if member_starts:
+            bounds = [start] + member_starts
+            return _pack(lines, list(zip(bounds, bounds[1:] + [end])), max_chars)
+    pieces, piece_start, size = [], start, 0
+    for index in range(start, end):
+        line_size = len(lines[index])
+        if size and size + line_size > max_chars:
+            pieces.append((piece_start, index))
+            piece_start, size = index, 0
+        size += line_size
+    pieces.append((piece_start, end))
+    return pieces
+
+def _pack(lines, segments, max_chars, nodes_by_start=None):
+    # Greedily merges consecutive segments into chunks of at most max_chars.
+    chunks = []
+    current_start, current_end, current_size = None, None, 0
+    for start, end in segments:
+        size = sum(len(line) for line in lines[start:end])
+        if size > max_chars:
+            if current_start is not None:
+                chunks.append((current_start, current_end))
+                current_start, current_size = None, 0
+            node = nodes_by_start.get(start) if nodes_by_start else None
+            chunks.extend(_split_oversized(lines, start, end, max_chars, node))
+            continue
+        if current_start is not None and current_size + size > max_chars:
+            chunks.append((current_start, current_end))
+            current_start, current_size = None, 0
+        if current_start is None:
+            current_start = start
+        current_end = end
+        current_size += size
+    if current_start is not None:
+        chunks.append((current_start, current_end))
+    return chunks
+
+def split_source(code, max_chars):
+    # Splits source into chunks of whole functions/classes where possible.
+    # Returns [(first line number, last line number, text)] with 1-based line numbers.
+    lines = code.splitlines(keepends=True)
+    if not lines:
+        return []
+    nodes_by_start = {}
+    try:
+        tree = ast.parse(code)
+        boundaries = _node_boundaries(tree.body)
+        for node, start in zip(tree.body, boundaries):
+            nodes_by_start[start] = node
+    except (SyntaxError, ValueError):
+        boundaries = _generic_boundaries(lines)
+    segments = _segments(lines, boundaries)
+    return [(start + 1, end, "".join(lines[start:end])) for start, end in _pack(lines, segments, max_chars, nodes_by_start)]
@@ -7,6 +7,64 @@ AVAILABLE_MODELS = [
 
 ]
 DEFAULT_MODEL = "gemini-2.5-flash-preview-04-17"
+DEFAULT_MAX_CONCURRENT_REQUESTS = 3
+DEFAULT_ASYNC_MAX_CONCURRENCY = 32 # Requests the asyncio engine keeps on the wire at once
+MODEL_RATE_LIMITS = { # Free-tier quotas: (requests per minute, tokens per minute)
+    "gemini-2.5-flash-preview-04-17": (10, 250000),
+    "gemini-2.0-flash": (15, 1000000),
+    "gemini-2.0-flash-lite": (30, 1000000),
+    "gemini-1.5-flash": (15, 1000000),
+    "gemini-1.5-flash-8b": (15, 1000000),
+}
+DEFAULT_RATE_LIMIT = (10, 250000)
+RATE_LIMIT_MAX_RETRIES = 5
+MODEL_REQUEST_TIMEOUTS_SECONDS = { # Deadline of one API attempt; thinking models need longer
+    "gemini-2.5-flash-preview-04-17": 300,
+    "gemini-2.0-flash": 120,
+    "gemini-2.0-flash-lite": 90,
+    "gemini-1.5-flash": 120,
+    "gemini-1.5-flash-8b": 90,
+}
+DEFAULT_REQUEST_TIMEOUT_SECONDS = 120
+WORKER_STOP_POLL_SECONDS = 0.1
+DEFAULT_HEDGE_BACKUP_MODEL = "gemini-2.0-flash-lite"
+DEFAULT_HEDGE_PERCENTILE = 95 # Hedge once the primary is slower than this share of its recent first tokens
+HEDGE_LATENCY_HISTORY_SIZE = 50 # First-token latencies kept per model
+HEDGE_MIN_SAMPLES = 5 # Below this, DEFAULT_HEDGE_DELAY_SECONDS is used
+DEFAULT_HEDGE_DELAY_SECONDS = 8.0
+MIN_HEDGE_DELAY_SECONDS = 0.5 # Never hedge sooner, so fast models are not doubled up
+RETRY_BASE_DELAY_SECONDS = 2.0
+RETRY_MAX_DELAY_SECONDS = 60.0
+GENERATION_CONFIG = {"temperature": 0.7, "max_output_tokens": 8192}
+MODEL_INPUT_TOKEN_LIMITS = {
+    "gemini-2.5-flash-preview-04-17": 1048576,
+    "gemini-2.0-flash": 1048576,
+    "gemini-2.0-flash-lite": 1048576,
+    "gemini-1.5-flash": 1048576,
+    "gemini-1.5-flash-8b": 1048576,
+}
+DEFAULT_INPUT_TOKEN_LIMIT = 1048576
+OVERSIZE_STRATEGY_CHUNK = "chunk"
+OVERSIZE_STRATEGY_TRUNCATE = "truncate"
+OVERSIZE_STRATEGY_BLOCK = "block"
+OVERSIZE_STRATEGIES = [OVERSIZE_STRATEGY_CHUNK, OVERSIZE_STRATEGY_TRUNCATE, OVERSIZE_STRATEGY_BLOCK]
+DEFAULT_OVERSIZE_STRATEGY = OVERSIZE_STRATEGY_CHUNK
+TOKEN_COUNT_DEBOUNCE_MS = 300
+SUMMARY_CHUNK_THRESHOLD_CHARS = 40000
+SUMMARY_CHUNK_MAX_CHARS = 16000
+TARGETED_CONVERT_MAX_SHARE = 0.6 # Convert only the regions using the library when they are at most this share of the file
+DEFAULT_ATTACH_MAX_SIZE_MB = 5 # Larger attachments ask whether to load only the first part
+ATTACH_READ_CHUNK_BYTES = 64 * 1024 # Also the size of each piece added to the editor
+ATTACH_MMAP_THRESHOLD_BYTES = 4 * 1024 * 1024 # Bigger files are read through mmap
+ATTACH_PIECES_IN_FLIGHT = 2 # Pieces read ahead of the editor
+ENCODING_SAMPLE_BYTES = 64 * 1024
+SKIPPED_DIR_NAMES = {"__pycache__", "node_modules", "venv", "env", "build", "dist"} # Besides hidden directories
+PACK_MAX_FILES = 2000 # Files considered when attaching a folder
+PACK_MAX_FILE_CHARS = 30000 # Longer files are cut in the context pack
+PACK_MAX_TOTAL_CHARS = 400000 # Files past this are listed but left out of the pack
+PACK_DEDUP_MIN_LINES = 4 # Repeated blocks at least this long are replaced by a reference
+PACK_READ_WORKERS = 8
+PACK_CACHE_MAX_ENTRIES = 20
 
 SETTINGS_FILE_NAME = "ai_dev_helper_settings.ini"
 
@@ -17,3 +75,42 @@ LANGS_DIR_NAME = "langs"
 DOCS_DIR_NAME = "docs"
 LOGS_DIR_NAME = "logs"
 CHAT_HISTORY_FILE_NAME = "chat_history.txt"
+LOG_FLUSH_INTERVAL_SECONDS = 2.0 # Queued log entries are written at least this often
+LOG_BATCH_MAX_BYTES = 256 * 1024 # ...or as soon as this much is queued
+LOG_MAX_PENDING_BYTES = 8 * 1024 * 1024 # Beyond this, new entries are dropped until the writer catches up
+LOG_ROTATE_MAX_BYTES = 5 * 1024 * 1024
+LOG_ROTATE_MAX_AGE_DAYS = 7
+LOG_ROTATED_SEGMENTS_KEPT = 10 # Gzipped segments kept besides the current file
+TRACES_FILE_NAME = "traces.jsonl"
+TRACE_RECENT_LIMIT = 200
+INTERACTIONS_DB_FILE_NAME = "interactions.db"
+INTERACTIONS_MAX_ROWS = 10000 # The oldest interactions are deleted past this
+HISTORY_PAGE_SIZE = 20
+HISTORY_MAX_RENDERED_ENTRIES = 50
+CACHE_DIR_NAME = "cache"
+RESPONSE_CACHE_DIR_NAME = "responses"
+CONTEXT_PACK_DIR_NAME = "context_packs"
+RESPONSE_CACHE_MAX_BYTES = 50 * 1024 * 1024
+RESPONSE_CACHE_MAX_AGE_DAYS = 30
+DOCS_INDEX_FILE_NAME = "docs_index.json"
+DOCS_MANIFEST_FILE_NAME = "docs_manifest.json"
+DEFAULT_DOCS_TOP_K = 5
+DEFAULT_DOCS_TOKEN_BUDGET = 2000
+MODEL_CONTEXT_CACHE_MIN_TOKENS = { # Smallest prefix the API accepts as cached content
+    "gemini-2.5-flash-preview-04-17": 1024,
+    "gemini-2.0-flash": 4096,
+    "gemini-2.0-flash-lite": 4096,
+    "gemini-1.5-flash": 32768,
+    "gemini-1.5-flash-8b": 32768,
+}
+DEFAULT_CONTEXT_CACHE_MIN_TOKENS = 32768
+DEFAULT_CONTEXT_CACHE_TTL_MINUTES = 60
+CONTEXT_CACHE_REFRESH_MARGIN_SECONDS = 300 # A handle this close to expiring gets its TTL extended on use
+CONTEXT_CACHE_RETRY_SECONDS = 600 # After a failed upload, requests send the docs inline for this long
+CONTEXT_CACHE_DELETE_GRACE_SECONDS = 60 # Replaced caches are deleted once in-flight requests are done with them
+STARTUP_TIMING_ENV_VAR = "DEVMATE_STARTUP_TIMING"
+STARTUP_TIMING_FLAG = "--startup-timing"
+STARTUP_CHECK_FLAG = "--startup-check" # --startup-check[=budget in ms]: exit after first paint, 1 if over budget
+DEFAULT_STARTUP_BUDGET_MS = 1500
+FAKE_BACKEND_ENV_VAR = "DEVMATE_FAKE_BACKEND" # "1" or "latency_ms=500,chunks=10,...": serve requests locally
+PROJECT_ROOT_ENV_VAR = "DEVMATE_PROJECT_ROOT" # Folder for settings, docs, logs and caches instead of the app's own
@@ -0,0 +1,176 @@
+import time
+import threading
+
+from .client_pool import model_pool
+from .docs_index import text_digest
+from .token_counter import estimate_tokens, input_token_limit
+from .constants import (MODEL_CONTEXT_CACHE_MIN_TOKENS, DEFAULT_CONTEXT_CACHE_MIN_TOKENS,
+                        DEFAULT_CONTEXT_CACHE_TTL_MINUTES, CONTEXT_CACHE_REFRESH_MARGIN_SECONDS,
+                        CONTEXT_CACHE_RETRY_SECONDS, CONTEXT_CACHE_DELETE_GRACE_SECONDS)
+
+class CachedPrefix:
+    # A docs prefix uploaded as cached content for one model, and the model object that references it.
+
+    def __init__(self, backend, cached_content, model, ttl_seconds):
+        self.backend = backend
+        self.cached_content = cached_content
+        self.model = model
+        self.expires_at = time.monotonic() + ttl_seconds
+
+    def seconds_left(self):
+
+        return self.expires_at - time.monotonic()
+
+class ContextCache:
+    # Keeps the docs prefix of the prompts in the server's context cache, once per (api key, model, docs
+    # digest), so requests send only their task and the docs tokens are neither uploaded nor prefilled again.
+    # Handles live for ttl_seconds and are extended when used close to expiry; invalidate() drops them once
+    # the docs change. Docs below the model's minimum cacheable size, or a failed upload, mean the docs are
+    # sent inline as before. Works with any backend offering the cached-content methods of GeminiBackend.
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._handles = {} # (api key, model, digest) -> CachedPrefix
+        self._key_locks = {} # Serializes the upload per key, so concurrent requests share one
+        self._failed_until = {} # (api key, model) -> monotonic time before which uploads are not retried
+        self._last_docs = (None, None, 0) # Docs text, digest, tokens of the last docs checked
+        self.enabled = True
+        self.ttl_seconds = DEFAULT_CONTEXT_CACHE_TTL_MINUTES * 60
+
+    def configure(self, enabled, ttl_minutes=DEFAULT_CONTEXT_CACHE_TTL_MINUTES):
+
+        self.enabled = bool(enabled)
+        self.ttl_seconds = max(1, int(ttl_minutes)) * 60
+        if not self.enabled:
+            self.invalidate()
+
+    def _docs_info(self, docs_context):
+        # Digest and token estimate of a docs context; memoized, the GUI asks for the same docs repeatedly.
+        last_docs, digest, tokens = self._last_docs
+        if docs_context is not last_docs and docs_context != last_docs:
+            from .gemini_worker import build_docs_prefix # gemini_worker imports this module
+            digest, tokens = text_digest(docs_context), estimate_tokens(build_docs_prefix(docs_context))
+            self._last_docs = (docs_context, digest, tokens)
+        return digest, tokens
+
+    def is_eligible(self, model_name, docs_context):
+        # True if docs_context is worth caching for model_name: big enough for the API to accept it, and
+        # small enough to leave at least half of the model's input limit for the task.
+        if not self.enabled or not docs_context:
+            return False
+        tokens = self._docs_info(docs_context)[1]
+        minimum = MODEL_CONTEXT_CACHE_MIN_TOKENS.get(model_name, DEFAULT_CONTEXT_CACHE_MIN_TOKENS)
+        return minimum <= tokens <= input_token_limit(model_name) // 2
+
+    def will_cache(self, api_key, model_name, docs_context):
+        # True if a request with docs_context would be served from a cached prefix: a handle exists, or one
+        # would be uploaded now because no upload for this key and model has failed within the retry window.
+        if not api_key or not self.is_eligible(model_name, docs_context):
+            return False
+        digest = self._docs_info(docs_context)[0]
+        with self._lock:
+            if (api_key, model_name, digest) in self._handles:
+                return True
+            return time.monotonic() >= self._failed_until.get((api_key, model_name), 0.0)
+
+    def model_for(self, api_key, model_name, docs_context, create=True):
+        # Model whose requests already carry docs_context as their prefix, or None to send the docs inline.
+        # With create=False only an existing handle is used; nothing is uploaded.
+        if not self.is_eligible(model_name, docs_context):
+            return None
+        digest = self._docs_info(docs_context)[0]
+        key = (api_key, model_name, digest)
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:
+            handle = self._usable_handle(key)
+            if handle is None and create and time.monotonic() >= self._failed_until.get(key[:2], 0.0):
+                handle = self._create_handle(key, docs_context)
+            return handle.model if handle is not None else None
+
+    def _usable_handle(self, key):
+        # The handle for key, its TTL extended if it is about to expire; None if there is none or it is lost.
+        with self._lock:
+            handle = self._handles.get(key)
+        if handle is None:
+            return None
+        if handle.backend is not model_pool.backend or handle.seconds_left() <= 0: # Swapped backend, or expired
+            self._drop(key, handle)
+            return None
+        if handle.seconds_left() < CONTEXT_CACHE_REFRESH_MARGIN_SECONDS:
+            try:
+                handle.backend.extend_cached_content(handle.cached_content, self.ttl_seconds)
+                handle.expires_at = time.monotonic() + self.ttl_seconds
+            except Exception as e:
+                print(f"Warning: could not extend the cached docs context, uploading it again: {e}")
+                self._drop(key, handle)
+                return None
+        return handle
+
+    def _create_handle(self, key, docs_context):
+
+        from .gemini_worker import build_docs_prefix
+        api_key, model_name, _digest = key
+        backend = model_pool.backend
+        try:
+            cached_content = backend.create_cached_content(
+                api_key, model_name, build_docs_prefix(docs_context), self.ttl_seconds
+            )
+            model = backend.create_model_from_cache(api_key, model_name, cached_content)
+        except Exception as e:
+            print(f"Warning: could not cache the docs context for {model_name}, sending it inline: {e}")
+            with self._lock:
+                self._failed_until[key[:2]] = time.monotonic() + CONTEXT_CACHE_RETRY_SECONDS
+            return None
+        handle = CachedPrefix(backend, cached_content, model, self.ttl_seconds)
+        with self._lock:
+            self._handles[key] = handle
+            self._failed_until.pop(key[:2], None)
+        return handle
+
+    def _drop(self, key, handle):
+
+        with self._lock:
+            if self._handles.get(key) is handle:
+                del self._handles[key]
+
+    def discard(self, model):
+        # Forgets the handle behind a model from model_for(), after the server no longer knew its cached content.
+        with self._lock:
+            for key, handle in list(self._handles.items()):
+                if handle.model is model:
+                    del self._handles[key]
+
+    def invalidate(self, grace_seconds=CONTEXT_CACHE_DELETE_GRACE_SECONDS):
+        # Forgets every handle (e.g. after the docs changed) and deletes them on the server once requests
+        # still using them are done. Returns the deleting thread, or None if there was nothing to delete.
+        with self._lock:
+            handles = list(self._handles.values())
+            self._handles.clear()
+            self._key_locks.clear()
+            self._failed_until.clear()
+        if not handles:
+            return None
+        timer = threading.Timer(max(0.0, grace_seconds), self._delete, args=(handles,))
+        timer.daemon = True
+        timer.start()
+        return timer
+
+    def close(self, timeout_seconds=2.0):
+        # Deletes every handle on the server now, at exit. Returns False if that took longer than the timeout;
+        # whatever is left expires on its own at the end of its TTL.
+        thread = self.invalidate(0)
+        if thread is None:
+            return True
+        thread.join(timeout_seconds)
+        return not thread.is_alive()
+
+    def _delete(self, handles):
+
+        for handle in handles:
+            try:
+                handle.backend.delete_cached_content(handle.cached_content)
+            except Exception as e: # It expires on its own at the end of its TTL
+                print(f"Warning: could not delete a cached docs context: {e}")
+
+context_cache = ContextCache()
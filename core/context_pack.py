@@ -0,0 +1,465 @@
+import os
+import re
+import ast
+import json
+import hashlib
+from collections import Counter, namedtuple
+from concurrent.futures import ThreadPoolExecutor
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from .translation import tr
+from .file_loader import read_text_file
+from .prompts import guess_language
+from .constants import (SKIPPED_DIR_NAMES, PACK_MAX_FILES, PACK_MAX_FILE_CHARS, PACK_MAX_TOTAL_CHARS,
+                        PACK_DEDUP_MIN_LINES, PACK_READ_WORKERS, PACK_CACHE_MAX_ENTRIES)
+
+PACK_FORMAT_VERSION = 1
+IGNORE_FILE_NAMES = (".gitignore", ".devmateignore")
+
+ContextPack = namedtuple("ContextPack", [
+    "text", "file_count", "duplicate_count", "truncated_count", "omitted_count", "language", "from_cache"
+])
+
+def _pattern_regex(pattern):
+    # Regex for one .gitignore glob: "*" and "?" stay within a path segment, "**" crosses them.
+    parts, i = [], 0
+    while i < len(pattern):
+        if pattern.startswith("**/", i):
+            parts.append("(?:.*/)?"); i += 3
+        elif pattern.startswith("**", i):
+            parts.append(".*"); i += 2
+        elif pattern[i] == "*":
+            parts.append("[^/]*"); i += 1
+        elif pattern[i] == "?":
+            parts.append("[^/]"); i += 1
+        elif pattern[i] == "[" and "]" in pattern[i + 1:]:
+            end = pattern.index("]", i + 1)
+            parts.append("[" + pattern[i + 1:end].replace("!", "^", 1) + "]"); i = end + 1
+        else:
+            parts.append(re.escape(pattern[i])); i += 1
+    return re.compile("".join(parts) + r"(?:/.*)?\Z")
+
+class IgnoreRules:
+    # The common subset of .gitignore syntax: globs with * ? ** and [...], "!" to re-include, a trailing "/"
+    # for directories only, and a "/" inside a pattern anchoring it to the ignore file's directory.
+    # Rules from deeper ignore files come later, and the last matching rule wins, as in git.
+
+    def __init__(self, rules=()):
+        self.rules = list(rules) # (base directory, regex, negate, directories only, anchored)
+
+    def extended(self, base, lines):
+        # Rules plus those of an ignore file in directory base ("" for the root).
+        rules = list(self.rules)
+        for line in lines:
+            line = line.rstrip()
+            if not line or line.startswith("#"):
+                continue
+            negate = line.startswith("!")
+            pattern = line[1:] if negate else line
+            dir_only = pattern.endswith("/")
+            pattern = pattern.strip("/") if dir_only else pattern
+            anchored = "/" in pattern
+            rules.append((base, _pattern_regex(pattern.lstrip("/")), negate, dir_only, anchored))
+        return IgnoreRules(rules)
+
+    def is_ignored(self, rel_path, is_dir):
+
+        ignored = False
+        for base, regex, negate, dir_only, anchored in self.rules:
+            if dir_only and not is_dir:
+                continue
+            if base:
+                if not rel_path.startswith(base + "/"):
+                    continue
+                path = rel_path[len(base) + 1:]
+            else:
+                path = rel_path
+            if regex.match(path if anchored else path.rsplit("/", 1)[-1]):
+                ignored = not negate
+        return ignored
+
+def _read_ignore_file(directory):
+
+    lines = []
+    for name in IGNORE_FILE_NAMES:
+        try:
+            with open(os.path.join(directory, name), 'r', encoding='utf-8', errors='replace') as f:
+                lines.extend(f.read().splitlines())
+        except OSError:
+            pass
+    return lines
+
+def scan_project(root, max_files=PACK_MAX_FILES):
+    # Stat pass over the source files of a project: ({relative path: (mtime_ns, size)}, files left out).
+    # Hidden and build/dependency directories are skipped, and so is whatever ignore files exclude.
+    found, skipped = {}, 0
+    rules_by_dir = {"": IgnoreRules().extended("", _read_ignore_file(root))}
+    for current, dirs, files in os.walk(root):
+        rel_dir = os.path.relpath(current, root).replace(os.sep, "/")
+        rel_dir = "" if rel_dir == "." else rel_dir
+        rules = rules_by_dir.pop(rel_dir)
+        kept_dirs = []
+        for name in sorted(dirs):
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if name.startswith(".") or name in SKIPPED_DIR_NAMES or rules.is_ignored(rel_path, True):
+                continue
+            kept_dirs.append(name)
+            child_lines = _read_ignore_file(os.path.join(current, name))
+            rules_by_dir[rel_path] = rules.extended(rel_path, child_lines) if child_lines else rules
+        dirs[:] = kept_dirs
+        for name in sorted(files):
+            rel_path = f"{rel_dir}/{name}" if rel_dir else name
+            if guess_language(name) is None or rules.is_ignored(rel_path, False):
+                continue
+            if len(found) >= max_files:
+                skipped += 1
+                continue
+            try:
+                stat = os.stat(os.path.join(current, name))
+            except OSError:
+                continue
+            found[rel_path] = (stat.st_mtime_ns, stat.st_size)
+    return found, skipped
+
+def _read_source(path):
+    # (text, sha256) of a source file, or (None, None) if it is not readable text. Only the part that can
+    # make it into the pack is read (4 bytes per character covers any encoding).
+    try:
+        text, _, _ = read_text_file(path, limit_bytes=PACK_MAX_FILE_CHARS * 4)
+    except (OSError, ValueError):
+        return None, None
+    return text, hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def read_sources(root, rel_paths, workers=PACK_READ_WORKERS):
+    # Reads files in a thread pool: {relative path: (text, sha256)}, unreadable files left out.
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(lambda rel_path: _read_source(os.path.join(root, rel_path)), rel_paths)
+        return {rel_path: result for rel_path, result in zip(rel_paths, results) if result[0] is not None}
+
+def _module_names(rel_path):
+    # Dotted names a Python file can be imported as, from its full path down to its file name,
+    # since the attached folder may be a package, its parent, or a src/ layout.
+    parts = rel_path[:-len(".py")].split("/")
+    if parts[-1] == "__init__":
+        parts = parts[:-1]
+    return [".".join(parts[i:]) for i in range(len(parts))] if parts else []
+
+def _python_imports(rel_path, text):
+    # Dotted module names a Python file imports, relative imports resolved against its package.
+    try:
+        tree = ast.parse(text)
+    except (SyntaxError, ValueError):
+        return []
+    package = rel_path.split("/")[:-1]
+    imported = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            imported.extend(alias.name for alias in node.names)
+        elif isinstance(node, ast.ImportFrom):
+            if node.level:
+                base = package[:len(package) - node.level + 1] if node.level - 1 <= len(package) else []
+                module = ".".join(base + (node.module.split(".") if node.module else []))
+            else:
+                module = node.module or ""
+            if module:
+                imported.append(module)
+            imported.extend(f"{module}.{alias.name}" if module else alias.name for alias in node.names)
+    return imported
+
+def import_order(sources):
+    # Files ordered so that, as far as cycles allow, modules come before the files importing them;
+    # otherwise in path order. Only Python imports are followed.
+    by_module = {}
+    for rel_path in sorted(sources, key=lambda path: (path.count("/"), path)): # Nearest the root wins a name
+        if rel_path.endswith(".py"):
+            for name in _module_names(rel_path):
+                by_module.setdefault(name, rel_path)
+    dependencies = {}
+    for rel_path in sources:
+        found = []
+        if rel_path.endswith(".py"):
+            for name in _python_imports(rel_path, sources[rel_path]):
+                target = by_module.get(name)
+                if target and target != rel_path and target not in found:
+                    found.append(target)
+        dependencies[rel_path] = found
+
+    ordered, visited = [], set()
+    def visit(rel_path): # Iterative post-order, so deep import chains do not hit the recursion limit
+        stack = [(rel_path, iter(dependencies[rel_path]))]
+        visited.add(rel_path)
+        while stack:
+            current, remaining = stack[-1]
+            for dependency in remaining:
+                if dependency not in visited:
+                    visited.add(dependency)
+                    stack.append((dependency, iter(dependencies[dependency])))
+                    break
+            else:
+                stack.pop()
+                ordered.append(current)
+    for rel_path in sorted(sources):
+        if rel_path not in visited:
+            visit(rel_path)
+    return ordered
+
+def _blocks(lines):
+    # (first line index, end index) of the runs of non-blank lines.
+    start = None
+    for index, line in enumerate(lines + [""]):
+        if line.strip() and start is None:
+            start = index
+        elif not line.strip() and start is not None:
+            yield start, index
+            start = None
+
+def _dedup_blocks(rel_path, text, seen_blocks):
+    # Replaces blocks already in the pack (e.g. copied helpers, license headers) with a reference to them.
+    lines = text.split("\n")
+    replaced = {}
+    for start, end in _blocks(lines):
+        if end - start < PACK_DEDUP_MIN_LINES:
+            continue
+        key = hashlib.sha256("\n".join(line.rstrip() for line in lines[start:end]).encode("utf-8")).digest()
+        if key in seen_blocks:
+            first_path, first_line = seen_blocks[key]
+            replaced[start] = (end, f"[... {end - start} lines identical to {first_path}:{first_line} ...]")
+        else:
+            seen_blocks[key] = (rel_path, start + 1)
+    if not replaced:
+        return text
+    output, index = [], 0
+    while index < len(lines):
+        if index in replaced:
+            index, note = replaced[index]
+            output.append(note)
+        else:
+            output.append(lines[index])
+            index += 1
+    return "\n".join(output)
+
+def _cap_file(text):
+    # (text, truncated) with text cut to PACK_MAX_FILE_CHARS at a line boundary.
+    if len(text) <= PACK_MAX_FILE_CHARS:
+        return text, False
+    cut = text.rfind("\n", 0, PACK_MAX_FILE_CHARS)
+    kept = text[:cut if cut > 0 else PACK_MAX_FILE_CHARS]
+    return f"{kept}\n[... truncated: {kept.count(chr(10)) + 1} of {text.count(chr(10)) + 1} lines shown ...]", True
+
+def build_pack_text(project_name, sources):
+    # The context pack for {relative path: text}: files in import order, each once, fenced with its path.
+    hashes = {rel_path: hashlib.sha256(text.encode("utf-8")).hexdigest() for rel_path, text in sources.items()}
+    first_with_hash, seen_blocks, sections = {}, {}, []
+    file_count = duplicate_count = truncated_count = omitted_count = total_chars = 0
+    languages = Counter()
+    for rel_path in import_order(sources):
+        if not sources[rel_path].strip(): # Empty __init__.py files and the like
+            continue
+        language = guess_language(rel_path)
+        if hashes[rel_path] in first_with_hash:
+            sections.append(f"### File: {rel_path}\n\n(identical to {first_with_hash[hashes[rel_path]]})")
+            duplicate_count += 1
+            continue
+        if total_chars >= PACK_MAX_TOTAL_CHARS:
+            omitted_count += 1
+            continue
+        first_with_hash[hashes[rel_path]] = rel_path
+        text, truncated = _cap_file(_dedup_blocks(rel_path, sources[rel_path].rstrip("\n"), seen_blocks))
+        truncated_count += truncated
+        sections.append(f"### File: {rel_path}\n\n```{language.lower()}\n{text}\n```")
+        total_chars += len(text)
+        file_count += 1
+        languages[language] += 1
+    header = f"# Project: {project_name} ({file_count} files, dependencies first)"
+    if omitted_count:
+        header += f"\n\n{omitted_count} more files were left out to keep the pack within {PACK_MAX_TOTAL_CHARS} characters."
+    text = "\n\n".join([header] + sections) + "\n"
+    language = languages.most_common(1)[0][0] if languages else None
+    return ContextPack(text, file_count, duplicate_count, truncated_count, omitted_count, language, False)
+
+def tree_digest(file_hashes):
+    # Content hash of a project for the pack cache: file paths, their content hashes and the pack format.
+    payload = json.dumps({
+        "version": PACK_FORMAT_VERSION, "files": sorted(file_hashes.items()),
+        "limits": [PACK_MAX_FILE_CHARS, PACK_MAX_TOTAL_CHARS, PACK_DEDUP_MIN_LINES]
+    })
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+class ContextPackCache:
+    # Context packs on disk by tree_digest, plus a manifest per attached folder mapping file stats to
+    # content hashes, so re-attaching an unchanged tree needs only a stat pass.
+
+    def __init__(self, cache_dir, max_entries=PACK_CACHE_MAX_ENTRIES):
+        self.cache_dir = cache_dir
+        self.max_entries = max_entries
+
+    def _manifest_path(self, root):
+
+        root_key = hashlib.sha256(os.path.abspath(root).encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.cache_dir, "folders", f"{root_key}.json")
+
+    def _pack_path(self, digest):
+
+        return os.path.join(self.cache_dir, f"{digest}.json")
+
+    def load_manifest(self, root):
+
+        data = _load_json(self._manifest_path(root))
+        return data.get("files", {}) if data.get("version") == PACK_FORMAT_VERSION else {}
+
+    def save_manifest(self, root, files):
+
+        _save_json(self._manifest_path(root), {"version": PACK_FORMAT_VERSION, "files": files})
+
+    def get(self, digest):
+
+        data = _load_json(self._pack_path(digest))
+        if data.get("version") != PACK_FORMAT_VERSION:
+            return None
+        try:
+            os.utime(self._pack_path(digest)) # Recently used packs survive pruning
+        except OSError:
+            pass
+        return ContextPack(*data["pack"][:-1], True)
+
+    def put(self, digest, pack):
+
+        _save_json(self._pack_path(digest), {"version": PACK_FORMAT_VERSION, "pack": list(pack)})
+        self._prune()
+
+    def _prune(self):
+
+        try:
+            entries = [entry for entry in os.scandir(self.cache_dir) if entry.name.endswith(".json")]
+        except OSError:
+            return
+        entries.sort(key=lambda entry: entry.stat().st_mtime, reverse=True)
+        for entry in entries[self.max_entries:]:
+            try:
+                os.remove(entry.path)
+            except OSError:
+                pass
+
+def _load_json(path):
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+def _save_json(path, data):
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving context pack cache '{path}': {e}")
+
+def build_context_pack(root, cache=None):
+    # Context pack for the source files under root. With a cache, files whose stat is unchanged are not
+    # hashed again, and an unchanged tree is served from the cache without reading any file.
+    files, skipped = scan_project(root)
+    project_name = os.path.basename(os.path.abspath(root))
+    known = cache.load_manifest(root) if cache is not None else {}
+    if cache is not None and files and all(
+            rel_path in known and [known[rel_path]["mtime_ns"], known[rel_path]["size"]] == list(stat)
+            for rel_path, stat in files.items()):
+        pack = cache.get(tree_digest({
+            rel_path: known[rel_path]["sha256"] for rel_path in files if known[rel_path]["sha256"] is not None
+        }))
+        if pack is not None:
+            return pack
+
+    read = read_sources(root, sorted(files))
+    if cache is not None: # Unreadable files are recorded too, without a hash, so they are not read again
+        cache.save_manifest(root, {
+            rel_path: {"mtime_ns": mtime_ns, "size": size, "sha256": read[rel_path][1] if rel_path in read else None}
+            for rel_path, (mtime_ns, size) in files.items()
+        })
+    if not read:
+        raise ValueError(tr("attach_folder_empty_err", folder=project_name))
+    digest = tree_digest({rel_path: sha256 for rel_path, (_, sha256) in read.items()})
+    if cache is not None:
+        pack = cache.get(digest) # Files were touched but their content is the same
+        if pack is not None:
+            return pack
+    pack = build_pack_text(project_name, {rel_path: text for rel_path, (text, _) in read.items()})
+    if skipped:
+        pack = pack._replace(omitted_count=pack.omitted_count + skipped)
+    if cache is not None:
+        cache.put(digest, pack)
+    return pack
+
+class ContextPackWorker(QObject):
+
+    finished = pyqtSignal(object) # ContextPack
+    error = pyqtSignal(str)
+
+    def __init__(self, root, cache=None):
+        super().__init__()
+        self.root = root
+        self.cache = cache
+
+    def run(self):
+
+        try:
+            pack = build_context_pack(self.root, self.cache)
+        except (OSError, ValueError) as e:
+            self.error.emit(str(e))
+            return
+        self.finished.emit(pack)
+
+class ContextPackLoader(QObject):
+    # Builds one context pack at a time on a background thread; a new build supersedes the previous one.
+
+    finished = pyqtSignal(object) # ContextPack
+    error = pyqtSignal(str)
+
+    def __init__(self, cache=None, parent=None):
+        super().__init__(parent)
+        self.cache = cache
+        self._thread = None
+        self._worker = None
+
+    def is_loading(self):
+
+        return self._worker is not None
+
+    def load(self, root):
+
+        thread, worker = QThread(self), ContextPackWorker(root, self.cache)
+        worker.moveToThread(thread)
+        worker.finished.connect(lambda pack: self._forward(worker, self.finished, pack))
+        worker.error.connect(lambda error_msg: self._forward(worker, self.error, error_msg))
+        worker.finished.connect(thread.quit)
+        worker.error.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self._on_thread_finished(thread))
+        thread.started.connect(worker.run)
+        self._thread, self._worker = thread, worker
+        thread.start()
+
+    def _forward(self, worker, signal, payload):
+
+        if worker is not self._worker:
+            return
+        self._worker = None
+        signal.emit(payload)
+
+    def _on_thread_finished(self, thread):
+
+        if thread is self._thread:
+            self._thread = None
+
+    def stop(self, timeout_ms=2000):
+        # Drops the current build's result. A build cannot be interrupted; returns False if it is still
+        # running after timeout_ms.
+        thread, self._worker = self._thread, None
+        if thread is not None and thread.isRunning():
+            thread.quit() # The worker's own quit is queued to this thread and would not run while waiting
+            return thread.wait(timeout_ms) if timeout_ms else False
+        return True
@@ -0,0 +1,187 @@
+import os
+import re
+import json
+import math
+import hashlib
+from collections import Counter
+
+from .token_counter import estimate_tokens
+
+INDEX_FORMAT_VERSION = 1
+CHUNK_MAX_CHARS = 1200
+BM25_K1 = 1.5
+BM25_B = 0.75
+
+_TOKEN_RE = re.compile(r"[A-Za-z_][A-Za-z0-9_]+|[0-9]+|[^\W\d_A-Za-z]+")
+_HEADING_RE = re.compile(r"^(#{1,6}\s|\S.*\n[=-]{3,}\s*$)", re.MULTILINE)
+_STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with "
+    "you your not but if then else do does can should would into than so such".split()
+)
+
+def tokenize(text):
+
+    return [token for token in (match.lower() for match in _TOKEN_RE.findall(text))
+            if token not in _STOPWORDS]
+
+def chunk_document(text, max_chars=CHUNK_MAX_CHARS):
+    # Splits text on blank lines, then packs paragraphs into chunks; headings start a new chunk.
+    paragraphs = [p.strip() for p in re.split(r"\n\s*\n", text) if p.strip()]
+    chunks, current = [], []
+    current_len = 0
+    for paragraph in paragraphs:
+        starts_section = bool(_HEADING_RE.match(paragraph))
+        if current and (starts_section or current_len + len(paragraph) > max_chars):
+            chunks.append("\n\n".join(current))
+            current, current_len = [], 0
+        while len(paragraph) > max_chars: # Oversized paragraphs are hard-split on line boundaries
+            cut = paragraph.rfind("\n", 0, max_chars)
+            cut = cut if cut > 0 else max_chars
+            chunks.append(paragraph[:cut].strip())
+            paragraph = paragraph[cut:].strip()
+        if paragraph:
+            current.append(paragraph)
+            current_len += len(paragraph)
+    if current:
+        chunks.append("\n\n".join(current))
+    return chunks
+
+def text_digest(text):
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def docs_digest(file_hashes):
+    # Digest of {source: sha256 hex}; identifies the exact docs set an index was built from.
+    sha = hashlib.sha256()
+    for source in sorted(file_hashes):
+        sha.update(f"{source}\0{file_hashes[source]}\n".encode("utf-8"))
+    return sha.hexdigest()
+
+class DocsIndex:
+    # BM25 inverted index over chunks of the docs folder, persisted as JSON.
+
+    def __init__(self):
+        self.digest = ""
+        self.chunks = {} # chunk_id -> {"source", "text", "length"}
+        self.sources = {} # source -> [chunk_id, ...]
+        self.postings = {} # term -> {chunk_id: term frequency}
+        self._next_chunk_id = 0
+        self._total_length = 0
+
+    def is_empty(self):
+
+        return not self.chunks
+
+    def build(self, documents):
+
+        self.__init__()
+        for source in sorted(documents):
+            self.set_document(source, documents[source])
+        self.digest = docs_digest({source: text_digest(text) for source, text in documents.items()})
+
+    def set_document(self, source, text):
+
+        self.remove_document(source)
+        chunk_ids = []
+        for chunk_text in chunk_document(text):
+            chunk_id = self._next_chunk_id
+            self._next_chunk_id += 1
+            terms = Counter(tokenize(chunk_text))
+            length = sum(terms.values())
+            self.chunks[chunk_id] = {"source": source, "text": chunk_text, "length": length}
+            for term, count in terms.items():
+                self.postings.setdefault(term, {})[chunk_id] = count
+            self._total_length += length
+            chunk_ids.append(chunk_id)
+        self.sources[source] = chunk_ids
+
+    def remove_document(self, source):
+
+        for chunk_id in self.sources.pop(source, []):
+            chunk = self.chunks.pop(chunk_id)
+            self._total_length -= chunk["length"]
+            for term in set(tokenize(chunk["text"])):
+                term_postings = self.postings.get(term)
+                if term_postings is not None:
+                    term_postings.pop(chunk_id, None)
+                    if not term_postings:
+                        del self.postings[term]
+
+    def document_text(self, source):
+
+        return "\n\n".join(self.chunks[chunk_id]["text"] for chunk_id in self.sources.get(source, []))
+
+    def full_text(self):
+
+        return "\n\n---\n\n".join(self.document_text(source) for source in sorted(self.sources))
+
+    def search(self, query, top_k=5):
+        # Returns [(score, chunk_id)] for the best BM25 matches, highest first.
+        if not self.chunks:
+            return []
+        chunk_count = len(self.chunks)
+        average_length = (self._total_length / chunk_count) or 1
+        scores = {}
+        for term in set(tokenize(query)):
+            term_postings = self.postings.get(term)
+            if not term_postings:
+                continue
+            idf = math.log(1 + (chunk_count - len(term_postings) + 0.5) / (len(term_postings) + 0.5))
+            for chunk_id, frequency in term_postings.items():
+                length_norm = 1 - BM25_B + BM25_B * self.chunks[chunk_id]["length"] / average_length
+                scores[chunk_id] = scores.get(chunk_id, 0.0) + idf * (
+                    frequency * (BM25_K1 + 1) / (frequency + BM25_K1 * length_norm)
+                )
+        ranked = sorted(((score, chunk_id) for chunk_id, score in scores.items()), reverse=True)
+        return ranked[:top_k]
+
+    def select_context(self, query, top_k=5, token_budget=2000):
+        # Joins the top-k relevant chunks that fit within token_budget into a context block.
+        selected, used_tokens = [], 0
+        for _, chunk_id in self.search(query, top_k):
+            chunk = self.chunks[chunk_id]
+            block = f"[{chunk['source']}]\n{chunk['text']}"
+            block_tokens = estimate_tokens(block)
+            if used_tokens + block_tokens > token_budget:
+                continue
+            selected.append(block)
+            used_tokens += block_tokens
+        return "\n\n---\n\n".join(selected)
+
+    def save(self, path):
+
+        data = {
+            "version": INDEX_FORMAT_VERSION,
+            "digest": self.digest,
+            "chunks": [[chunk_id, chunk["source"], chunk["text"], chunk["length"]]
+                       for chunk_id, chunk in self.chunks.items()],
+            "postings": {term: list(term_postings.items()) for term, term_postings in self.postings.items()},
+        }
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.tmp"
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            print(f"Error saving docs index '{path}': {e}")
+
+    @classmethod
+    def load(cls, path):
+        # Loads a persisted index, or returns None if it is missing, unreadable or outdated.
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return None
+        if data.get("version") != INDEX_FORMAT_VERSION:
+            return None
+        index = cls()
+        index.digest = data.get("digest", "")
+        for chunk_id, source, text, length in data.get("chunks", []):
+            index.chunks[chunk_id] = {"source": source, "text": text, "length": length}
+            index.sources.setdefault(source, []).append(chunk_id)
+            index._total_length += length
+            index._next_chunk_id = max(index._next_chunk_id, chunk_id + 1)
+        index.postings = {term: dict(term_postings) for term, term_postings in data.get("postings", {}).items()}
+        return index
@@ -0,0 +1,237 @@
+import os
+import json
+import threading
+from PyQt5.QtCore import Qt, QObject, QThread, QTimer, QFileSystemWatcher, QCoreApplication, pyqtSignal
+from .docs_index import DocsIndex, docs_digest, text_digest
+
+DOC_FILE_EXTENSIONS = (".txt", ".md")
+MANIFEST_FORMAT_VERSION = 1
+WATCH_DEBOUNCE_MS = 500
+
+def scan_docs_tree(docs_dir):
+    # Stat pass over docs_dir and its subdirectories. Returns ({relative path: (mtime_ns, size)},
+    # [directories walked, docs_dir first]).
+    found, directories = {}, []
+    if not os.path.isdir(docs_dir):
+        return found, directories
+    for root, dirs, files in os.walk(docs_dir):
+        dirs[:] = sorted(d for d in dirs if not d.startswith("."))
+        directories.append(root)
+        for filename in files:
+            if not filename.endswith(DOC_FILE_EXTENSIONS):
+                continue
+            full_path = os.path.join(root, filename)
+            try:
+                stat = os.stat(full_path)
+            except OSError:
+                continue
+            source = os.path.relpath(full_path, docs_dir).replace(os.sep, "/")
+            found[source] = (stat.st_mtime_ns, stat.st_size)
+    return found, directories
+
+def load_manifest(path):
+
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return {"version": MANIFEST_FORMAT_VERSION, "index_digest": "", "files": {}}
+    if data.get("version") != MANIFEST_FORMAT_VERSION:
+        return {"version": MANIFEST_FORMAT_VERSION, "index_digest": "", "files": {}}
+    return data
+
+def save_manifest(path, manifest):
+
+    try:
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(manifest, f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+    except OSError as e:
+        print(f"Error saving docs manifest '{path}': {e}")
+
+class DocsScanWorker(QObject):
+    # Brings the index in line with the docs tree; only files whose stat or hash changed are re-read.
+
+    finished = pyqtSignal(int, int, list) # changed file count, total file count, directories to watch
+
+    def __init__(self, loader):
+        super().__init__()
+        self.loader = loader
+
+    def run(self):
+
+        loader = self.loader
+        if loader.index is None:
+            index = DocsIndex.load(loader.index_file) or DocsIndex()
+            manifest = load_manifest(loader.manifest_file)
+            if manifest.get("index_digest") != index.digest:
+                index = DocsIndex() # Manifest and index disagree: rebuild everything
+                manifest["files"] = {}
+            with loader.lock:
+                loader.index, loader.manifest = index, manifest
+
+        known_files = loader.manifest["files"]
+        current_files, directories = scan_docs_tree(loader.docs_dir)
+        updated, touched = {}, {}
+        for source, (mtime_ns, size) in current_files.items():
+            entry = known_files.get(source)
+            if entry and entry["mtime_ns"] == mtime_ns and entry["size"] == size:
+                continue
+            try:
+                with open(os.path.join(loader.docs_dir, source), 'r', encoding='utf-8') as f:
+                    text = f.read()
+            except Exception as e:
+                print(f"Error reading doc file '{source}': {e}")
+                continue
+            new_entry = {"mtime_ns": mtime_ns, "size": size, "sha256": text_digest(text)}
+            if entry and entry["sha256"] == new_entry["sha256"]:
+                touched[source] = new_entry # Only metadata changed; keep the indexed chunks
+            else:
+                updated[source] = (text, new_entry)
+        removed = [source for source in known_files if source not in current_files]
+
+        if updated or removed or touched:
+            with loader.lock:
+                for source in removed:
+                    loader.index.remove_document(source)
+                    known_files.pop(source, None)
+                for source, (text, entry) in updated.items():
+                    loader.index.set_document(source, text)
+                    known_files[source] = entry
+                known_files.update(touched)
+                loader.index.digest = docs_digest({source: entry["sha256"] for source, entry in known_files.items()})
+                loader.manifest["index_digest"] = loader.index.digest
+                loader.full_text = loader.index.full_text()
+            if updated or removed:
+                loader.index.save(loader.index_file)
+            save_manifest(loader.manifest_file, loader.manifest)
+        elif loader.full_text is None:
+            with loader.lock:
+                loader.full_text = loader.index.full_text()
+        self.finished.emit(len(updated) + len(removed), len(known_files), directories)
+
+class DocsLoader(QObject):
+    # Keeps an incrementally updated DocsIndex for docs_dir and watches it for changes.
+
+    docs_updated = pyqtSignal(int, int) # changed file count, total file count
+
+    def __init__(self, docs_dir, index_file, manifest_file, parent=None, watch=True):
+        super().__init__(parent)
+        self.docs_dir = docs_dir
+        self.index_file = index_file
+        self.manifest_file = manifest_file
+        self.lock = threading.Lock()
+        self.index = None # Loaded by the first scan, off the GUI thread
+        self.manifest = None
+        self.full_text = None
+        self._thread = None
+        self._worker = None
+        self._rescan_pending = False
+
+        self._watcher = None # Headless callers scan with refresh_now() and need no watcher
+        if watch:
+            self._watcher = QFileSystemWatcher(self)
+            self._watcher.directoryChanged.connect(self._schedule_refresh)
+            # Files edited in place change no directory entry, so the docs are also rescanned whenever the
+            # user comes back to the app, e.g. from the editor they changed a doc in
+            app = QCoreApplication.instance()
+            if hasattr(app, "applicationStateChanged"):
+                app.applicationStateChanged.connect(self._on_application_state_changed)
+        self._debounce_timer = QTimer(self)
+        self._debounce_timer.setSingleShot(True)
+        self._debounce_timer.setInterval(WATCH_DEBOUNCE_MS)
+        self._debounce_timer.timeout.connect(self.refresh)
+
+    def is_scanning(self):
+
+        return self._thread is not None
+
+    def refresh(self):
+        # Starts a background scan, or queues one if a scan is already running.
+        if self._thread is not None:
+            self._rescan_pending = True
+            return
+        self._thread = QThread(self)
+        self._worker = DocsScanWorker(self)
+        self._worker.moveToThread(self._thread)
+        self._worker.finished.connect(self._thread.quit)
+        self._worker.finished.connect(self._on_scan_finished)
+        self._thread.finished.connect(self._worker.deleteLater)
+        self._thread.finished.connect(self._thread.deleteLater)
+        self._thread.finished.connect(self._on_thread_finished)
+        self._thread.started.connect(self._worker.run)
+        self._thread.start()
+
+    def refresh_now(self):
+        # Synchronous scan in the calling thread, for headless use where no event loop runs.
+        DocsScanWorker(self).run()
+
+    def stop(self, timeout_ms=2000):
+
+        self._debounce_timer.stop()
+        self._rescan_pending = False
+        if self._thread is not None and self._thread.isRunning():
+            self._thread.quit()
+            return self._thread.wait(timeout_ms)
+        return True
+
+    def docs_text(self):
+
+        with self.lock:
+            return self.full_text or ""
+
+    def file_count(self):
+
+        with self.lock:
+            return len(self.manifest["files"]) if self.manifest else 0
+
+    def select_context(self, query, top_k, token_budget):
+
+        with self.lock:
+            if self.index is None:
+                return ""
+            return self.index.select_context(query, top_k, token_budget)
+
+    def has_index(self):
+
+        with self.lock:
+            return self.index is not None and not self.index.is_empty()
+
+    def _schedule_refresh(self, _path=""):
+
+        self._debounce_timer.start()
+
+    def _on_application_state_changed(self, state):
+
+        if state == Qt.ApplicationActive and self.index is not None: # Not before the first scan has run
+            self._schedule_refresh()
+
+    def _on_scan_finished(self, changed_count, total_count, directories):
+
+        self._update_watched_paths(directories)
+        self.docs_updated.emit(changed_count, total_count)
+
+    def _on_thread_finished(self):
+
+        self._thread = None
+        self._worker = None
+        if self._rescan_pending:
+            self._rescan_pending = False
+            self.refresh()
+
+    def _update_watched_paths(self, directories):
+        # Watches the directories from the last scan only: any change to their entries triggers a rescan,
+        # which finds changed files through the manifest's mtime/size diff. One watch per directory instead
+        # of per file keeps large docs trees within the OS watch limits.
+        if self._watcher is None:
+            return
+        wanted = set(directories)
+        watched = set(self._watcher.directories()) | set(self._watcher.files())
+        stale = list(watched - wanted)
+        if stale:
+            self._watcher.removePaths(stale)
+        new_paths = list(wanted - watched)
+        if new_paths:
+            self._watcher.addPaths(new_paths)
@@ -0,0 +1,237 @@
+import time
+import random
+import asyncio
+import hashlib
+import threading
+
+from .token_counter import estimate_tokens
+
+FAKE_SPEC_FIELDS = {
+    "latency_ms": float, "chunks": int, "chunk_interval_ms": float,
+    "error_rate": float, "rate_limit_rate": float, "retry_after_seconds": float, "seed": int,
+    "tail_rate": float, "tail_latency_ms": float, "prefill_ms_per_1k_tokens": float
+}
+
+class FakeUsage:
+
+    def __init__(self, prompt_token_count, candidates_token_count, cached_content_token_count=0):
+        self.prompt_token_count = prompt_token_count # Includes the cached tokens, like the API's count
+        self.candidates_token_count = candidates_token_count
+        self.cached_content_token_count = cached_content_token_count
+
+class FakeCacheUsage:
+
+    def __init__(self, total_token_count):
+        self.total_token_count = total_token_count
+
+class FakeCachedContent:
+    # Stand-in for caching.CachedContent: a prompt prefix the fake backend keeps until it is deleted.
+
+    def __init__(self, name, model_name, prefix_text, ttl_seconds):
+        self.name = name
+        self.model = model_name
+        self.prefix_text = prefix_text
+        self.usage_metadata = FakeCacheUsage(estimate_tokens(prefix_text))
+        self.expires_at = time.monotonic() + ttl_seconds
+        self.deleted = False
+
+class FakeChunk:
+
+    def __init__(self, text):
+        self.text = text
+
+class FakeResponse:
+    # Mimics the SDK's GenerateContentResponse: .text when not streaming, iterable of chunks when streaming
+    # (async iterable for generate_content_async). cancel() aborts the stream like cancelling the gRPC call does.
+
+    def __init__(self, parts, usage_metadata, chunk_interval_s=0.0):
+        self._parts = parts
+        self._chunk_interval_s = chunk_interval_s
+        self._cancelled = threading.Event()
+        self.usage_metadata = usage_metadata
+
+    def cancel(self):
+
+        self._cancelled.set()
+
+    @property
+    def text(self):
+
+        return "".join(self._parts)
+
+    def __iter__(self):
+
+        from google.api_core import exceptions as google_api_core_exceptions
+        for number, part in enumerate(self._parts):
+            if number and self._chunk_interval_s:
+                self._cancelled.wait(self._chunk_interval_s)
+            if self._cancelled.is_set():
+                raise google_api_core_exceptions.Cancelled("Fake stream cancelled.")
+            yield FakeChunk(part)
+
+    async def __aiter__(self):
+
+        for number, part in enumerate(self._parts):
+            if number and self._chunk_interval_s:
+                await asyncio.sleep(self._chunk_interval_s)
+            yield FakeChunk(part)
+
+class FakeTokenCount:
+
+    def __init__(self, total_tokens):
+        self.total_tokens = total_tokens
+
+class FakeGenerativeModel:
+    # Stand-in for genai.GenerativeModel served by a FakeGeminiBackend.
+
+    def __init__(self, backend, model_name, cached_content=None):
+        self.backend = backend
+        self.model_name = model_name
+        self.cached_content = cached_content
+
+    def generate_content(self, prompt, stream=False, request_options=None, **kwargs):
+
+        return self.backend.generate(
+            self.model_name, prompt, stream, (request_options or {}).get("timeout"), self.cached_content
+        )
+
+    async def generate_content_async(self, prompt, stream=False, request_options=None, **kwargs):
+
+        return await self.backend.generate_async(
+            self.model_name, prompt, stream, (request_options or {}).get("timeout"), self.cached_content
+        )
+
+    def count_tokens(self, text):
+
+        return FakeTokenCount(estimate_tokens(text))
+
+class FakeGeminiBackend:
+    # Local backend for benchmarks and offline runs. Responses are derived from the prompt, so the same
+    # prompt always gets the same answer; faults are drawn from a seeded generator, so a run is repeatable.
+    # latency_ms is the time to the first chunk, chunk_interval_ms the gap between chunks; a tail_rate
+    # share of the requests is slow and takes tail_latency_ms to the first chunk instead. Prompt tokens
+    # not served from cached content add prefill_ms_per_1k_tokens to the time to the first chunk.
+
+    def __init__(self, latency_ms=300.0, chunks=8, chunk_interval_ms=25.0, error_rate=0.0,
+                 rate_limit_rate=0.0, retry_after_seconds=1.0, seed=0, tail_rate=0.0, tail_latency_ms=5000.0,
+                 prefill_ms_per_1k_tokens=0.0):
+        self.latency_ms = latency_ms
+        self.chunks = max(1, chunks)
+        self.chunk_interval_ms = chunk_interval_ms
+        self.error_rate = error_rate
+        self.rate_limit_rate = rate_limit_rate
+        self.retry_after_seconds = retry_after_seconds
+        self.tail_rate = tail_rate
+        self.tail_latency_ms = tail_latency_ms
+        self.prefill_ms_per_1k_tokens = prefill_ms_per_1k_tokens
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.fault_count = 0
+        self.cached_contents = {} # name -> FakeCachedContent, until deleted
+
+    @classmethod
+    def from_spec(cls, spec):
+        # Builds a backend from "name=value,..." using the constructor's argument names.
+        options = {}
+        for item in filter(None, (part.strip() for part in spec.split(","))):
+            name, _, value = item.partition("=")
+            name = name.strip()
+            if name not in FAKE_SPEC_FIELDS:
+                raise ValueError(f"Unknown fake backend option '{name}'")
+            options[name] = FAKE_SPEC_FIELDS[name](value)
+        return cls(**options)
+
+    def create_model(self, api_key, model_name):
+
+        return FakeGenerativeModel(self, model_name)
+
+    def create_cached_content(self, api_key, model_name, prefix_text, ttl_seconds):
+
+        with self._lock:
+            cached_content = FakeCachedContent(
+                f"cachedContents/fake-{len(self.cached_contents) + 1}", model_name, prefix_text, ttl_seconds
+            )
+            self.cached_contents[cached_content.name] = cached_content
+        return cached_content
+
+    def extend_cached_content(self, cached_content, ttl_seconds):
+
+        cached_content.expires_at = time.monotonic() + ttl_seconds
+
+    def delete_cached_content(self, cached_content):
+
+        with self._lock:
+            self.cached_contents.pop(cached_content.name, None)
+        cached_content.deleted = True
+
+    def create_model_from_cache(self, api_key, model_name, cached_content):
+
+        return FakeGenerativeModel(self, model_name, cached_content)
+
+    def generate(self, model_name, prompt, stream, timeout=None, cached_content=None):
+
+        draw, latency_s = self._draw(prompt)
+        time.sleep(min(latency_s, timeout) if timeout is not None else latency_s)
+        response = self._response(model_name, prompt, draw, latency_s, timeout, cached_content)
+        if not stream: # Generation time is the same, it just arrives at once
+            time.sleep(self.chunk_interval_ms / 1000 * (len(response._parts) - 1))
+        return response
+
+    async def generate_async(self, model_name, prompt, stream, timeout=None, cached_content=None):
+
+        draw, latency_s = self._draw(prompt)
+        await asyncio.sleep(min(latency_s, timeout) if timeout is not None else latency_s)
+        response = self._response(model_name, prompt, draw, latency_s, timeout, cached_content)
+        if not stream:
+            await asyncio.sleep(self.chunk_interval_ms / 1000 * (len(response._parts) - 1))
+        return response
+
+    def _draw(self, prompt):
+        # Fault draw and time to first chunk of the next request; only prompt (not cached content) is prefilled.
+        with self._lock:
+            self.request_count += 1
+            draw = self._random.random()
+            slow = self._random.random() < self.tail_rate
+        prefill_ms = 0.0
+        if self.prefill_ms_per_1k_tokens:
+            prefill_ms = self.prefill_ms_per_1k_tokens * estimate_tokens(prompt) / 1000
+        return draw, ((self.tail_latency_ms if slow else self.latency_ms) + prefill_ms) / 1000
+
+    def _response(self, model_name, prompt, draw, latency_s, timeout, cached_content=None):
+        # Raises the drawn fault, if any, else builds the response; called once the latency has passed.
+        from google.api_core import exceptions as google_api_core_exceptions
+        if cached_content is not None and (cached_content.deleted or time.monotonic() > cached_content.expires_at):
+            raise google_api_core_exceptions.NotFound(f"Fake cached content {cached_content.name} not found.")
+        if timeout is not None and latency_s > timeout: # Like a gRPC deadline
+            raise google_api_core_exceptions.DeadlineExceeded(f"Fake deadline of {timeout} s exceeded.")
+        if draw < self.rate_limit_rate:
+            self._count_fault()
+            raise google_api_core_exceptions.ResourceExhausted(
+                f"Fake quota exceeded for {model_name}. Please retry in {self.retry_after_seconds}s."
+            )
+        if draw < self.rate_limit_rate + self.error_rate:
+            self._count_fault()
+            raise google_api_core_exceptions.InternalServerError(f"Fake internal error from {model_name}.")
+
+        cached_tokens = cached_content.usage_metadata.total_token_count if cached_content is not None else 0
+        full_prompt = cached_content.prefix_text + prompt if cached_content is not None else prompt
+        parts = self._response_parts(model_name, full_prompt) # Same answer with or without the cache
+        usage = FakeUsage(estimate_tokens(prompt) + cached_tokens, estimate_tokens("".join(parts)), cached_tokens)
+        return FakeResponse(parts, usage, self.chunk_interval_ms / 1000)
+
+    def _count_fault(self):
+
+        with self._lock:
+            self.fault_count += 1
+
+    def _response_parts(self, model_name, prompt):
+        # Markdown with a code block, so rendering costs something realistic; split into self.chunks parts.
+        digest = hashlib.sha256(prompt.encode("utf-8")).hexdigest()
+        lines = [f"### Fake response from {model_name}", "", f"Prompt digest `{digest[:16]}`.", "", "```python"]
+        lines += [f"def step_{i}(value):\n    return value * {int(digest[i % 64], 16) + 1}  # {digest[i:i + 8]}"
+                  for i in range(self.chunks * 2)]
+        lines += ["```", "", "- Deterministic for the same prompt.", "- Served by the local fake backend."]
+        text = "\n".join(lines)
+        size = -(-len(text) // self.chunks) # Ceiling division
+        return [text[i:i + size] for i in range(0, len(text), size)]
@@ -0,0 +1,229 @@
+import io
+import os
+import mmap
+import codecs
+import locale
+import threading
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+from .translation import tr
+from .constants import (ATTACH_READ_CHUNK_BYTES, ATTACH_MMAP_THRESHOLD_BYTES, ATTACH_PIECES_IN_FLIGHT,
+                        ENCODING_SAMPLE_BYTES)
+
+_BOM_ENCODINGS = ( # Longest first: the UTF-32 LE BOM starts with the UTF-16 LE one
+    (codecs.BOM_UTF32_LE, "utf-32"), (codecs.BOM_UTF32_BE, "utf-32"), (codecs.BOM_UTF8, "utf-8-sig"),
+    (codecs.BOM_UTF16_LE, "utf-16"), (codecs.BOM_UTF16_BE, "utf-16"),
+)
+FALLBACK_ENCODING = "cp1252"
+ENCODING_GUESS_TOLERANCE = 0.2 # Chaos difference below which two guesses count as equally good
+
+class BinaryFileError(ValueError):
+    pass
+
+def _is_utf8(sample):
+    # Incremental decode, so a multi-byte character cut off at the end of the sample does not count as an error.
+    try:
+        codecs.getincrementaldecoder("utf-8")().decode(sample, final=False)
+    except UnicodeDecodeError:
+        return False
+    return True
+
+def _codec_name(encoding):
+
+    try:
+        return codecs.lookup(encoding).name
+    except LookupError:
+        return None
+
+def _guess_encoding(sample):
+    # Statistical guess; close calls between legacy code pages (common on short samples) go to the system
+    # code page, then to cp1252. charset_normalizer ships with requests, but is optional all the same.
+    try:
+        from charset_normalizer import from_bytes
+    except ImportError:
+        return None
+    matches = list(from_bytes(sample))
+    if not matches:
+        return None
+    best_chaos = min(match.chaos for match in matches)
+    candidates = {_codec_name(encoding) for match in matches if match.chaos <= best_chaos + ENCODING_GUESS_TOLERANCE
+                  for encoding in match.could_be_from_charset}
+    preferred = [name for name in (_codec_name(locale.getpreferredencoding(False)), FALLBACK_ENCODING)
+                 if name and not name.startswith("utf")] # The sample is not UTF-8, that was checked first
+    for name in preferred:
+        if name in candidates:
+            return name
+    for name in preferred: # Short samples may rank an exotic code page first and leave the usual one out
+        match = from_bytes(sample, cp_isolation=[name], threshold=1.0).best()
+        if match is not None and match.chaos <= best_chaos + ENCODING_GUESS_TOLERANCE:
+            return name
+    return matches[0].encoding
+
+def detect_encoding(sample):
+    # Encoding of a file from its first bytes: BOM, then UTF-8, then a statistical guess, then cp1252.
+    # Raises BinaryFileError for content that is not text at all.
+    for bom, encoding in _BOM_ENCODINGS:
+        if sample.startswith(bom):
+            return encoding
+    if _is_utf8(sample):
+        return "utf-8"
+    if b"\x00" in sample: # UTF-16/32 without a BOM, or binary data
+        encoding = _guess_encoding(sample)
+        if encoding and encoding.replace("_", "-").startswith("utf-"):
+            return encoding
+        raise BinaryFileError(tr("attach_binary_err"))
+    return _guess_encoding(sample) or FALLBACK_ENCODING
+
+def _byte_chunks(f, end, chunk_bytes):
+    # Chunks of the first end bytes of an open binary file; big files are read through mmap.
+    if end >= ATTACH_MMAP_THRESHOLD_BYTES:
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, end, chunk_bytes):
+                yield mapped[offset:min(end, offset + chunk_bytes)]
+        return
+    remaining = end
+    while remaining > 0:
+        chunk = f.read(min(chunk_bytes, remaining))
+        if not chunk:
+            break
+        remaining -= len(chunk)
+        yield chunk
+
+def iter_text_file(path, limit_bytes=None, chunk_bytes=ATTACH_READ_CHUNK_BYTES):
+    # Decoded pieces of a text file, newlines normalized to "\n". The first item is the detected encoding
+    # and the file size; with limit_bytes, reading stops there (dropping a character cut in half).
+    with open(path, 'rb') as f:
+        size = os.fstat(f.fileno()).st_size
+        encoding = detect_encoding(f.read(ENCODING_SAMPLE_BYTES))
+        f.seek(0)
+        yield encoding, size
+        end = size if limit_bytes is None else min(size, limit_bytes)
+        decoder = io.IncrementalNewlineDecoder(codecs.getincrementaldecoder(encoding)(errors="replace"), translate=True)
+        for chunk in _byte_chunks(f, end, chunk_bytes):
+            text = decoder.decode(chunk)
+            if text:
+                yield text
+        if end == size:
+            text = decoder.decode(b"", final=True)
+            if text:
+                yield text
+
+def read_text_file(path, limit_bytes=None):
+    # Whole text of a file as (text, encoding, truncated), for callers that do not need the pieces.
+    pieces = iter_text_file(path, limit_bytes)
+    encoding, size = next(pieces)
+    return "".join(pieces), encoding, limit_bytes is not None and size > limit_bytes
+
+def format_size(num_bytes):
+
+    for unit in ("B", "KB", "MB"):
+        if num_bytes < 1024:
+            return f"{num_bytes:.0f} {unit}" if unit == "B" else f"{num_bytes:.1f} {unit}"
+        num_bytes /= 1024
+    return f"{num_bytes:.1f} GB"
+
+class FileLoadWorker(QObject):
+    # Reads a text file in pieces off the GUI thread. At most ATTACH_PIECES_IN_FLIGHT pieces wait for the
+    # receiver, who calls piece_consumed() after each one, so the GUI event queue is never flooded.
+
+    piece_loaded = pyqtSignal(str)
+    finished = pyqtSignal(str, int, bool) # encoding, file size, truncated
+    error = pyqtSignal(str)
+
+    def __init__(self, path, limit_bytes=None):
+        super().__init__()
+        self.path = path
+        self.limit_bytes = limit_bytes
+        self._slots = threading.Semaphore(ATTACH_PIECES_IN_FLIGHT)
+        self._is_running = True
+
+    def run(self):
+
+        try:
+            pieces = iter_text_file(self.path, self.limit_bytes)
+            encoding, size = next(pieces)
+            for text in pieces:
+                self._slots.acquire()
+                if not self._is_running:
+                    pieces.close()
+                    return
+                self.piece_loaded.emit(text)
+        except BinaryFileError as e:
+            self.error.emit(str(e))
+            return
+        except (OSError, ValueError) as e:
+            self.error.emit(tr("file_not_found_err", str(e)))
+            return
+        if self._is_running:
+            self.finished.emit(encoding, size, self.limit_bytes is not None and size > self.limit_bytes)
+
+    def piece_consumed(self):
+
+        self._slots.release()
+
+    def stop(self):
+        # Safe to call from any thread; the worker drops the rest of the file.
+        self._is_running = False
+        self._slots.release()
+
+class FileLoader(QObject):
+    # Runs one FileLoadWorker at a time on its own thread; starting a new load abandons the previous one.
+
+    piece_loaded = pyqtSignal(str)
+    finished = pyqtSignal(str, int, bool) # encoding, file size, truncated
+    error = pyqtSignal(str)
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._thread = None
+        self._worker = None
+
+    def is_loading(self):
+
+        return self._worker is not None
+
+    def load(self, path, limit_bytes=None):
+
+        self.stop(0)
+        thread, worker = QThread(self), FileLoadWorker(path, limit_bytes)
+        worker.moveToThread(thread)
+        worker.piece_loaded.connect(lambda text: self._forward_piece(worker, text))
+        worker.finished.connect(lambda *result: self._forward_result(worker, self.finished, *result))
+        worker.error.connect(lambda error_msg: self._forward_result(worker, self.error, error_msg))
+        worker.finished.connect(thread.quit)
+        worker.error.connect(thread.quit)
+        thread.finished.connect(worker.deleteLater)
+        thread.finished.connect(thread.deleteLater)
+        thread.finished.connect(lambda: self._on_thread_finished(thread))
+        thread.started.connect(worker.run)
+        self._thread, self._worker = thread, worker
+        thread.start()
+
+    def _forward_piece(self, worker, text):
+        # Drops what an abandoned worker still had queued; the worker reads on once the piece is handled.
+        if worker is not self._worker:
+            return
+        self.piece_loaded.emit(text)
+        worker.piece_consumed()
+
+    def _forward_result(self, worker, signal, *args):
+
+        if worker is not self._worker:
+            return
+        self._worker = None
+        signal.emit(*args)
+
+    def _on_thread_finished(self, thread):
+
+        if thread is self._thread:
+            self._thread = None
+
+    def stop(self, timeout_ms=2000):
+        # Abandons the current load; returns False if its thread is still running after timeout_ms.
+        thread, worker = self._thread, self._worker
+        self._worker = None
+        if worker is not None:
+            worker.stop()
+        if thread is not None and thread.isRunning():
+            thread.quit() # Also ends a thread whose worker already returned without a signal
+            return thread.wait(timeout_ms) if timeout_ms else False
+        return True
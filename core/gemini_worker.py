@@ -1,27 +1,106 @@
+import time
+import queue
+import threading
 from PyQt5.QtCore import QObject, pyqtSignal
-import google.generativeai as genai
-from google.generativeai import types
-from google.generativeai.types import HarmCategory, HarmBlockThreshold
-from google.api_core import exceptions as google_api_core_exceptions
 from .translation import tr
-from .constants import AVAILABLE_MODELS, DEFAULT_MODEL
+from .markdown_render import render_markdown
+from .client_pool import model_pool
+from .context_cache import context_cache
+from .rate_limiter import get_rate_limiter, retry_hint_seconds, backoff_delay
+from .token_counter import estimate_tokens, input_token_limit
+from .tracing import span
+from .hedging import latency_history, hedge_backup_model, hedge_delay_seconds
+from .constants import (AVAILABLE_MODELS, DEFAULT_MODEL, RATE_LIMIT_MAX_RETRIES, MODEL_REQUEST_TIMEOUTS_SECONDS,
+                        DEFAULT_REQUEST_TIMEOUT_SECONDS, WORKER_STOP_POLL_SECONDS)
+
+_request_timeout_override = {"seconds": 0}
+
+class RequestTimeout(Exception):
+    # Raised by the worker itself when an attempt outlives its deadline.
+    pass
+
+def resolve_model_name(model_name):
+
+    return model_name if model_name and model_name in AVAILABLE_MODELS else DEFAULT_MODEL
+
+def set_request_timeout_override(seconds=0):
+    # Deadline from the settings for every model (0 keeps the per-model default).
+    _request_timeout_override["seconds"] = max(0, int(seconds or 0))
+
+def request_timeout_seconds(model_name):
+
+    return _request_timeout_override["seconds"] or MODEL_REQUEST_TIMEOUTS_SECONDS.get(
+        model_name, DEFAULT_REQUEST_TIMEOUT_SECONDS
+    )
+
+def api_error_message(exception, timeout_seconds):
+    # User-facing description of an exception raised by an API call.
+    from google.api_core import exceptions as google_api_core_exceptions
+    error_message = f"Gemini API Error ({type(exception).__name__}): {str(exception)}"
+    if isinstance(exception, (RequestTimeout, google_api_core_exceptions.DeadlineExceeded)):
+        return tr("request_timeout_err", seconds=timeout_seconds)
+    if isinstance(exception, google_api_core_exceptions.ResourceExhausted):
+        error_message += "\n\n" + tr("api_rate_limit_exceeded")
+    elif isinstance(exception, google_api_core_exceptions.InvalidArgument):
+        error_message += "\n\n" + tr("api_invalid_argument")
+    return error_message
+
+def build_docs_prefix(docs_context):
+    # The docs part of a full prompt; also what core.context_cache uploads as cached content.
+    return f"Additional project context:\n{docs_context}\n\n"
+
+def build_task_prompt(prompt_text):
+    # The part of a full prompt after the docs prefix.
+    return f"---\n\nTask:\n{prompt_text}"
+
+def build_full_prompt(prompt_text, docs_context=""):
+
+    if not docs_context:
+        return prompt_text
+    return build_docs_prefix(docs_context) + build_task_prompt(prompt_text)
+
+def hedge_model(api_key, model_name, prompt_text, docs_context, full_prompt):
+    # (model, prompt) for a hedge to model_name, or None if its quota has no room right now: a hedge never
+    # waits, so it uses the backup's cached docs only if they are already uploaded, else sends them inline.
+    if not get_rate_limiter(model_name).try_acquire(estimate_tokens(full_prompt)):
+        return None
+    try:
+        cached_model = context_cache.model_for(api_key, model_name, docs_context, create=False)
+        if cached_model is not None:
+            return cached_model, build_task_prompt(prompt_text)
+        return model_pool.get_model(api_key, model_name), full_prompt
+    except Exception as e:
+        print(f"Warning: could not hedge with {model_name}: {e}")
+        return None
 
 class GeminiWorker(QObject):
 
+    chunk_received = pyqtSignal(str)
+    usage_reported = pyqtSignal(int, int) # prompt tokens, response tokens
+    retrying = pyqtSignal(int, float) # retry number, delay in seconds
     finished = pyqtSignal(str)
     error = pyqtSignal(str)
 
-    def __init__(self, api_key, model_name_from_settings, prompt_text, docs_context=""):
+    def __init__(self, api_key, model_name_from_settings, prompt_text, docs_context="", stream=True, trace=None):
         super().__init__()
         self.api_key = api_key
-        self.model_name = model_name_from_settings if model_name_from_settings and model_name_from_settings in AVAILABLE_MODELS else DEFAULT_MODEL
+        self.model_name = resolve_model_name(model_name_from_settings)
         self.prompt_text = prompt_text
         self.docs_context = docs_context
+        self.stream = stream
+        self.trace = trace # core.tracing.RequestTrace receiving this worker's spans, or None
+        self.timeout_seconds = request_timeout_seconds(self.model_name)
         self._is_running = True
+        self._chunks_emitted = False
+        self._active_responses = set() # Open responses; two while a hedged request races
+        self.answered_by = self.model_name # Model the finished answer came from; the backup after a won hedge
 
     def stop(self):
-
+        # Safe to call from any thread. run() returns within WORKER_STOP_POLL_SECONDS and an open
+        # response stream is cancelled, so the connection is released too.
         self._is_running = False
+        for response in list(self._active_responses):
+            _cancel_response(response)
 
     def run(self):
 
@@ -34,52 +113,289 @@ class GeminiWorker(QObject):
             return
 
         try:
-            genai.configure(api_key=self.api_key)
+            with span(self.trace, "model_setup"):
+                model = model_pool.get_model(self.api_key, self.model_name)
         except Exception as e:
             if self._is_running:
                 self.error.emit(tr("api_request_failed_err", f"API Key config error: {e}"))
             return
         if not self._is_running: return
 
-        full_prompt = self.prompt_text
-        if self.docs_context:
-            full_prompt = (
-                f"Additional project context:\n{self.docs_context}\n\n"
-                f"---\n\nTask:\n{self.prompt_text}"
-            )
+        with span(self.trace, "prompt_build"):
+            full_prompt = build_full_prompt(self.prompt_text, self.docs_context)
+            estimated_tokens, token_limit = estimate_tokens(full_prompt), input_token_limit(self.model_name)
+        if estimated_tokens > token_limit: # The API would reject it, but only after a slow upload
+            if self._is_running:
+                self.error.emit(tr("input_over_budget_err", tokens=estimated_tokens, budget=token_limit))
+            return
+        prompt = full_prompt
+        if context_cache.is_eligible(self.model_name, self.docs_context):
+            with span(self.trace, "context_cache"): # Uploads the docs prefix if this model has no handle yet
+                cached_model = context_cache.model_for(self.api_key, self.model_name, self.docs_context)
+            if cached_model is not None:
+                model, prompt = cached_model, build_task_prompt(self.prompt_text)
+                if self.trace is not None:
+                    self.trace.set(context_cached=True)
 
         try:
-            model = genai.GenerativeModel(self.model_name)
-            generation_config = types.GenerationConfig(temperature=0.7, max_output_tokens=8192)
-            safety_settings = {
-                HarmCategory.HARM_CATEGORY_HARASSMENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_HATE_SPEECH: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_SEXUALLY_EXPLICIT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-                HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
-            }
-
-            if not self._is_running: return
-            response = model.generate_content(
-                full_prompt,
-                generation_config=generation_config,
-                safety_settings=safety_settings
-            )
             if not self._is_running: return
+            result_text, response = self._generate_with_retries(model, prompt, full_prompt)
+            if result_text is None: return # Stopped while waiting, retrying or streaming
 
-            if response.text:
-                if self._is_running: self.finished.emit(response.text)
+            if result_text:
+                self._report_usage(response)
+                with span(self.trace, "markdown_render"):
+                    render_markdown(result_text) # Warm the render cache off the GUI thread
+                if self._is_running: self.finished.emit(result_text)
             else:
                 error_detail = "No content generated by API."
 
                 if self._is_running: self.error.emit(tr("api_request_failed_err", error_detail))
         except Exception as e: # Catch more general exceptions during API call
-            error_type_name = type(e).__name__
-            error_message = f"Gemini API Error ({error_type_name}): {str(e)}"
-            if isinstance(e, google_api_core_exceptions.ResourceExhausted):
-                 error_message += "\n\n" + tr("api_rate_limit_exceeded")
-            elif isinstance(e, google_api_core_exceptions.InvalidArgument):
-                 error_message += "\n\n" + tr("api_invalid_argument")
             if self._is_running:
-                self.error.emit(tr("api_request_failed_err", error_message))
+                self.error.emit(tr("api_request_failed_err", api_error_message(e, self.timeout_seconds)))
         finally:
             self._is_running = False
+
+    def _generate_with_retries(self, model, prompt, full_prompt):
+        # Every attempt goes through the model's shared rate limiter. ResourceExhausted is retried with
+        # backoff (honoring the server's retry hint) as long as nothing has been streamed to the UI yet.
+        # prompt is what model is sent: full_prompt, or its task part for a model over the cached docs.
+        # Returns (result text, response), or (None, None) if the worker was stopped.
+        from google.api_core import exceptions as google_api_core_exceptions # Deferred with the SDK, see client_pool
+        limiter = get_rate_limiter(self.model_name)
+        estimated_tokens = estimate_tokens(full_prompt) # Cached tokens count against the quota too
+        attempt = 0
+        while True:
+            with span(self.trace, "rate_limit_wait"):
+                acquired = limiter.acquire(estimated_tokens, lambda: self._is_running)
+            if not acquired:
+                return None, None
+            try:
+                outcome = self._run_abortable(
+                    lambda abandoned: self._hedged_attempt(model, prompt, full_prompt, abandoned)
+                )
+                if outcome is None: return None, None # Stopped mid-request
+                result_text, response = outcome
+                if result_text is None: return None, None
+            except google_api_core_exceptions.ResourceExhausted as e:
+                if attempt >= RATE_LIMIT_MAX_RETRIES or self._chunks_emitted or not self._is_running:
+                    raise
+                delay = backoff_delay(attempt, retry_hint_seconds(e))
+                limiter.pause(delay) # Other requests to this model back off too
+                attempt += 1
+                self.retrying.emit(attempt, delay)
+                continue
+            except google_api_core_exceptions.NotFound:
+                if prompt is full_prompt or self._chunks_emitted or not self._is_running:
+                    raise
+                # The cached docs expired or were deleted on the server; send them inline from now on
+                context_cache.discard(model)
+                model, prompt = model_pool.get_model(self.api_key, self.model_name), full_prompt
+                continue
+            usage = getattr(response, "usage_metadata", None)
+            prompt_tokens = getattr(usage, "prompt_token_count", 0) if usage is not None else 0
+            if prompt_tokens:
+                limiter.settle(estimated_tokens, prompt_tokens)
+            return result_text, response
+
+    def _hedged_attempt(self, model, prompt, full_prompt, abandoned):
+        # Runs _attempt on the primary model. With hedging on, if no first token has arrived within the
+        # hedge delay the same request also goes to the backup model; whichever produces output first
+        # answers and the other is cancelled. Returns like _attempt.
+        backup_model_name = hedge_backup_model(self.model_name)
+        if backup_model_name is None:
+            return self._attempt(model, self.model_name, self.timeout_seconds, prompt, abandoned)
+
+        race = _HedgeRace()
+        results = queue.Queue()
+
+        def start(contender, contender_model, contender_prompt):
+            race.contenders.append(contender)
+
+            def target():
+                try:
+                    outcome = self._attempt(contender_model, contender.model_name, contender.timeout_seconds,
+                                            contender_prompt, contender, contender)
+                    results.put((contender, outcome, None))
+                except Exception as e:
+                    results.put((contender, None, e))
+                race.changed.set()
+            threading.Thread(target=target, daemon=True, name="gemini-hedge").start()
+
+        start(_HedgeContender(race, self.model_name, self.timeout_seconds, "", abandoned), model, prompt)
+        hedge_delay = hedge_delay_seconds(self.model_name)
+        race.changed.wait(hedge_delay)
+        if race.winner is None and results.empty() and not abandoned.is_set():
+            backup = self._hedge_model(backup_model_name, full_prompt)
+            if backup is not None:
+                if self.trace is not None:
+                    self.trace.set(hedged_to=backup_model_name, hedge_delay_ms=round(hedge_delay * 1000, 2))
+                start(_HedgeContender(race, backup_model_name, request_timeout_seconds(backup_model_name),
+                                      "backup_", abandoned), *backup)
+
+        unanswered, first_error = [], None
+        while len(unanswered) < len(race.contenders):
+            try:
+                contender, outcome, error = results.get(timeout=WORKER_STOP_POLL_SECONDS)
+            except queue.Empty:
+                if abandoned.is_set(): return None, None
+                continue
+            if contender is race.winner:
+                if error is not None: raise error
+                self.answered_by = contender.model_name
+                if self.trace is not None and len(race.contenders) > 1:
+                    self.trace.set(answered_by=contender.model_name)
+                return outcome
+            if race.winner is None: # Failed (or came back empty) before producing anything
+                unanswered.append(outcome)
+                first_error = first_error or error
+        if first_error is not None and not any(outcome for outcome in unanswered):
+            raise first_error
+        return next(outcome for outcome in unanswered if outcome)
+
+    def _hedge_model(self, model_name, full_prompt):
+
+        return hedge_model(self.api_key, model_name, self.prompt_text, self.docs_context, full_prompt)
+
+    def _attempt(self, model, model_name, timeout_seconds, prompt, abandoned, contender=None):
+        # One API call; runs on a helper thread (see _run_abortable). Returns (result text, response),
+        # with None as the text if the attempt was abandoned or lost a hedge race.
+        span_prefix = contender.span_prefix if contender is not None else ""
+        started_at = time.perf_counter()
+
+        def on_first_output():
+            # Runs before anything is shown; False means another contender answered first.
+            latency_history.record(model_name, time.perf_counter() - started_at)
+            return contender is None or contender.claim()
+
+        with span(self.trace, span_prefix + "network"):
+            # Generation config and safety settings are bound to the pooled model
+            response = model.generate_content(
+                prompt, stream=self.stream, request_options={"timeout": timeout_seconds}
+            )
+        self._active_responses.add(response)
+        if contender is not None:
+            contender.response = response
+        if abandoned.is_set():
+            _cancel_response(response)
+            return None, response
+        try:
+            with span(self.trace, span_prefix + ("stream" if self.stream else "response_read")):
+                if self.stream:
+                    return self._consume_stream(response, abandoned, on_first_output), response
+                result_text = response.text
+                return (result_text if on_first_output() else None), response
+        finally:
+            self._active_responses.discard(response)
+
+    def _run_abortable(self, call):
+        # The SDK call blocks until the server answers and cannot be interrupted, so it runs on a daemon
+        # thread while this one waits. Returns call()'s result, or None as soon as the worker is stopped;
+        # the abandoned call ends on its own at the latest at its request deadline.
+        # Raises call()'s exception, or RequestTimeout when the deadline passes first.
+        outcome = queue.Queue(maxsize=1)
+        abandoned = threading.Event() # Tells call(abandoned) to stop emitting chunks
+
+        def target():
+            try:
+                outcome.put((True, call(abandoned)))
+            except Exception as e:
+                outcome.put((False, e))
+
+        threading.Thread(target=target, daemon=True, name="gemini-call").start()
+        deadline = time.monotonic() + self.timeout_seconds
+        while True:
+            try:
+                succeeded, value = outcome.get(timeout=WORKER_STOP_POLL_SECONDS)
+            except queue.Empty:
+                timed_out = time.monotonic() > deadline
+                if timed_out or not self._is_running:
+                    abandoned.set()
+                    for response in list(self._active_responses):
+                        _cancel_response(response)
+                if not self._is_running:
+                    return None
+                if timed_out:
+                    raise RequestTimeout(f"No answer within {self.timeout_seconds} s")
+                continue
+            if succeeded:
+                return value
+            raise value
+
+    def _report_usage(self, response):
+
+        usage = getattr(response, "usage_metadata", None)
+        if usage is not None and self._is_running:
+            self.usage_reported.emit(
+                getattr(usage, "prompt_token_count", 0) or 0,
+                getattr(usage, "candidates_token_count", 0) or 0
+            )
+
+    def _consume_stream(self, response, abandoned=None, on_first_output=None):
+        # Emits each streamed chunk as it arrives; returns the full text, or None if stopped.
+        # on_first_output() runs before the first chunk is emitted and can veto the stream by returning False.
+        parts = []
+        for chunk in response:
+            if not self._is_running or (abandoned is not None and abandoned.is_set()): return None
+            try:
+                chunk_text = chunk.text
+            except ValueError: # Chunk without text parts (e.g. finish reason only)
+                chunk_text = ""
+            if chunk_text:
+                if not parts and on_first_output is not None and not on_first_output(): return None
+                parts.append(chunk_text)
+                self._chunks_emitted = True
+                self.chunk_received.emit(chunk_text)
+        return "".join(parts)
+
+class _HedgeRace:
+    # The attempts of one hedged request. The first to produce output wins; the others are cancelled.
+
+    def __init__(self):
+        self.winner = None
+        self.contenders = []
+        self.changed = threading.Event() # Set when a contender wins or finishes
+        self._lock = threading.Lock()
+
+    def claim(self, contender):
+
+        with self._lock:
+            if self.winner is not None:
+                return self.winner is contender
+            self.winner = contender
+        self.changed.set()
+        for other in self.contenders:
+            if other is not contender and other.response is not None:
+                _cancel_response(other.response)
+        return True
+
+class _HedgeContender:
+    # One attempt in a _HedgeRace. Also serves as the attempt's abandoned flag: it is set once the whole
+    # request is abandoned or another contender has won.
+
+    def __init__(self, race, model_name, timeout_seconds, span_prefix, abandoned):
+        self.race = race
+        self.model_name = model_name
+        self.timeout_seconds = timeout_seconds
+        self.span_prefix = span_prefix
+        self.response = None
+        self._abandoned = abandoned
+
+    def is_set(self):
+
+        return self._abandoned.is_set() or self.race.winner not in (None, self)
+
+    def claim(self):
+
+        return self.race.claim(self)
+
+def _cancel_response(response):
+    # Cancels an open response stream. The SDK keeps the gRPC call on the response's _iterator;
+    # the fake backend's responses have a cancel() of their own.
+    cancel = getattr(response, "cancel", None) or getattr(getattr(response, "_iterator", None), "cancel", None)
+    if cancel is not None:
+        try:
+            cancel()
+        except Exception as e:
+            print(f"Warning: could not cancel the response stream: {e}")
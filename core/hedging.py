@@ -0,0 +1,56 @@
+import threading
+from collections import deque
+
+from .tracing import percentile
+from .constants import (AVAILABLE_MODELS, DEFAULT_HEDGE_BACKUP_MODEL, DEFAULT_HEDGE_PERCENTILE,
+                        HEDGE_LATENCY_HISTORY_SIZE, HEDGE_MIN_SAMPLES, DEFAULT_HEDGE_DELAY_SECONDS,
+                        MIN_HEDGE_DELAY_SECONDS)
+
+class LatencyHistory:
+    # Recent time-to-first-token samples per model, shared by the GUI workers and the batch CLI.
+
+    def __init__(self, size=HEDGE_LATENCY_HISTORY_SIZE):
+        self.size = size
+        self._samples = {}
+        self._lock = threading.Lock()
+
+    def record(self, model_name, seconds):
+
+        with self._lock:
+            self._samples.setdefault(model_name, deque(maxlen=self.size)).append(seconds)
+
+    def samples(self, model_name):
+
+        with self._lock:
+            return list(self._samples.get(model_name, ()))
+
+    def percentile(self, model_name, pct):
+        # Seconds, or None while there are fewer than HEDGE_MIN_SAMPLES samples.
+        samples = self.samples(model_name)
+        return percentile(samples, pct) if len(samples) >= HEDGE_MIN_SAMPLES else None
+
+    def clear(self):
+
+        with self._lock:
+            self._samples.clear()
+
+latency_history = LatencyHistory()
+
+_hedge_options = {"enabled": False, "backup_model": DEFAULT_HEDGE_BACKUP_MODEL, "percentile": DEFAULT_HEDGE_PERCENTILE}
+
+def set_hedging_options(enabled=False, backup_model=DEFAULT_HEDGE_BACKUP_MODEL, pct=DEFAULT_HEDGE_PERCENTILE):
+    # Applies the hedging settings to every request started afterwards.
+    _hedge_options["enabled"] = bool(enabled)
+    _hedge_options["backup_model"] = backup_model if backup_model in AVAILABLE_MODELS else DEFAULT_HEDGE_BACKUP_MODEL
+    _hedge_options["percentile"] = min(99, max(50, int(pct or DEFAULT_HEDGE_PERCENTILE)))
+
+def hedge_backup_model(model_name):
+    # Model to hedge requests to model_name with, or None when hedging is off for it.
+    backup_model = _hedge_options["backup_model"]
+    return backup_model if _hedge_options["enabled"] and backup_model != model_name else None
+
+def hedge_delay_seconds(model_name):
+    # How long the primary model gets to produce its first token before the backup is asked too.
+    # Tuned from the model's recent latencies; a fixed default until enough have been seen.
+    delay = latency_history.percentile(model_name, _hedge_options["percentile"])
+    return max(MIN_HEDGE_DELAY_SECONDS, DEFAULT_HEDGE_DELAY_SECONDS if delay is None else delay)
@@ -0,0 +1,212 @@
+import os
+import sqlite3
+import threading
+from collections import deque
+from PyQt5.QtCore import QObject, pyqtSignal
+from .constants import INTERACTIONS_MAX_ROWS
+
+SCHEMA_VERSION = 1
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS interactions (
+    id INTEGER PRIMARY KEY AUTOINCREMENT,
+    timestamp TEXT NOT NULL,
+    tab TEXT NOT NULL DEFAULT '',
+    model TEXT NOT NULL DEFAULT '',
+    language TEXT NOT NULL DEFAULT '',
+    prompt TEXT NOT NULL,
+    response TEXT NOT NULL,
+    is_error INTEGER NOT NULL DEFAULT 0,
+    latency_ms INTEGER,
+    prompt_tokens INTEGER,
+    response_tokens INTEGER
+);
+CREATE INDEX IF NOT EXISTS idx_interactions_timestamp ON interactions(timestamp);
+CREATE INDEX IF NOT EXISTS idx_interactions_tab ON interactions(tab);
+"""
+
+_FTS_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS interactions_fts USING fts5(
+    prompt, response, content='interactions', content_rowid='id'
+);
+CREATE TRIGGER IF NOT EXISTS interactions_ai AFTER INSERT ON interactions BEGIN
+    INSERT INTO interactions_fts(rowid, prompt, response) VALUES (new.id, new.prompt, new.response);
+END;
+CREATE TRIGGER IF NOT EXISTS interactions_ad AFTER DELETE ON interactions BEGIN
+    INSERT INTO interactions_fts(interactions_fts, rowid, prompt, response)
+    VALUES ('delete', old.id, old.prompt, old.response);
+END;
+"""
+
+_COLUMNS = ("id", "timestamp", "tab", "model", "language", "prompt", "response",
+            "is_error", "latency_ms", "prompt_tokens", "response_tokens")
+
+def fts_query(text):
+    # Turns free user text into an FTS5 query: every word must match, as a prefix.
+    words = [word.replace('"', '""') for word in text.split()]
+    return " ".join(f'"{word}"*' for word in words if word)
+
+class InteractionStore:
+    # SQLite store of every request/response pair with full-text search and paginated reads.
+
+    def __init__(self, db_path, max_rows=INTERACTIONS_MAX_ROWS):
+        self.db_path = db_path
+        self.max_rows = max_rows # Older rows are deleted on insert; None keeps everything
+        self._lock = threading.Lock()
+        os.makedirs(os.path.dirname(db_path) or ".", exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        try:
+            self._conn.executescript(_FTS_SCHEMA)
+            self.has_fts = True
+        except sqlite3.OperationalError: # SQLite built without FTS5: fall back to LIKE scans
+            self.has_fts = False
+        self._conn.execute(f"PRAGMA user_version={SCHEMA_VERSION}")
+        self._conn.commit()
+
+    def add(self, timestamp, prompt, response, tab="", model="", language="", is_error=False,
+            latency_ms=None, prompt_tokens=None, response_tokens=None):
+
+        with self._lock:
+            cursor = self._conn.execute(
+                "INSERT INTO interactions (timestamp, tab, model, language, prompt, response, is_error, "
+                "latency_ms, prompt_tokens, response_tokens) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (timestamp, tab, model, language, prompt, response, int(is_error),
+                 latency_ms, prompt_tokens, response_tokens)
+            )
+            if self.max_rows is not None: # The delete trigger keeps the search index in step
+                self._conn.execute(
+                    "DELETE FROM interactions WHERE id <= ?", (cursor.lastrowid - self.max_rows,)
+                )
+            self._conn.commit()
+            return cursor.lastrowid
+
+    def get(self, interaction_id):
+
+        with self._lock:
+            row = self._conn.execute(
+                f"SELECT {', '.join(_COLUMNS)} FROM interactions WHERE id = ?", (interaction_id,)
+            ).fetchone()
+        return dict(row) if row else None
+
+    def count(self, query="", tab=None):
+
+        where, params = self._where(query, tab)
+        with self._lock:
+            return self._conn.execute(f"SELECT COUNT(*) FROM interactions {where}", params).fetchone()[0]
+
+    def page(self, offset=0, limit=20, query="", tab=None):
+        # Returns rows newest first.
+        where, params = self._where(query, tab)
+        columns = ", ".join(f"interactions.{column}" for column in _COLUMNS)
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT {columns} FROM interactions {where} ORDER BY interactions.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    def page_ids(self, offset=0, limit=20, query="", tab=None):
+        # Lightweight variant of page(): [(id, prompt + response length)], newest first.
+        where, params = self._where(query, tab)
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT interactions.id, LENGTH(interactions.prompt) + LENGTH(interactions.response) "
+                f"FROM interactions {where} ORDER BY interactions.id DESC LIMIT ? OFFSET ?",
+                params + [limit, offset]
+            ).fetchall()
+        return [(row[0], row[1]) for row in rows]
+
+    def close(self):
+
+        with self._lock:
+            self._conn.close()
+
+    def _where(self, query, tab):
+
+        clauses, params = [], []
+        query = (query or "").strip()
+        if query and self.has_fts:
+            clauses.append("interactions.id IN (SELECT rowid FROM interactions_fts WHERE interactions_fts MATCH ?)")
+            params.append(fts_query(query))
+        elif query:
+            clauses.append("(interactions.prompt LIKE ? OR interactions.response LIKE ?)")
+            params += [f"%{query}%", f"%{query}%"]
+        if tab:
+            clauses.append("interactions.tab = ?")
+            params.append(tab)
+        return ("WHERE " + " AND ".join(clauses)) if clauses else "", params
+
+class InteractionWriter(QObject):
+    # Adds interactions to an InteractionStore from a writer thread, so the GUI thread never waits for the
+    # insert, the search index update or the commit. interaction_added reports the new row once it is stored.
+
+    interaction_added = pyqtSignal(int, int) # Row id, prompt + response length; emitted from the writer thread
+    write_failed = pyqtSignal(str)
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self._condition = threading.Condition()
+        self._pending = deque() # add() keyword arguments, oldest first
+        self._written = 0
+        self._queued = 0
+        self._closing = False
+        self._thread = None
+
+    def start(self):
+
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name="interaction-writer")
+            self._thread.start()
+
+    def add(self, timestamp, prompt, response, **fields):
+        # Queues an interaction; takes the same arguments as InteractionStore.add. Never blocks.
+        with self._condition:
+            if self._closing:
+                return
+            self._pending.append(dict(fields, timestamp=timestamp, prompt=prompt, response=response))
+            self._queued += 1
+            self._condition.notify_all()
+
+    def flush(self, timeout_seconds=None):
+        # Waits until everything queued so far is stored; returns False if that took longer than the timeout.
+        with self._condition:
+            if self._thread is None:
+                return not self._pending
+            target = self._queued
+            return self._condition.wait_for(lambda: self._written >= target, timeout_seconds)
+
+    def close(self, timeout_seconds=2.0):
+        # Stores what is queued and stops the writer thread. Returns True if it ended within the timeout.
+        with self._condition:
+            self._closing = True
+            thread = self._thread
+            self._condition.notify_all()
+        if thread is None:
+            return True
+        thread.join(timeout_seconds)
+        return not thread.is_alive()
+
+    def _run(self):
+
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._closing)
+                if not self._pending:
+                    return
+                fields = self._pending.popleft()
+            try:
+                interaction_id = self.store.add(**fields)
+            except sqlite3.Error as e:
+                print(f"Error writing to interaction store: {e}")
+                self.write_failed.emit(str(e))
+            else:
+                self.interaction_added.emit(interaction_id, len(fields["prompt"]) + len(fields["response"]))
+            with self._condition:
+                self._written += 1
+                self._condition.notify_all()
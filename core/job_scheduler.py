@@ -0,0 +1,240 @@
+import bisect
+import itertools
+from collections import deque
+from PyQt5.QtCore import QObject, QThread, pyqtSignal
+
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 1
+PRIORITY_LOW = 2
+
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_DONE = "done"
+JOB_CANCELLED = "cancelled"
+
+class GeminiJob:
+
+    def __init__(self, job_id, group, worker, priority, serial,
+                 on_started=None, on_chunk=None, on_finished=None, on_error=None, on_usage=None, on_cancelled=None):
+        self.job_id = job_id
+        self.group = group
+        self.worker = worker
+        self.priority = priority
+        self.serial = serial # Serial jobs never run alongside another job of the same group
+        self.on_started = on_started
+        self.on_chunk = on_chunk
+        self.on_finished = on_finished
+        self.on_error = on_error
+        self.on_usage = on_usage
+        self.on_cancelled = on_cancelled
+        self.thread = None
+        self.state = JOB_QUEUED
+
+    def sort_key(self):
+
+        return (self.priority, self.job_id)
+
+class GeminiJobScheduler(QObject):
+    # Bounded pool of worker threads fed from per-group (per-tab) priority queues. Workers that run on
+    # the asyncio engine (core.async_engine.AsyncGeminiWorker) take a slot but no thread.
+
+    queue_changed = pyqtSignal(int, int) # running count, queued count
+    job_retrying = pyqtSignal(int, int, float) # job id, retry number, delay in seconds
+
+    def __init__(self, max_in_flight=3, parent=None):
+        super().__init__(parent)
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._ids = itertools.count(1)
+        self._queues = {} # group -> jobs sorted by (priority, job_id)
+        self._group_order = deque() # Round-robin order between groups with equal priority
+        self._served_groups = set() # Groups that have had a turn; the others queue at the front, in order
+        self._running = {} # job_id -> job
+        self._stopping = {} # job_id -> cancelled job whose thread is still winding down (kept referenced)
+        self._accepting = True
+
+    def set_max_in_flight(self, max_in_flight):
+
+        self.max_in_flight = max(1, int(max_in_flight))
+        self._dispatch()
+
+    def submit(self, group, worker, priority=PRIORITY_NORMAL, serial=True,
+               on_started=None, on_chunk=None, on_finished=None, on_error=None, on_usage=None, on_cancelled=None):
+        # Queues a GeminiWorker and returns its job id. Callbacks run on the GUI thread.
+        if not self._accepting:
+            return None
+        job = GeminiJob(next(self._ids), group, worker, priority, serial,
+                        on_started, on_chunk, on_finished, on_error, on_usage, on_cancelled)
+        queue = self._queues.setdefault(group, [])
+        if group not in self._group_order: # Never served yet: its turn comes before the groups that were
+            unserved = sum(1 for _ in itertools.takewhile(lambda g: g not in self._served_groups, self._group_order))
+            self._group_order.insert(unserved, group)
+        keys = [queued.sort_key() for queued in queue]
+        queue.insert(bisect.bisect(keys, job.sort_key()), job)
+        self._dispatch()
+        self._emit_queue_changed()
+        return job.job_id
+
+    def cancel(self, job_id):
+        # Drops a queued job, or stops a running one. Its slot goes to the next queued job right away;
+        # the stopped worker's thread ends shortly after (see GeminiWorker.stop). Returns True if found.
+        for group, queue in self._queues.items():
+            for job in queue:
+                if job.job_id == job_id:
+                    queue.remove(job)
+                    job.state = JOB_CANCELLED
+                    self._notify_cancelled(job)
+                    self._emit_queue_changed()
+                    return True
+        job = self._running.pop(job_id, None)
+        if job is None:
+            return False
+        job.state = JOB_CANCELLED
+        job.worker.stop()
+        if job.thread is not None:
+            self._stopping[job.job_id] = job
+            job.thread.quit()
+        self._notify_cancelled(job)
+        self._dispatch()
+        return True
+
+    def cancel_group(self, group):
+
+        job_ids = [job.job_id for job in self._queues.get(group, [])]
+        job_ids += [job.job_id for job in self._running.values() if job.group == group]
+        for job_id in job_ids:
+            self.cancel(job_id)
+        return len(job_ids)
+
+    def is_queued(self, job_id):
+
+        return any(job.job_id == job_id for queue in self._queues.values() for job in queue)
+
+    def running_count(self):
+
+        return len(self._running)
+
+    def queued_count(self):
+
+        return sum(len(queue) for queue in self._queues.values())
+
+    def has_pending_jobs(self, group):
+
+        if self._queues.get(group):
+            return True
+        return any(job.group == group for job in self._running.values())
+
+    def shutdown(self, timeout_ms=2000):
+        # Stops accepting work, cancels everything and waits for running threads.
+        # Stopped workers return within a fraction of a second, so timeout_ms is only a safety net.
+        self._accepting = False
+        for queue in self._queues.values():
+            for job in queue:
+                job.state = JOB_CANCELLED
+        self._queues.clear()
+        for job in self._running.values():
+            job.state = JOB_CANCELLED
+            job.worker.stop()
+        all_stopped = True
+        for job in list(self._running.values()) + list(self._stopping.values()):
+            if job.thread is not None and job.thread.isRunning():
+                job.thread.quit()
+                if not job.thread.wait(timeout_ms):
+                    all_stopped = False
+        return all_stopped
+
+    def _next_job(self):
+        # Picks the best eligible queue head; groups of equal priority are served round-robin.
+        best_job, best_key = None, None
+        for position, group in enumerate(self._group_order):
+            queue = self._queues.get(group)
+            if not queue:
+                continue
+            job = queue[0]
+            if job.serial and any(running.group == group for running in self._running.values()):
+                continue
+            key = (job.priority, position)
+            if best_key is None or key < best_key:
+                best_job, best_key = job, key
+        return best_job
+
+    def _dispatch(self):
+
+        while self._accepting and len(self._running) < self.max_in_flight:
+            job = self._next_job()
+            if job is None:
+                break
+            self._queues[job.group].remove(job)
+            self._group_order.remove(job.group)
+            self._group_order.append(job.group)
+            self._served_groups.add(job.group)
+            self._start_job(job)
+        self._emit_queue_changed()
+
+    def _start_job(self, job):
+
+        job.state = JOB_RUNNING
+        self._running[job.job_id] = job
+        if getattr(job.worker, "runs_on_engine", False):
+            self._start_engine_job(job)
+            return
+        job.thread = QThread(self)
+        job.worker.moveToThread(job.thread)
+
+        job.worker.finished.connect(job.thread.quit)
+        job.worker.error.connect(job.thread.quit)
+        job.thread.finished.connect(job.worker.deleteLater)
+        job.thread.finished.connect(job.thread.deleteLater)
+        job.thread.finished.connect(lambda: self._on_job_thread_finished(job))
+        self._connect_worker_callbacks(job)
+
+        job.thread.started.connect(job.worker.run)
+        if job.on_started:
+            job.on_started(job.job_id)
+        job.thread.start()
+
+    def _connect_worker_callbacks(self, job):
+
+        job.worker.chunk_received.connect(lambda chunk_text: self._deliver(job, job.on_chunk, chunk_text))
+        job.worker.usage_reported.connect(
+            lambda prompt_tokens, response_tokens: self._deliver(job, job.on_usage, (prompt_tokens, response_tokens))
+        )
+        job.worker.retrying.connect(lambda attempt, delay: self._on_job_retrying(job, attempt, delay))
+        job.worker.finished.connect(lambda result: self._deliver(job, job.on_finished, result))
+        job.worker.error.connect(lambda error_msg: self._deliver(job, job.on_error, error_msg))
+
+    def _start_engine_job(self, job):
+
+        job.worker.done.connect(lambda: self._on_job_thread_finished(job))
+        job.worker.done.connect(job.worker.deleteLater)
+        self._connect_worker_callbacks(job)
+        if job.on_started:
+            job.on_started(job.job_id)
+        job.worker.run()
+
+    def _deliver(self, job, callback, payload):
+
+        if job.state == JOB_RUNNING and callback:
+            callback(payload)
+
+    def _on_job_retrying(self, job, attempt, delay):
+
+        if job.state == JOB_RUNNING:
+            self.job_retrying.emit(job.job_id, attempt, delay)
+
+    def _on_job_thread_finished(self, job):
+
+        if job.state == JOB_RUNNING:
+            job.state = JOB_DONE
+        self._running.pop(job.job_id, None)
+        self._stopping.pop(job.job_id, None)
+        job.thread = None
+        self._dispatch()
+
+    def _notify_cancelled(self, job):
+
+        if job.on_cancelled:
+            job.on_cancelled(job.job_id)
+
+    def _emit_queue_changed(self):
+
+        self.queue_changed.emit(self.running_count(), self.queued_count())
@@ -0,0 +1,189 @@
+import os
+import gzip
+import time
+import shutil
+import threading
+from PyQt5.QtCore import QObject, pyqtSignal
+from .constants import (LOG_FLUSH_INTERVAL_SECONDS, LOG_BATCH_MAX_BYTES, LOG_MAX_PENDING_BYTES, LOG_ROTATE_MAX_BYTES,
+                        LOG_ROTATE_MAX_AGE_DAYS, LOG_ROTATED_SEGMENTS_KEPT)
+
+ROTATED_SUFFIX = ".gz"
+
+class BackgroundLogWriter(QObject):
+    # Appends text to a log file from a writer thread. write() only queues, so callers never wait for the
+    # disk; the queue is written in one batch every flush_interval seconds, once it holds batch_max_bytes,
+    # and on flush()/close(). The file is rotated once it reaches max_bytes or max_age_seconds, rotated
+    # segments are gzipped next to it, and only the newest keep_segments of them are kept.
+
+    write_failed = pyqtSignal(str) # Emitted from the writer thread; connected slots run queued
+
+    def __init__(self, path, max_bytes=LOG_ROTATE_MAX_BYTES, max_age_seconds=LOG_ROTATE_MAX_AGE_DAYS * 24 * 3600,
+                 keep_segments=LOG_ROTATED_SEGMENTS_KEPT, flush_interval=LOG_FLUSH_INTERVAL_SECONDS,
+                 batch_max_bytes=LOG_BATCH_MAX_BYTES, max_pending_bytes=LOG_MAX_PENDING_BYTES, parent=None):
+        super().__init__(parent)
+        self.path = path
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.keep_segments = keep_segments
+        self.flush_interval = flush_interval
+        self.batch_max_bytes = batch_max_bytes
+        self.max_pending_bytes = max_pending_bytes
+        self._condition = threading.Condition()
+        self._pending = []
+        self._pending_bytes = 0
+        self._first_pending_at = None
+        self._dropped = 0
+        self._written_batches = 0 # Batches taken by the writer; flush() waits for this to catch up
+        self._queued_batches = 0
+        self._closing = False
+        self._thread = None
+        self._segment_started = None # When the current file was started, once known
+
+    def start(self):
+
+        with self._condition:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, daemon=True, name="log-writer")
+            self._thread.start()
+
+    def write(self, text):
+        # Queues text for the log. Never blocks; if the writer falls max_pending_bytes behind (e.g. the disk
+        # stalls), new entries are dropped and a note with their count is written once it catches up.
+        size = len(text.encode("utf-8"))
+        with self._condition:
+            if self._closing:
+                return
+            if self._pending_bytes + size > self.max_pending_bytes and self._pending:
+                self._dropped += 1
+                return
+            if not self._pending: # The writer sleeps until there is something to write
+                self._first_pending_at = time.monotonic()
+                self._condition.notify_all()
+            self._pending.append(text)
+            self._pending_bytes += size
+            if self._pending_bytes >= self.batch_max_bytes:
+                self._condition.notify_all()
+
+    def flush(self, timeout_seconds=None):
+        # Has the writer write out everything queued so far; returns False if that took longer than the timeout.
+        with self._condition:
+            if self._thread is None:
+                return not self._pending
+            self._queued_batches += 1
+            target = self._queued_batches
+            self._condition.notify_all()
+            return self._condition.wait_for(lambda: self._written_batches >= target, timeout_seconds)
+
+    def close(self, timeout_seconds=2.0):
+        # Writes out the queue and stops the writer thread. Returns True if it ended within the timeout.
+        with self._condition:
+            self._closing = True
+            thread = self._thread
+            self._condition.notify_all()
+        if thread is None:
+            return True
+        thread.join(timeout_seconds)
+        return not thread.is_alive()
+
+    def _run(self):
+
+        while True:
+            with self._condition:
+                while not self._batch_due():
+                    self._condition.wait(self._time_to_next_flush())
+                closing = self._closing
+                batch, dropped, target = self._pending, self._dropped, self._queued_batches
+                self._pending, self._pending_bytes, self._first_pending_at, self._dropped = [], 0, None, 0
+            if dropped:
+                batch.append(f"[... {dropped} log entries dropped while the disk was busy ...]\n")
+            if batch:
+                self._write_batch("".join(batch))
+            with self._condition:
+                self._written_batches = max(self._written_batches, target)
+                self._condition.notify_all()
+                if closing and not self._pending:
+                    return
+
+    def _batch_due(self):
+
+        if self._closing or self._queued_batches > self._written_batches:
+            return True
+        if not self._pending:
+            return False
+        return (self._pending_bytes >= self.batch_max_bytes
+                or time.monotonic() - self._first_pending_at >= self.flush_interval)
+
+    def _time_to_next_flush(self):
+        # How long the writer may sleep; None (until notified) while there is nothing to write.
+        if self._first_pending_at is None:
+            return None
+        return max(0.0, self._first_pending_at + self.flush_interval - time.monotonic())
+
+    def _write_batch(self, text):
+
+        try:
+            self._rotate_if_due(len(text.encode("utf-8")))
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(text)
+        except OSError as e:
+            print(f"Error writing to log file: {e}")
+            self.write_failed.emit(str(e))
+
+    def _rotate_if_due(self, incoming_bytes):
+
+        try:
+            stat = os.stat(self.path)
+        except FileNotFoundError:
+            self._segment_started = time.time()
+            return
+        if self._segment_started is None:
+            # Creation time where the platform records it; otherwise a file last written longer ago than
+            # the age limit is at least that old, and any other file counts from now.
+            created = getattr(stat, "st_birthtime", None)
+            if created is None and os.name == "nt":
+                created = stat.st_ctime
+            if created is None:
+                created = stat.st_mtime if time.time() - stat.st_mtime > self.max_age_seconds else time.time()
+            self._segment_started = created
+        too_big = stat.st_size > 0 and stat.st_size + incoming_bytes > self.max_bytes
+        too_old = stat.st_size > 0 and time.time() - self._segment_started > self.max_age_seconds
+        if too_big or too_old:
+            self._rotate()
+
+    def _rotate(self):
+        # Moves the current file aside, gzips it and drops the oldest rotated segments.
+        stamp = time.strftime("%Y%m%d-%H%M%S")
+        rotated_path = f"{self.path}.{stamp}"
+        number = 1
+        while os.path.exists(rotated_path) or os.path.exists(rotated_path + ROTATED_SUFFIX):
+            number += 1
+            rotated_path = f"{self.path}.{stamp}-{number}"
+        os.replace(self.path, rotated_path)
+        self._segment_started = time.time()
+        try:
+            with open(rotated_path, 'rb') as source, gzip.open(rotated_path + ROTATED_SUFFIX, 'wb') as target:
+                shutil.copyfileobj(source, target)
+            os.remove(rotated_path)
+        except OSError as e:
+            print(f"Error compressing rotated log '{rotated_path}': {e}")
+        self._prune_segments()
+
+    def rotated_segments(self):
+        # Rotated, gzipped segments of this log, oldest first.
+        directory, name = os.path.split(self.path)
+        try:
+            paths = [os.path.join(directory, entry) for entry in os.listdir(directory or ".")
+                     if entry.startswith(name + ".") and entry.endswith(ROTATED_SUFFIX)]
+            return sorted(paths, key=lambda path: (os.path.getmtime(path), path))
+        except OSError:
+            return []
+
+    def _prune_segments(self):
+
+        segments = self.rotated_segments()
+        for segment in segments[:max(0, len(segments) - self.keep_segments)]:
+            try:
+                os.remove(segment)
+            except OSError as e:
+                print(f"Error removing old log segment '{segment}': {e}")
@@ -0,0 +1,37 @@
+import hashlib
+import threading
+from collections import OrderedDict
+
+MARKDOWN_EXTRAS = ["fenced-code-blocks", "codehilite"]
+RENDER_CACHE_SIZE = 128
+
+RESULT_STYLE = (
+    "<style>"
+    "pre { background-color: #2b2b2b; color: #f0f0f0; padding: 10px; "
+    "border-radius: 5px; overflow-x: auto; font-family: Consolas, monospace; } "
+    "code { font-family: Consolas, monospace; }"
+    "</style>"
+)
+
+_cache = OrderedDict() # sha256 of the Markdown -> rendered HTML, least recently used first
+_cache_lock = threading.Lock()
+
+def render_markdown(markdown_text):
+    # Renders Markdown (with Pygments highlighting) once per distinct text; safe to call from any thread.
+    key = hashlib.sha256(markdown_text.encode("utf-8")).hexdigest()
+    with _cache_lock:
+        html_output = _cache.get(key)
+        if html_output is not None:
+            _cache.move_to_end(key)
+            return html_output
+    import markdown2 # Deferred (with Pygments behind it) until the first render to keep startup fast
+    html_output = markdown2.markdown(markdown_text, extras=MARKDOWN_EXTRAS)
+    with _cache_lock:
+        _cache[key] = html_output
+        while len(_cache) > RENDER_CACHE_SIZE:
+            _cache.popitem(last=False)
+    return html_output
+
+def styled_result_html(markdown_text):
+
+    return f"{RESULT_STYLE}{render_markdown(markdown_text)}"
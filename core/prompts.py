@@ -0,0 +1,140 @@
+import os
+
+PROGRAMMING_LANGUAGES = [
+    "Python", "JavaScript", "Java", "C++", "C#", "Ruby", "Go", "Swift", "Kotlin",
+    "PHP", "TypeScript", "Rust", "Scala", "Perl", "Lua", "SQL", "HTML", "CSS", "Shell"
+]
+
+LANGUAGE_BY_EXTENSION = {
+    ".py": "Python", ".js": "JavaScript", ".java": "Java", ".cpp": "C++", ".cs": "C#", ".rb": "Ruby",
+    ".go": "Go", ".swift": "Swift", ".kt": "Kotlin", ".php": "PHP", ".ts": "TypeScript", ".rs": "Rust",
+    ".scala": "Scala", ".pl": "Perl", ".lua": "Lua", ".sql": "SQL", ".html": "HTML", ".css": "CSS",
+    ".sh": "Shell", ".bash": "Shell"
+}
+
+def guess_language(file_path):
+    # Programming language for a file name, or None if the extension is unknown.
+    _, ext = os.path.splitext(file_path)
+    return LANGUAGE_BY_EXTENSION.get(ext.lower())
+
+def build_summarize_prompt(code):
+
+    return (
+        "You are an expert programming assistant. Your task is to summarize the "
+        "following code. The summary should focus on the main functionality, its "
+        "most important parts, and how it works in general. The response should "
+        "be in Markdown format. Do not include the original code in your response, "
+        "only the summary.\n\n"
+        "Code:\n```\n"
+        f"{code}\n"
+        "```\n\n"
+        "Summary (Markdown):"
+    )
+
+def build_summarize_chunk_prompt(chunk_code, chunk_number, chunk_count, first_line, last_line):
+
+    return (
+        "You are an expert programming assistant. The following code is part "
+        f"{chunk_number} of {chunk_count} (lines {first_line}-{last_line}) of a single "
+        "source file that is too large to summarize at once. Summarize only this part: "
+        "list the classes, functions and top-level logic it defines, what each does, "
+        "and any dependencies on code outside this part. Be concise and factual; the "
+        "partial summaries will be merged later. Respond in Markdown and do not include "
+        "the original code.\n\n"
+        "Code:\n```\n"
+        f"{chunk_code}\n"
+        "```\n\n"
+        f"Summary of part {chunk_number} (Markdown):"
+    )
+
+def build_summarize_reduce_prompt(chunk_summaries):
+
+    parts = "\n\n".join(
+        f"### Part {number} of {len(chunk_summaries)}\n{summary}"
+        for number, summary in enumerate(chunk_summaries, start=1)
+    )
+    return (
+        "You are an expert programming assistant. Below are summaries of consecutive "
+        "parts of one large source file. Merge them into a single coherent summary of "
+        "the whole file. The summary should focus on the main functionality, its most "
+        "important parts, and how it works in general; remove repetition and describe "
+        "how the parts relate to each other. The response should be in Markdown format.\n\n"
+        f"{parts}\n\n"
+        "Summary of the whole file (Markdown):"
+    )
+
+def build_debug_prompt(code):
+
+    return (
+        "You are an expert in analyzing and debugging Python code. Carefully "
+        "analyze the following code. Look for any logical errors, design issues, "
+        "typos, or suggestions for improving performance or readability. Provide "
+        "your report in Markdown format. Explain problems clearly with suggestions "
+        "for fixing them, including short code examples (within fenced code blocks) "
+        "if necessary. Do not rewrite the entire code unless essential; focus on "
+        "explaining issues.\n\n"
+        "Code for review:\n```python\n"
+        f"{code}\n```\n\n"
+        "Analysis and observations (Markdown):"
+    )
+
+def build_convert_prompt(code, source_lib, target_lib):
+
+    return (
+        f"You are an expert in converting Python code between different libraries. "
+        f"Your task is to convert the following code from using the '{source_lib}' "
+        f"library to using the '{target_lib}' library. Provide only the converted "
+        f"code, enclosed in a ```python ... ``` fenced code block (Markdown). Do not "
+        f"include any additional explanations or text before or after the code block, "
+        f"unless essential to clarify a critical point. Try to maintain the same "
+        f"functionality as much as possible.\n\n"
+        f"Original code (using {source_lib}):\n```python\n{code}\n```\n\n"
+        f"Requested code (using {target_lib}, within a Markdown code block):\n"
+    )
+
+def build_targeted_convert_prompt(regions, source_lib, target_lib):
+    # regions: (context, code) of the only parts of a file that use source_lib, numbered from 1.
+    region_blocks = "\n\n".join(
+        f"### REGION {number}{f' (inside {context})' if context else ''}\n```python\n{code}\n```"
+        for number, (context, code) in enumerate(regions, start=1)
+    )
+    return (
+        f"You are an expert in converting Python code between different libraries. "
+        f"Below are the only regions of a Python file that use the '{source_lib}' library; the rest of "
+        f"the file stays as it is and your answer is merged back into it automatically. Convert each region "
+        f"to use the '{target_lib}' library instead, keeping its names, behavior and everything the rest "
+        f"of the file relies on. Put imports the converted code needs into the region that holds the old "
+        f"imports. Answer with every region, in order: a '### REGION <number>' heading followed by one "
+        f"```python ... ``` code block holding the complete converted region, and nothing else. Keep the "
+        f"code at the indentation it has here (it is re-indented when merged); leave the block empty to "
+        f"delete a region.\n\n"
+        f"{region_blocks}\n\n"
+        f"Converted regions (using {target_lib}):\n"
+    )
+
+def build_translate_prompt(code, source_lang, target_lang):
+
+    return (
+        f"You are an expert code translator. Your task is to translate the following "
+        f"code snippet from {source_lang} to {target_lang}. Provide only the "
+        f"translated code, enclosed in a ```{target_lang.lower()} ... ``` fenced "
+        f"code block (Markdown). Do not include any additional explanations or text "
+        f"before or after the code block. Focus on a direct and accurate translation, "
+        f"maintaining the original logic and functionality as closely as possible.\n\n"
+        f"Original {source_lang} code:\n```{source_lang.lower()}\n{code}\n```\n\n"
+        f"Translated {target_lang} code (within a Markdown code block for {target_lang.lower()}):\n"
+    )
+
+def build_generate_prompt(description, libraries=""):
+
+    prompt_lines = [
+        "You are an expert programming assistant. Your task is to create a Python ",
+        "function based on the following description. Provide only the code, ",
+        "enclosed in a ```python ... ``` fenced code block (Markdown). Do not ",
+        "include any additional explanations or text before or after the code block, ",
+        "unless explicitly requested in the description. If libraries are specified, use them.",
+        f"\nDescription: {description}"
+    ]
+    if libraries: prompt_lines.append(f"Required/Suggested libraries: {libraries}")
+    prompt_lines.append("\nRequested code (Python only, within a Markdown code block):\n")
+    return "\n".join(prompt_lines)
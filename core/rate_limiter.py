@@ -0,0 +1,164 @@
+import re
+import time
+import random
+import threading
+
+from .constants import MODEL_RATE_LIMITS, DEFAULT_RATE_LIMIT, RETRY_BASE_DELAY_SECONDS, RETRY_MAX_DELAY_SECONDS
+
+WAIT_SLICE_SECONDS = 0.1 # Waiting is sliced so cancelled workers notice quickly
+
+_RETRY_HINT_PATTERNS = (
+    re.compile(r"retry in ([\d.]+)\s*s", re.IGNORECASE),
+    re.compile(r"retry_delay\s*\{\s*seconds:\s*(\d+)", re.IGNORECASE),
+)
+
+class TokenBucket:
+    # Classic token bucket: holds up to capacity tokens, refilled continuously at rate_per_second.
+
+    def __init__(self, capacity, rate_per_second, now=None):
+        self.capacity = float(capacity)
+        self.rate_per_second = float(rate_per_second)
+        self._tokens = float(capacity)
+        self._updated_at = time.monotonic() if now is None else now
+
+    def _refill(self, now):
+
+        elapsed = now - self._updated_at
+        if elapsed > 0:
+            self._tokens = min(self.capacity, self._tokens + elapsed * self.rate_per_second)
+            self._updated_at = now
+
+    def wait_time(self, amount, now):
+        # Seconds until amount tokens are available (requests larger than the bucket wait for a full one).
+        self._refill(now)
+        needed = min(float(amount), self.capacity) - self._tokens
+        return max(0.0, needed / self.rate_per_second) if needed > 0 else 0.0
+
+    def take(self, amount, now):
+
+        self._refill(now)
+        self._tokens -= min(float(amount), self.capacity)
+
+    def give_back(self, amount, now):
+        # Corrects a reservation once the real cost is known (negative amounts charge extra).
+        self._refill(now)
+        self._tokens = min(self.capacity, self._tokens + amount)
+
+class ModelRateLimiter:
+    # Requests-per-minute and tokens-per-minute buckets shared by every request to one model.
+    # clock returns the current time in seconds; tests pass a fake one.
+
+    def __init__(self, requests_per_minute, tokens_per_minute, clock=time.monotonic):
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._paused_until = 0.0
+        self._set_limits(requests_per_minute, tokens_per_minute)
+
+    def configure(self, requests_per_minute, tokens_per_minute):
+
+        with self._lock:
+            self._set_limits(requests_per_minute, tokens_per_minute)
+
+    def _set_limits(self, requests_per_minute, tokens_per_minute):
+
+        self.requests_per_minute = max(1, int(requests_per_minute))
+        self.tokens_per_minute = max(1, int(tokens_per_minute))
+        now = self._clock()
+        self._requests = TokenBucket(self.requests_per_minute, self.requests_per_minute / 60.0, now)
+        self._tokens = TokenBucket(self.tokens_per_minute, self.tokens_per_minute / 60.0, now)
+
+    def acquire(self, estimated_tokens=0, should_continue=None):
+        # Blocks until one request plus estimated_tokens fit in the quota, then reserves them.
+        # Returns False without reserving anything if should_continue() turns false while waiting.
+        while True:
+            if should_continue is not None and not should_continue():
+                return False
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return True
+            time.sleep(min(wait, WAIT_SLICE_SECONDS))
+
+    async def acquire_async(self, estimated_tokens=0):
+        # Coroutine version of acquire(); cancelling the awaiting task gives up without reserving anything.
+        import asyncio # Only the async engine needs it, and it is slow to import
+        while True:
+            wait = self._reserve(estimated_tokens)
+            if wait <= 0:
+                return True
+            await asyncio.sleep(wait)
+
+    def try_acquire(self, estimated_tokens=0):
+        # Reserves one request plus estimated_tokens only if they fit right now; never waits.
+        return self._reserve(estimated_tokens) <= 0
+
+    def _reserve(self, estimated_tokens):
+        # Reserves one request plus estimated_tokens and returns 0 if they fit now, else the seconds to wait.
+        with self._lock:
+            now = self._clock()
+            wait = max(
+                self._paused_until - now,
+                self._requests.wait_time(1, now),
+                self._tokens.wait_time(estimated_tokens, now)
+            )
+            if wait <= 0:
+                self._requests.take(1, now)
+                self._tokens.take(estimated_tokens, now)
+            return wait
+
+    def settle(self, estimated_tokens, actual_tokens):
+        # Replaces the token estimate reserved by acquire() with the count the server reported.
+        with self._lock:
+            self._tokens.give_back(estimated_tokens - actual_tokens, self._clock())
+
+    def pause(self, seconds):
+        # Holds back every request to this model, e.g. after the server asked us to retry later.
+        with self._lock:
+            self._paused_until = max(self._paused_until, self._clock() + seconds)
+
+_limiters = {}
+_limiters_lock = threading.Lock()
+_limit_overrides = {"requests_per_minute": 0, "tokens_per_minute": 0} # 0 = use the model's default
+
+def _limits_for(model_name):
+
+    default_rpm, default_tpm = MODEL_RATE_LIMITS.get(model_name, DEFAULT_RATE_LIMIT)
+    return (_limit_overrides["requests_per_minute"] or default_rpm,
+            _limit_overrides["tokens_per_minute"] or default_tpm)
+
+def get_rate_limiter(model_name):
+    # Process-wide limiter for a model; the GUI workers and the batch CLI share it.
+    with _limiters_lock:
+        limiter = _limiters.get(model_name)
+        if limiter is None:
+            limiter = ModelRateLimiter(*_limits_for(model_name))
+            _limiters[model_name] = limiter
+        return limiter
+
+def set_rate_limit_overrides(requests_per_minute=0, tokens_per_minute=0):
+    # Applies quota overrides from the settings (0 keeps the per-model default) to every limiter.
+    with _limiters_lock:
+        _limit_overrides["requests_per_minute"] = int(requests_per_minute or 0)
+        _limit_overrides["tokens_per_minute"] = int(tokens_per_minute or 0)
+        for model_name, limiter in _limiters.items():
+            if (limiter.requests_per_minute, limiter.tokens_per_minute) != _limits_for(model_name):
+                limiter.configure(*_limits_for(model_name))
+
+def retry_hint_seconds(exception):
+    # Server-suggested retry delay from a ResourceExhausted error (RetryInfo detail or message text).
+    for detail in getattr(exception, "details", None) or []:
+        retry_delay = getattr(detail, "retry_delay", None)
+        if retry_delay is not None:
+            seconds = getattr(retry_delay, "seconds", 0) + getattr(retry_delay, "nanos", 0) / 1e9
+            if seconds > 0:
+                return seconds
+    for pattern in _RETRY_HINT_PATTERNS:
+        match = pattern.search(str(exception))
+        if match:
+            return float(match.group(1))
+    return None
+
+def backoff_delay(attempt, retry_hint=None):
+    # Delay before retry number attempt (0-based): the server hint if given, else full-jitter exponential.
+    if retry_hint is not None:
+        return min(RETRY_MAX_DELAY_SECONDS, retry_hint) * random.uniform(1.0, 1.2) # Spread the retries a little
+    return random.uniform(0, min(RETRY_MAX_DELAY_SECONDS, RETRY_BASE_DELAY_SECONDS * (2 ** attempt)))
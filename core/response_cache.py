@@ -0,0 +1,153 @@
+import os
+import json
+import time
+import hashlib
+import threading
+from .constants import RESPONSE_CACHE_MAX_BYTES, RESPONSE_CACHE_MAX_AGE_DAYS
+
+CACHE_FORMAT_VERSION = 1
+
+def content_digest(text):
+
+    return hashlib.sha256((text or "").encode("utf-8")).hexdigest()
+
+class ResponseCache:
+    # On-disk, content-addressed cache of Gemini responses with size/age based LRU eviction.
+
+    def __init__(self, cache_dir, max_bytes=RESPONSE_CACHE_MAX_BYTES,
+                 max_age_seconds=RESPONSE_CACHE_MAX_AGE_DAYS * 24 * 3600):
+        self.cache_dir = cache_dir
+        self.max_bytes = max_bytes
+        self.max_age_seconds = max_age_seconds
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.Lock()
+        self._index = None # key -> [size, last_access]; built lazily from the directory
+
+    @staticmethod
+    def make_key(model_name, full_prompt, docs_context, generation_config):
+
+        payload = json.dumps({
+            "version": CACHE_FORMAT_VERSION,
+            "model": model_name,
+            "prompt": content_digest(full_prompt),
+            "docs": content_digest(docs_context),
+            "config": generation_config,
+        }, sort_keys=True)
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+    def get(self, key):
+
+        with self._lock:
+            self._ensure_index()
+            path = self._entry_path(key)
+            entry = self._index.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+            try:
+                with open(path, 'r', encoding='utf-8') as f:
+                    data = json.load(f)
+            except (OSError, ValueError):
+                self._drop(key)
+                self.misses += 1
+                return None
+            if time.time() - data.get("created", 0) > self.max_age_seconds:
+                self._drop(key)
+                self.misses += 1
+                return None
+            now = time.time()
+            try:
+                os.utime(path, (now, now)) # mtime doubles as the LRU timestamp across sessions
+            except OSError:
+                pass
+            entry[1] = now
+            self.hits += 1
+            return data.get("response")
+
+    def put(self, key, response_text, model_name=""):
+
+        data = {"created": time.time(), "model": model_name, "response": response_text}
+        encoded = json.dumps(data, ensure_ascii=False).encode("utf-8")
+        with self._lock:
+            self._ensure_index()
+            path = self._entry_path(key)
+            try:
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                tmp_path = f"{path}.tmp"
+                with open(tmp_path, 'wb') as f:
+                    f.write(encoded)
+                os.replace(tmp_path, path)
+            except OSError as e:
+                print(f"Error writing response cache entry: {e}")
+                return
+            self._index[key] = [len(encoded), time.time()]
+            self._evict()
+
+    def invalidate(self, key):
+
+        with self._lock:
+            self._ensure_index()
+            self._drop(key)
+
+    def clear(self):
+
+        with self._lock:
+            self._ensure_index()
+            for key in list(self._index):
+                self._drop(key)
+            self.hits = 0
+            self.misses = 0
+
+    def stats(self):
+
+        with self._lock:
+            self._ensure_index()
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "entries": len(self._index),
+                "bytes": sum(size for size, _ in self._index.values()),
+            }
+
+    def _entry_path(self, key):
+
+        return os.path.join(self.cache_dir, key[:2], f"{key}.json")
+
+    def _ensure_index(self):
+
+        if self._index is not None:
+            return
+        self._index = {}
+        if not os.path.isdir(self.cache_dir):
+            return
+        for shard in os.scandir(self.cache_dir):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".json"):
+                    stat = entry.stat()
+                    self._index[entry.name[:-len(".json")]] = [stat.st_size, stat.st_mtime]
+
+    def _drop(self, key):
+
+        self._index.pop(key, None)
+        try:
+            os.remove(self._entry_path(key))
+        except OSError:
+            pass
+
+    def _evict(self):
+        # Drops entries not used within max_age, then least recently used ones until under max_bytes.
+        now = time.time()
+        for key, (_, last_access) in list(self._index.items()):
+            if now - last_access > self.max_age_seconds:
+                self._drop(key)
+        total_bytes = sum(size for size, _ in self._index.values())
+        if total_bytes <= self.max_bytes:
+            return
+        for key, (size, _) in sorted(self._index.items(), key=lambda item: item[1][1]):
+            self._drop(key)
+            total_bytes -= size
+            if total_bytes <= self.max_bytes:
+                break
@@ -1,8 +1,11 @@
 import os
-from PyQt5.QtWidgets import QDialog, QFormLayout, QLineEdit, QComboBox, QPushButton, QMessageBox
+from PyQt5.QtWidgets import QDialog, QFormLayout, QLineEdit, QComboBox, QPushButton, QMessageBox, QCheckBox, QSpinBox
 from PyQt5.QtCore import QSettings, pyqtSignal
 from .translation import tr, get_langs_dir
-from .constants import AVAILABLE_MODELS, DEFAULT_MODEL, SETTINGS_FILE_NAME
+from .constants import (AVAILABLE_MODELS, DEFAULT_MODEL, SETTINGS_FILE_NAME, DEFAULT_MAX_CONCURRENT_REQUESTS,
+                        DEFAULT_DOCS_TOP_K, DEFAULT_DOCS_TOKEN_BUDGET, OVERSIZE_STRATEGIES, DEFAULT_OVERSIZE_STRATEGY,
+                        DEFAULT_HEDGE_BACKUP_MODEL, DEFAULT_HEDGE_PERCENTILE, DEFAULT_ATTACH_MAX_SIZE_MB,
+                        DEFAULT_CONTEXT_CACHE_TTL_MINUTES)
 
 class SettingsDialog(QDialog):
 
@@ -45,6 +48,94 @@ class SettingsDialog(QDialog):
         self.model_combo.addItems(AVAILABLE_MODELS)
         layout.addRow(tr("model_label"), self.model_combo)
 
+        self.stream_checkbox = QCheckBox(self)
+        layout.addRow(tr("stream_responses_label"), self.stream_checkbox)
+
+        self.async_engine_checkbox = QCheckBox(self)
+        layout.addRow(tr("async_engine_label"), self.async_engine_checkbox)
+
+        self.response_cache_checkbox = QCheckBox(self)
+        layout.addRow(tr("response_cache_label"), self.response_cache_checkbox)
+
+        self.max_concurrent_spin = QSpinBox(self)
+        self.max_concurrent_spin.setRange(1, 16)
+        layout.addRow(tr("max_concurrent_requests_label"), self.max_concurrent_spin)
+
+        self.rate_limit_rpm_spin = QSpinBox(self)
+        self.rate_limit_rpm_spin.setRange(0, 10000)
+        self.rate_limit_rpm_spin.setSpecialValueText(tr("rate_limit_model_default"))
+        layout.addRow(tr("rate_limit_rpm_label"), self.rate_limit_rpm_spin)
+
+        self.rate_limit_tpm_spin = QSpinBox(self)
+        self.rate_limit_tpm_spin.setRange(0, 100000000)
+        self.rate_limit_tpm_spin.setSingleStep(10000)
+        self.rate_limit_tpm_spin.setSpecialValueText(tr("rate_limit_model_default"))
+        layout.addRow(tr("rate_limit_tpm_label"), self.rate_limit_tpm_spin)
+
+        self.request_timeout_spin = QSpinBox(self)
+        self.request_timeout_spin.setRange(0, 3600)
+        self.request_timeout_spin.setSingleStep(10)
+        self.request_timeout_spin.setSuffix(" s")
+        self.request_timeout_spin.setSpecialValueText(tr("rate_limit_model_default"))
+        layout.addRow(tr("request_timeout_label"), self.request_timeout_spin)
+
+        self.hedging_checkbox = QCheckBox(self)
+        layout.addRow(tr("hedging_label"), self.hedging_checkbox)
+
+        self.hedge_model_combo = QComboBox(self)
+        self.hedge_model_combo.addItems(AVAILABLE_MODELS)
+        layout.addRow(tr("hedge_model_label"), self.hedge_model_combo)
+
+        self.hedge_percentile_spin = QSpinBox(self)
+        self.hedge_percentile_spin.setRange(50, 99)
+        self.hedge_percentile_spin.setPrefix("p")
+        layout.addRow(tr("hedge_percentile_label"), self.hedge_percentile_spin)
+        self.hedging_checkbox.toggled.connect(self.hedge_model_combo.setEnabled)
+        self.hedging_checkbox.toggled.connect(self.hedge_percentile_spin.setEnabled)
+
+        self.max_input_tokens_spin = QSpinBox(self)
+        self.max_input_tokens_spin.setRange(0, 2000000)
+        self.max_input_tokens_spin.setSingleStep(10000)
+        self.max_input_tokens_spin.setSpecialValueText(tr("max_input_tokens_model_limit"))
+        layout.addRow(tr("max_input_tokens_label"), self.max_input_tokens_spin)
+
+        self.oversize_strategy_combo = QComboBox(self)
+        for strategy in OVERSIZE_STRATEGIES:
+            self.oversize_strategy_combo.addItem(tr(f"oversize_strategy_{strategy}"), strategy)
+        layout.addRow(tr("oversize_strategy_label"), self.oversize_strategy_combo)
+
+        self.exact_token_count_checkbox = QCheckBox(self)
+        layout.addRow(tr("exact_token_count_label"), self.exact_token_count_checkbox)
+
+        self.trace_export_checkbox = QCheckBox(self)
+        layout.addRow(tr("trace_export_label"), self.trace_export_checkbox)
+
+        self.docs_retrieval_checkbox = QCheckBox(self)
+        layout.addRow(tr("docs_retrieval_label"), self.docs_retrieval_checkbox)
+
+        self.docs_top_k_spin = QSpinBox(self)
+        self.docs_top_k_spin.setRange(1, 50)
+        layout.addRow(tr("docs_top_k_label"), self.docs_top_k_spin)
+
+        self.docs_token_budget_spin = QSpinBox(self)
+        self.docs_token_budget_spin.setRange(100, 200000)
+        self.docs_token_budget_spin.setSingleStep(500)
+        layout.addRow(tr("docs_token_budget_label"), self.docs_token_budget_spin)
+
+        self.context_cache_checkbox = QCheckBox(self)
+        layout.addRow(tr("context_cache_label"), self.context_cache_checkbox)
+
+        self.context_cache_ttl_spin = QSpinBox(self)
+        self.context_cache_ttl_spin.setRange(5, 24 * 60)
+        self.context_cache_ttl_spin.setSingleStep(15)
+        self.context_cache_ttl_spin.setSuffix(" min")
+        layout.addRow(tr("context_cache_ttl_label"), self.context_cache_ttl_spin)
+
+        self.attach_max_size_spin = QSpinBox(self)
+        self.attach_max_size_spin.setRange(1, 1024)
+        self.attach_max_size_spin.setSuffix(" MB")
+        layout.addRow(tr("attach_max_size_label"), self.attach_max_size_spin)
+
         self.save_button = QPushButton(tr("save_settings_btn"), self)
         self.save_button.clicked.connect(self._save_settings)
         layout.addRow(self.save_button)
@@ -70,6 +161,42 @@ class SettingsDialog(QDialog):
             elif self.model_combo.count() > 0:
                 self.model_combo.setCurrentIndex(0)
 
+        self.stream_checkbox.setChecked(self.settings.value("stream_responses", True, type=bool))
+        self.async_engine_checkbox.setChecked(self.settings.value("async_engine_enabled", False, type=bool))
+        self.response_cache_checkbox.setChecked(self.settings.value("response_cache_enabled", True, type=bool))
+        self.max_concurrent_spin.setValue(
+            self.settings.value("max_concurrent_requests", DEFAULT_MAX_CONCURRENT_REQUESTS, type=int)
+        )
+        self.rate_limit_rpm_spin.setValue(self.settings.value("rate_limit_rpm", 0, type=int))
+        self.rate_limit_tpm_spin.setValue(self.settings.value("rate_limit_tpm", 0, type=int))
+        self.request_timeout_spin.setValue(self.settings.value("request_timeout_seconds", 0, type=int))
+        hedging_enabled = self.settings.value("hedging_enabled", False, type=bool)
+        self.hedging_checkbox.setChecked(hedging_enabled)
+        self.hedge_model_combo.setEnabled(hedging_enabled)
+        self.hedge_percentile_spin.setEnabled(hedging_enabled)
+        hedge_model = self.settings.value("hedge_backup_model", DEFAULT_HEDGE_BACKUP_MODEL)
+        self.hedge_model_combo.setCurrentText(hedge_model if hedge_model in AVAILABLE_MODELS else DEFAULT_HEDGE_BACKUP_MODEL)
+        self.hedge_percentile_spin.setValue(self.settings.value("hedge_percentile", DEFAULT_HEDGE_PERCENTILE, type=int))
+        self.max_input_tokens_spin.setValue(self.settings.value("max_input_tokens", 0, type=int))
+        strategy_index = self.oversize_strategy_combo.findData(
+            self.settings.value("oversize_strategy", DEFAULT_OVERSIZE_STRATEGY)
+        )
+        self.oversize_strategy_combo.setCurrentIndex(max(0, strategy_index))
+        self.exact_token_count_checkbox.setChecked(self.settings.value("exact_token_count", False, type=bool))
+        self.trace_export_checkbox.setChecked(self.settings.value("trace_export_enabled", True, type=bool))
+        self.docs_retrieval_checkbox.setChecked(self.settings.value("docs_retrieval_enabled", True, type=bool))
+        self.docs_top_k_spin.setValue(self.settings.value("docs_top_k", DEFAULT_DOCS_TOP_K, type=int))
+        self.docs_token_budget_spin.setValue(
+            self.settings.value("docs_token_budget", DEFAULT_DOCS_TOKEN_BUDGET, type=int)
+        )
+        self.context_cache_checkbox.setChecked(self.settings.value("context_cache_enabled", True, type=bool))
+        self.context_cache_ttl_spin.setValue(
+            self.settings.value("context_cache_ttl_minutes", DEFAULT_CONTEXT_CACHE_TTL_MINUTES, type=int)
+        )
+        self.attach_max_size_spin.setValue(
+            self.settings.value("attach_max_size_mb", DEFAULT_ATTACH_MAX_SIZE_MB, type=int)
+        )
+
     def _save_settings(self):
 
         self.settings.setValue("api_key", self.api_key_input.text())
@@ -83,6 +210,26 @@ class SettingsDialog(QDialog):
         self.settings.setValue("language", lang_code)
 
         self.settings.setValue("gemini_model", self.model_combo.currentText())
+        self.settings.setValue("stream_responses", self.stream_checkbox.isChecked())
+        self.settings.setValue("async_engine_enabled", self.async_engine_checkbox.isChecked())
+        self.settings.setValue("response_cache_enabled", self.response_cache_checkbox.isChecked())
+        self.settings.setValue("max_concurrent_requests", self.max_concurrent_spin.value())
+        self.settings.setValue("rate_limit_rpm", self.rate_limit_rpm_spin.value())
+        self.settings.setValue("rate_limit_tpm", self.rate_limit_tpm_spin.value())
+        self.settings.setValue("request_timeout_seconds", self.request_timeout_spin.value())
+        self.settings.setValue("hedging_enabled", self.hedging_checkbox.isChecked())
+        self.settings.setValue("hedge_backup_model", self.hedge_model_combo.currentText())
+        self.settings.setValue("hedge_percentile", self.hedge_percentile_spin.value())
+        self.settings.setValue("max_input_tokens", self.max_input_tokens_spin.value())
+        self.settings.setValue("oversize_strategy", self.oversize_strategy_combo.currentData())
+        self.settings.setValue("exact_token_count", self.exact_token_count_checkbox.isChecked())
+        self.settings.setValue("trace_export_enabled", self.trace_export_checkbox.isChecked())
+        self.settings.setValue("docs_retrieval_enabled", self.docs_retrieval_checkbox.isChecked())
+        self.settings.setValue("docs_top_k", self.docs_top_k_spin.value())
+        self.settings.setValue("docs_token_budget", self.docs_token_budget_spin.value())
+        self.settings.setValue("context_cache_enabled", self.context_cache_checkbox.isChecked())
+        self.settings.setValue("context_cache_ttl_minutes", self.context_cache_ttl_spin.value())
+        self.settings.setValue("attach_max_size_mb", self.attach_max_size_spin.value())
 
         QMessageBox.information(
             self, tr("settings_title"),
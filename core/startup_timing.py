@@ -0,0 +1,44 @@
+import sys
+import time
+from PyQt5.QtCore import QObject, QEvent
+
+class StartupTimer:
+    # Named milestones measured from a start time taken before the heavy imports.
+
+    def __init__(self, started_at=None):
+        self.started_at = time.perf_counter() if started_at is None else started_at
+        self.marks = []
+
+    def mark(self, name):
+
+        self.marks.append((name, time.perf_counter()))
+
+    def elapsed_ms(self):
+
+        last = self.marks[-1][1] if self.marks else self.started_at
+        return (last - self.started_at) * 1000
+
+    def report(self, stream=None):
+
+        stream = stream or sys.stderr
+        previous = self.started_at
+        print("Startup timing:", file=stream)
+        for name, at in self.marks:
+            print(f"  {name:<24} {(at - self.started_at) * 1000:8.1f} ms  (+{(at - previous) * 1000:.1f})", file=stream)
+            previous = at
+
+class FirstPaintWatcher(QObject):
+    # Calls on_first_paint() once, when the watched widget receives its first paint event.
+
+    def __init__(self, widget, on_first_paint):
+        super().__init__(widget)
+        self._widget = widget
+        self._on_first_paint = on_first_paint
+        widget.installEventFilter(self)
+
+    def eventFilter(self, watched, event):
+
+        if watched is self._widget and event.type() == QEvent.Paint:
+            self._widget.removeEventFilter(self)
+            self._on_first_paint()
+        return False
@@ -0,0 +1,200 @@
+import re
+import ast
+from collections import namedtuple
+
+from .prompts import build_targeted_convert_prompt
+from .constants import TARGETED_CONVERT_MAX_SHARE
+
+ConversionRegion = namedtuple("ConversionRegion", ["first_line", "last_line", "indent", "context"]) # 1-based, inclusive
+
+_REGION_ANSWER_RE = re.compile(r"^#+\s*REGION\s+(\d+)[^\n]*\n+\s*```[\w+-]*[ \t]*\n(.*?)^[ \t]*```", re.MULTILINE | re.DOTALL)
+
+def _is_library_module(module_name, library):
+
+    module_name, library = module_name.lower(), library.lower()
+    return module_name == library or module_name.startswith(library + ".")
+
+def _imports_library(node, library):
+
+    if isinstance(node, ast.Import):
+        return any(_is_library_module(alias.name, library) for alias in node.names)
+    return bool(node.module) and not node.level and _is_library_module(node.module, library)
+
+def _library_names(tree, library):
+    # Names bound by imports of library, or None if it is star-imported (then any name may come from it).
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            for alias in node.names:
+                if _is_library_module(alias.name, library):
+                    names.add(alias.asname or alias.name.split(".")[0])
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            if _is_library_module(node.module, library):
+                for alias in node.names:
+                    if alias.name == "*":
+                        return None
+                    names.add(alias.asname or alias.name)
+    return names
+
+def _dotted_name(node):
+    # "a.b.c" for a chain of attributes on a plain name, else None.
+    parts = []
+    while isinstance(node, ast.Attribute):
+        parts.append(node.attr)
+        node = node.value
+    if not isinstance(node, ast.Name):
+        return None
+    parts.append(node.id)
+    return ".".join(reversed(parts))
+
+def _references(node, names):
+
+    for child in ast.walk(node):
+        if isinstance(child, ast.Name) and child.id in names:
+            return True
+        if isinstance(child, ast.Attribute) and _dotted_name(child) in names:
+            return True
+    return False
+
+def _bound_targets(node):
+    # Names and attribute paths (e.g. "self.label") that an assignment or with-item binds.
+    targets = []
+    if isinstance(node, ast.Assign):
+        targets = list(node.targets)
+    elif isinstance(node, ast.AnnAssign):
+        targets = [node.target]
+    elif isinstance(node, ast.withitem) and node.optional_vars is not None:
+        targets = [node.optional_vars]
+    bound = set()
+    while targets:
+        target = targets.pop()
+        if isinstance(target, (ast.Tuple, ast.List)):
+            targets.extend(target.elts)
+        elif _dotted_name(target):
+            bound.add(_dotted_name(target))
+    return bound
+
+def _objects_from_library(tree, names):
+    # Variables and attributes assigned straight from the library (root = tk.Tk(), self.label = tk.Label()),
+    # so later calls on them count as library use too. One level deep and scope-blind on purpose.
+    tainted = set()
+    for node in ast.walk(tree):
+        value = node.context_expr if isinstance(node, ast.withitem) else getattr(node, "value", None)
+        if isinstance(node, (ast.Assign, ast.AnnAssign, ast.withitem)) and value is not None and _references(value, names):
+            tainted |= _bound_targets(node)
+    return tainted
+
+def _first_line(node):
+
+    return min([node.lineno] + [decorator.lineno for decorator in getattr(node, "decorator_list", [])])
+
+def _class_header_references(node, names):
+
+    header = node.bases + [keyword.value for keyword in node.keywords] + node.decorator_list
+    return any(_references(part, names) for part in header)
+
+def _collect_regions(body, names, context, regions):
+    # Smallest complete statements that use the library: whole functions, single statements, and
+    # the members of a class unless its header (bases, decorators) uses the library itself.
+    for node in body:
+        if not _references(node, names):
+            continue
+        if isinstance(node, ast.ClassDef) and not _class_header_references(node, names):
+            _collect_regions(node.body, names, f"class {node.name}", regions)
+        else:
+            regions.append((_first_line(node), node.end_lineno, context))
+
+def _merge_regions(regions, lines):
+    # Joins regions at the same depth that overlap or are separated only by blank or comment lines.
+    merged = []
+    for first_line, last_line, context in sorted(regions):
+        indent = re.match(r"[ \t]*", lines[first_line - 1]).group(0)
+        if merged:
+            previous = merged[-1]
+            gap = lines[previous.last_line:first_line - 1]
+            if (previous.indent, previous.context) == (indent, context) and all(
+                    not line.strip() or line.strip().startswith("#") for line in gap):
+                merged[-1] = previous._replace(last_line=max(previous.last_line, last_line))
+                continue
+            if first_line <= previous.last_line: # Shares a line with the previous region
+                merged[-1] = previous._replace(last_line=max(previous.last_line, last_line))
+                continue
+        merged.append(ConversionRegion(first_line, last_line, indent, context))
+    return merged
+
+def find_conversion_regions(source, source_lib):
+    # Regions of Python source that import or use source_lib, in file order; None if the source cannot
+    # be parsed or the library is star-imported, an empty list if it is not imported at all.
+    try:
+        tree = ast.parse(source)
+    except (SyntaxError, ValueError):
+        return None
+    names = _library_names(tree, source_lib.strip())
+    if names is None:
+        return None
+    if not names:
+        return []
+    names |= _objects_from_library(tree, names)
+    regions = []
+    _collect_regions(tree.body, names, "", regions)
+    for node in ast.walk(tree): # Imports hold no names, so they are added here unless already inside a region
+        if isinstance(node, (ast.Import, ast.ImportFrom)) and _imports_library(node, source_lib.strip()):
+            if not any(first <= node.lineno <= last for first, last, _ in regions):
+                regions.append((node.lineno, node.end_lineno, ""))
+    return _merge_regions(regions, source.splitlines())
+
+def worth_targeting(source, regions):
+    # Targeted conversion pays off when the regions are a minority of the file.
+    if not regions:
+        return False
+    return affected_line_count(regions) <= TARGETED_CONVERT_MAX_SHARE * max(1, len(source.splitlines()))
+
+def region_code(source_lines, region):
+    # The region's lines with its indentation removed, as sent to the model.
+    indent = region.indent
+    return "\n".join(
+        line[len(indent):] if line.startswith(indent) else line
+        for line in source_lines[region.first_line - 1:region.last_line]
+    )
+
+def parse_converted_regions(response_text, region_count):
+    # Converted code per region from a '### REGION n' answer; raises ValueError if any region is missing.
+    converted = {}
+    for match in _REGION_ANSWER_RE.finditer(response_text):
+        converted.setdefault(int(match.group(1)), match.group(2).rstrip("\n"))
+    missing = [number for number in range(1, region_count + 1) if number not in converted]
+    if missing:
+        raise ValueError(f"The answer has no converted code for region(s) {', '.join(map(str, missing))}.")
+    return [converted[number] for number in range(1, region_count + 1)]
+
+def splice_regions(source, regions, converted_regions):
+    # Replaces each region of source with its converted code, re-indented to the region's depth.
+    lines = source.splitlines()
+    for region, code in sorted(zip(regions, converted_regions), key=lambda pair: pair[0].first_line, reverse=True):
+        new_lines = [region.indent + line if line.strip() else "" for line in code.splitlines()]
+        lines[region.first_line - 1:region.last_line] = new_lines
+    return "\n".join(lines) + ("\n" if source.endswith("\n") else "")
+
+def plan_targeted_conversion(source, source_lib, target_lib):
+    # (prompt, regions) converting only the regions of source that use source_lib, or None when the whole
+    # file should be sent instead: not parseable, star-imported, library unused or used almost everywhere.
+    regions = find_conversion_regions(source, source_lib)
+    if not worth_targeting(source, regions):
+        return None
+    lines = source.splitlines()
+    prompt = build_targeted_convert_prompt(
+        [(region.context, region_code(lines, region)) for region in regions], source_lib, target_lib
+    )
+    return prompt, regions
+
+def apply_targeted_conversion(source, regions, response_text):
+    # The converted file; raises ValueError if the answer does not cover every region.
+    return splice_regions(source, regions, parse_converted_regions(response_text, len(regions)))
+
+def affected_line_count(regions):
+
+    return sum(region.last_line - region.first_line + 1 for region in regions)
+
+def converted_file_markdown(source):
+
+    return f"```python\n{source.rstrip()}\n```\n"
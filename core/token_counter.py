@@ -0,0 +1,129 @@
+import re
+import hashlib
+import threading
+from collections import OrderedDict
+from PyQt5.QtCore import QObject, pyqtSignal
+from .client_pool import model_pool
+from .code_chunker import split_source
+from .constants import (MODEL_INPUT_TOKEN_LIMITS, DEFAULT_INPUT_TOKEN_LIMIT, OVERSIZE_STRATEGY_CHUNK,
+                        OVERSIZE_STRATEGY_TRUNCATE, OVERSIZE_STRATEGY_BLOCK)
+
+TOKEN_COUNT_CACHE_SIZE = 256
+TRUNCATION_MARKER = "\n# ... [input truncated to fit the token budget]\n"
+
+_TOKEN_PIECE_RE = re.compile(r"\w+|[^\w\s]")
+
+_cache = OrderedDict() # (kind, model, sha256 of the text) -> token count, least recently used first
+_cache_lock = threading.Lock()
+
+def _cached(key):
+
+    with _cache_lock:
+        count = _cache.get(key)
+        if count is not None:
+            _cache.move_to_end(key)
+        return count
+
+def _remember(key, count):
+
+    with _cache_lock:
+        _cache[key] = count
+        while len(_cache) > TOKEN_COUNT_CACHE_SIZE:
+            _cache.popitem(last=False)
+
+def _digest(text):
+
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+def estimate_tokens(text):
+    # Fast local estimate, close to Gemini's tokenizer for code: words cost one token per ~4 characters,
+    # every punctuation character costs one. Memoized by content hash.
+    if not text:
+        return 0
+    key = ("estimate", "", _digest(text))
+    count = _cached(key)
+    if count is None:
+        count = sum((len(piece) + 3) // 4 for piece in _TOKEN_PIECE_RE.findall(text))
+        _remember(key, count)
+    return count
+
+def count_tokens_exact(text, api_key, model_name):
+    # Exact count from the API (a network round trip; call off the GUI thread). Falls back to the estimate.
+    if not text:
+        return 0
+    key = ("exact", model_name, _digest(text))
+    count = _cached(key)
+    if count is not None:
+        return count
+    try:
+        count = int(model_pool.get_model(api_key, model_name).count_tokens(text).total_tokens)
+    except Exception as e:
+        print(f"Warning: exact token count failed, using the local estimate: {e}")
+        return estimate_tokens(text)
+    _remember(key, count)
+    return count
+
+def input_token_limit(model_name, override=0):
+
+    return override or MODEL_INPUT_TOKEN_LIMITS.get(model_name, DEFAULT_INPUT_TOKEN_LIMIT)
+
+def truncate_to_tokens(text, max_tokens):
+    # Keeps the longest run of whole leading lines that fits in max_tokens, plus a truncation marker.
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    max_tokens = max(0, max_tokens - estimate_tokens(TRUNCATION_MARKER))
+    lines = text.splitlines(keepends=True)
+    low, high = 0, len(lines) # Binary search on the line count
+    while low < high:
+        middle = (low + high + 1) // 2
+        if estimate_tokens("".join(lines[:middle])) <= max_tokens:
+            low = middle
+        else:
+            high = middle - 1
+    return "".join(lines[:low]) + TRUNCATION_MARKER
+
+def split_to_tokens(text, max_tokens):
+    # Splits source into chunks of whole functions/classes that each fit in max_tokens.
+    # Returns [(first line number, last line number, text)] like split_source().
+    chars_per_token = len(text) / max(1, estimate_tokens(text))
+    max_chars = max(1, int(max_tokens * chars_per_token * 0.95)) # Small margin for uneven density
+    return split_source(text, max_chars)
+
+def fit_input(text, build_prompt, budget_tokens, strategy, allow_chunking=True):
+    # Decides how to send text so that every prompt stays within budget_tokens.
+    # Returns (strategy applied or None if the text fits, payload): the text itself, the truncated
+    # text, the chunks from split_to_tokens(), or None when the strategy is to block the request.
+    if estimate_tokens(build_prompt(text)) <= budget_tokens:
+        return None, text
+    text_budget = budget_tokens - estimate_tokens(build_prompt(""))
+    if strategy == OVERSIZE_STRATEGY_BLOCK or text_budget <= 0:
+        return OVERSIZE_STRATEGY_BLOCK, None
+    if strategy == OVERSIZE_STRATEGY_CHUNK and allow_chunking:
+        chunks = split_to_tokens(text, text_budget)
+        if len(chunks) > 1:
+            return OVERSIZE_STRATEGY_CHUNK, chunks
+    return OVERSIZE_STRATEGY_TRUNCATE, truncate_to_tokens(text, text_budget)
+
+class ExactTokenCounter(QObject):
+    # Runs exact token counts on a background thread; only the newest request's result is reported.
+
+    counted = pyqtSignal(int, int) # request id, token count
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._latest_request = 0
+
+    def request(self, text, api_key, model_name):
+
+        self._latest_request += 1
+        request_id = self._latest_request
+        threading.Thread(
+            target=self._count, args=(request_id, text, api_key, model_name), daemon=True
+        ).start()
+        return request_id
+
+    def _count(self, request_id, text, api_key, model_name):
+
+        count = count_tokens_exact(text, api_key, model_name)
+        if request_id == self._latest_request:
+            self.counted.emit(request_id, count) # Queued to the GUI thread
@@ -0,0 +1,132 @@
+import json
+import time
+import datetime
+import itertools
+from collections import deque
+from contextlib import contextmanager
+from PyQt5.QtCore import QObject, pyqtSignal
+from .log_writer import BackgroundLogWriter
+
+TRACE_TOTAL = "total"
+
+def percentile(values, pct):
+    # Nearest-rank percentile of a non-empty list.
+    ordered = sorted(values)
+    rank = max(1, -(-len(ordered) * pct // 100)) # Ceiling of len * pct / 100
+    return ordered[int(rank) - 1]
+
+class RequestTrace:
+    # Timing spans of one request, measured from its submission. Spans may be added from any thread.
+
+    def __init__(self, trace_id, tab, model):
+        self.trace_id = trace_id
+        self.tab = tab
+        self.model = model
+        self.timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        self.started_at = time.perf_counter()
+        self.finished_at = None
+        self.spans = [] # (name, start ms, duration ms)
+        self.attributes = {}
+
+    def add_span(self, name, started_at, ended_at=None):
+
+        ended_at = time.perf_counter() if ended_at is None else ended_at
+        self.spans.append((
+            name, round((started_at - self.started_at) * 1000, 2), round((ended_at - started_at) * 1000, 2)
+        ))
+
+    def set(self, **attributes):
+
+        self.attributes.update(attributes)
+
+    def stage_totals(self):
+        # Milliseconds per span name (repeated spans, e.g. retried requests, are summed), plus the total.
+        totals = {}
+        for name, _, duration_ms in self.spans:
+            totals[name] = totals.get(name, 0) + duration_ms
+        if self.finished_at is not None:
+            totals[TRACE_TOTAL] = round((self.finished_at - self.started_at) * 1000, 2)
+        return totals
+
+    def to_dict(self):
+
+        return {
+            "trace_id": self.trace_id, "timestamp": self.timestamp, "tab": self.tab, "model": self.model,
+            "total_ms": self.stage_totals().get(TRACE_TOTAL),
+            "spans": [{"name": name, "start_ms": start_ms, "duration_ms": duration_ms}
+                      for name, start_ms, duration_ms in self.spans],
+            **self.attributes
+        }
+
+@contextmanager
+def span(trace, name):
+    # Times the enclosed block as a span of trace; does nothing when trace is None.
+    if trace is None:
+        yield
+        return
+    started_at = time.perf_counter()
+    try:
+        yield
+    finally:
+        trace.add_span(name, started_at)
+
+class Tracer(QObject):
+    # Collects finished request traces: keeps the most recent ones for the performance panel and
+    # appends each one to a JSONL file when an export path is set. The file is written by a
+    # BackgroundLogWriter, so it is rotated and gzipped like the chat log.
+
+    trace_finished = pyqtSignal(object) # RequestTrace
+
+    def __init__(self, export_path=None, max_recent=200, parent=None):
+        super().__init__(parent)
+        self.export_path = None
+        self.max_recent = max_recent
+        self._recent = deque(maxlen=max_recent)
+        self._ids = itertools.count(1)
+        self._export_writer = None
+        self.set_export_path(export_path)
+
+    def start_trace(self, tab, model):
+
+        return RequestTrace(next(self._ids), tab, model)
+
+    def finish(self, trace, status="ok", **attributes):
+
+        if trace.finished_at is not None:
+            return
+        trace.finished_at = time.perf_counter()
+        trace.set(status=status, **attributes)
+        self._recent.append(trace)
+        if self._export_writer is not None:
+            self._export_writer.write(json.dumps(trace.to_dict(), ensure_ascii=False) + "\n")
+        self.trace_finished.emit(trace)
+
+    def set_export_path(self, export_path):
+        # Starts exporting to export_path, or stops exporting when it is None.
+        if export_path == self.export_path:
+            return
+        self.close()
+        self.export_path = export_path
+        if export_path:
+            self._export_writer = BackgroundLogWriter(export_path, parent=self)
+            self._export_writer.start()
+
+    def close(self, timeout_seconds=2.0):
+        # Writes out the queued traces and stops the export writer. Returns True if it ended within the timeout.
+        writer, self._export_writer, self.export_path = self._export_writer, None, None
+        return writer is None or writer.close(timeout_seconds)
+
+    def recent(self):
+
+        return list(self._recent)
+
+    def percentiles(self, percents=(50, 95)):
+        # {stage: {"count": n, p: milliseconds, ...}} over the recent traces.
+        durations = {}
+        for trace in self._recent:
+            for name, duration_ms in trace.stage_totals().items():
+                durations.setdefault(name, []).append(duration_ms)
+        return {
+            name: {"count": len(values), **{pct: percentile(values, pct) for pct in percents}}
+            for name, values in durations.items()
+        }
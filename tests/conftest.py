@@ -0,0 +1,42 @@
+import os
+import sys
+
+import pytest
+
+os.environ.setdefault("QT_QPA_PLATFORM", "offscreen") # Tests run without a display, also on CI machines
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from core.client_pool import model_pool
+from core.fake_backend import FakeGeminiBackend
+from core.hedging import set_hedging_options
+
+MODEL = "gemini-2.0-flash"
+BACKUP_MODEL = "gemini-2.0-flash-lite"
+
+@pytest.fixture
+def fake_backend():
+    # Serves every model_pool request from a fast local fake for the duration of a test.
+    backend = FakeGeminiBackend(latency_ms=1, chunks=3, chunk_interval_ms=0)
+    model_pool.set_backend(backend)
+    yield backend
+    model_pool.set_backend(None)
+
+@pytest.fixture
+def hedged_backend(monkeypatch):
+    # Hedging to BACKUP_MODEL after 50 ms, with a fake whose first request (seed 9) is in the slow tail and
+    # whose second is not, so the backup model answers the first request.
+    backend = FakeGeminiBackend(latency_ms=1, chunks=3, chunk_interval_ms=0, tail_rate=0.5, tail_latency_ms=5000,
+                                seed=9)
+    model_pool.set_backend(backend)
+    for module in ("core.gemini_worker", "core.async_engine"):
+        monkeypatch.setattr(f"{module}.hedge_delay_seconds", lambda model_name: 0.05)
+    set_hedging_options(True, BACKUP_MODEL)
+    yield backend
+    set_hedging_options(False)
+    model_pool.set_backend(None)
+
+@pytest.fixture(scope="session")
+def qapp():
+
+    from PyQt5.QtWidgets import QApplication
+    return QApplication.instance() or QApplication([])
@@ -0,0 +1,22 @@
+from core.async_engine import AsyncGeminiEngine
+from core.tracing import RequestTrace
+
+MODEL = "gemini-2.0-flash"
+BACKUP_MODEL = "gemini-2.0-flash-lite" # The hedged_backend fixture's backup model
+
+def test_slow_request_is_answered_by_the_backup_model(hedged_backend):
+
+    engine = AsyncGeminiEngine()
+    trace = RequestTrace("t1", "test", MODEL)
+    chunks = []
+    try:
+        result = engine.run(engine.generate("key", MODEL, "Explain hedging.", on_chunk=chunks.append, trace=trace),
+                            timeout_seconds=3)
+    finally:
+        engine.shutdown()
+    assert result["error"] is None
+    assert result["model"] == BACKUP_MODEL
+    assert result["text"] and "".join(chunks) == result["text"]
+    assert trace.attributes["hedged_to"] == BACKUP_MODEL
+    assert trace.attributes["answered_by"] == BACKUP_MODEL
+    assert hedged_backend.request_count == 2
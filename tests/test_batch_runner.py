@@ -0,0 +1,51 @@
+import pytest
+
+from core.async_engine import AsyncGeminiEngine
+from core.batch_runner import BatchRunner
+from core.response_cache import ResponseCache
+
+MODEL = "gemini-2.0-flash"
+BACKUP_MODEL = "gemini-2.0-flash-lite" # The hedged_backend fixture's backup model
+
+def write_tkinter_module(tmp_path):
+    # A module that uses tkinter in a few lines only, so it gets a targeted conversion.
+    helpers = "".join(f"def helper_{i}(value):\n    return value + {i}\n\n" for i in range(40))
+    path = tmp_path / "window.py"
+    path.write_text(f"import tkinter as tk\n\n{helpers}root = tk.Tk()\n", encoding="utf-8")
+    return str(path)
+
+def test_unmergeable_targeted_answer_is_not_cached(fake_backend, tmp_path):
+
+    response_cache = ResponseCache(str(tmp_path / "responses"))
+    runner = BatchRunner("key", MODEL, "convert", options={"source_lib": "tkinter", "target_lib": "PyQt5"},
+                         response_cache=response_cache)
+    path = write_tkinter_module(tmp_path)
+
+    result = runner.process_file(path) # The fake's answers have no region sections
+    assert result["status"] == "error"
+    assert "Could not merge the converted regions" in result["error"]
+    assert response_cache.stats()["entries"] == 0
+    assert not runner.process_file(path)["cached"] # The retry reaches the model again
+    assert fake_backend.request_count == 2
+
+@pytest.mark.parametrize("use_engine", [False, True], ids=["threads", "asyncio"])
+def test_hedged_answer_is_cached_as_the_backup_models(hedged_backend, tmp_path, use_engine):
+
+    response_cache = ResponseCache(str(tmp_path / "responses"))
+    engine = AsyncGeminiEngine() if use_engine else None
+    path = tmp_path / "buggy.py"
+    path.write_text("def mean(values):\n    return sum(values) / len(values) + 1\n", encoding="utf-8")
+    try:
+        result = BatchRunner("key", MODEL, "debug", response_cache=response_cache, engine=engine).process_file(
+            str(path)
+        )
+        assert result["status"] == "ok"
+        assert response_cache.stats()["entries"] == 1
+        backup_result = BatchRunner("key", BACKUP_MODEL, "debug", response_cache=response_cache,
+                                    engine=engine).process_file(str(path))
+        assert backup_result["cached"] and backup_result["response"] == result["response"]
+        assert not BatchRunner("key", MODEL, "debug", response_cache=response_cache,
+                               engine=engine).process_file(str(path))["cached"]
+    finally:
+        if engine is not None:
+            engine.shutdown()
@@ -0,0 +1,29 @@
+from core.code_chunker import split_source
+
+def method(name):
+
+    return f"    @property\n    def {name}(self):\n        return self._{name} * 2 + len('{name}' * 10)\n\n"
+
+def test_small_functions_are_packed_and_decorators_stay_on_their_definition():
+
+    code = "import os\n\n@staticmethod\ndef first():\n    return 1\n\n@staticmethod\ndef second():\n    return 2\n"
+    chunks = split_source(code, max_chars=45)
+    assert [text for _, _, text in chunks][1].startswith("@staticmethod\ndef first")
+    assert "".join(text for _, _, text in chunks) == code
+
+def test_oversized_class_is_split_between_its_members():
+
+    code = "class Settings:\n" + "".join(method(f"value_{i}") for i in range(12)) + "\ndef after():\n    pass\n"
+    chunks = split_source(code, max_chars=300)
+    assert len(chunks) > 2
+    assert "".join(text for _, _, text in chunks) == code
+    assert chunks[0][2].startswith("class Settings:\n    @property")
+    for _, _, text in chunks[1:]:
+        assert text.startswith(("    @property\n    def value_", "\ndef after", "def after"))
+    assert [first for first, _, _ in chunks] == sorted(first for first, _, _ in chunks)
+
+def test_unparseable_source_is_split_before_definitions():
+
+    code = "function a() {\n  return 1;\n}\n\nfunction b() {\n  return 2;\n}\n"
+    chunks = split_source(code, max_chars=35) # Room for one function, not two
+    assert [text.lstrip().split("(")[0] for _, _, text in chunks] == ["function a", "function b"]
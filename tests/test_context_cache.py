@@ -0,0 +1,94 @@
+from core import context_cache as context_cache_module
+from core.context_cache import ContextCache, context_cache
+from core.gemini_worker import GeminiWorker, build_full_prompt
+
+MODEL = "gemini-2.0-flash"
+DOCS = "Every public function needs a docstring. " * 1000 # Above the model's minimum cacheable size
+SMALL_DOCS = "Use snake_case."
+
+class FailingCacheBackend:
+    # Mixed into the fake to make every upload fail, like a key without access to context caching.
+
+    def create_cached_content(self, *args):
+
+        raise RuntimeError("caching is not available")
+
+def run_worker(api_key, docs_context):
+
+    results = []
+    worker = GeminiWorker(api_key, MODEL, "Explain the code.", docs_context, stream=False)
+    worker.finished.connect(results.append)
+    worker.error.connect(lambda error_msg: results.append("ERROR " + error_msg))
+    worker.run()
+    return results[0]
+
+def test_docs_prefix_is_uploaded_once_and_reused(fake_backend):
+
+    cache = ContextCache()
+    first = cache.model_for("key", MODEL, DOCS)
+    second = cache.model_for("key", MODEL, DOCS)
+    assert first is not None and first is second
+    assert len(fake_backend.cached_contents) == 1
+    response = first.generate_content("Task")
+    assert response.usage_metadata.cached_content_token_count > 0
+    assert response.usage_metadata.prompt_token_count > response.usage_metadata.cached_content_token_count
+
+def test_small_docs_are_sent_inline(fake_backend):
+
+    cache = ContextCache()
+    assert not cache.is_eligible(MODEL, SMALL_DOCS)
+    assert not cache.will_cache("key", MODEL, SMALL_DOCS)
+    assert cache.model_for("key", MODEL, SMALL_DOCS) is None
+    assert not fake_backend.cached_contents
+
+def test_failed_upload_backs_off_until_the_retry_window_ends(fake_backend, monkeypatch):
+
+    cache = ContextCache()
+    monkeypatch.setattr(fake_backend, "create_cached_content", FailingCacheBackend().create_cached_content)
+    assert cache.will_cache("key", MODEL, DOCS) # Nothing has failed yet
+    assert cache.model_for("key", MODEL, DOCS) is None
+    assert not cache.will_cache("key", MODEL, DOCS) # Retrieval takes over again
+    assert cache.will_cache("other key", MODEL, DOCS)
+
+    monkeypatch.undo()
+    assert cache.model_for("key", MODEL, DOCS) is None # Still inside the retry window, nothing is uploaded
+    assert not fake_backend.cached_contents
+    monkeypatch.setattr(context_cache_module, "CONTEXT_CACHE_RETRY_SECONDS", 0)
+    cache.invalidate() # Also forgets failures
+    assert cache.model_for("key", MODEL, DOCS) is not None
+    assert cache.will_cache("key", MODEL, DOCS)
+
+def test_handle_close_to_expiry_is_extended(fake_backend):
+
+    cache = ContextCache()
+    cache.configure(True, ttl_minutes=1) # Shorter than the refresh margin, so every use extends it
+    cache.model_for("key", MODEL, DOCS)
+    cached_content = next(iter(fake_backend.cached_contents.values()))
+    expires_at = cached_content.expires_at
+    cache.model_for("key", MODEL, DOCS)
+    assert cached_content.expires_at > expires_at
+    assert len(fake_backend.cached_contents) == 1
+
+def test_invalidate_and_close_delete_the_server_copies(fake_backend):
+
+    cache = ContextCache()
+    cache.model_for("key", MODEL, DOCS)
+    cache.invalidate(0).join()
+    assert not fake_backend.cached_contents
+    cache.model_for("key", MODEL, DOCS + "Changed.")
+    assert cache.close()
+    assert not fake_backend.cached_contents
+
+def test_worker_answers_the_same_with_the_cache_and_after_losing_it(fake_backend):
+
+    inline_answer = "".join(fake_backend._response_parts(MODEL, build_full_prompt("Explain the code.", DOCS)))
+    try:
+        assert run_worker("key", DOCS) == inline_answer
+        assert len(fake_backend.cached_contents) == 1
+        for cached_content in list(fake_backend.cached_contents.values()): # The server dropped it
+            fake_backend.delete_cached_content(cached_content)
+        assert run_worker("key", DOCS) == inline_answer # Falls back to the inline prompt
+        assert run_worker("key", DOCS) == inline_answer # Uploads it again
+        assert len(fake_backend.cached_contents) == 1
+    finally:
+        context_cache.close()
@@ -0,0 +1,164 @@
+import os
+
+import pytest
+
+from core import context_pack
+from core.context_pack import (IgnoreRules, ContextPackCache, scan_project, import_order, build_context_pack,
+                               _dedup_blocks, _cap_file)
+
+def write_tree(root, files):
+    # files: {relative path: text or bytes}
+    for rel_path, content in files.items():
+        path = root.joinpath(*rel_path.split("/"))
+        path.parent.mkdir(parents=True, exist_ok=True)
+        if isinstance(content, bytes):
+            path.write_bytes(content)
+        else:
+            path.write_text(content, encoding="utf-8")
+
+def rules(lines, base=""):
+
+    return IgnoreRules().extended(base, lines)
+
+def test_unanchored_patterns_match_in_any_directory():
+
+    ignore = rules(["*_test.py"])
+    assert ignore.is_ignored("a_test.py", False)
+    assert ignore.is_ignored("pkg/deep/b_test.py", False)
+    assert not ignore.is_ignored("pkg/test_helpers.py", False)
+
+def test_a_slash_anchors_the_pattern_to_the_ignore_files_directory():
+
+    ignore = rules(["/generated.py", "docs/conf.py"])
+    assert ignore.is_ignored("generated.py", False)
+    assert not ignore.is_ignored("pkg/generated.py", False)
+    assert ignore.is_ignored("docs/conf.py", False)
+    assert not ignore.is_ignored("pkg/docs/conf.py", False)
+
+def test_negation_re_includes_and_the_last_match_wins():
+
+    ignore = rules(["*.py", "!keep.py"])
+    assert ignore.is_ignored("drop.py", False)
+    assert not ignore.is_ignored("pkg/keep.py", False)
+    assert rules(["!keep.py", "*.py"]).is_ignored("keep.py", False)
+
+def test_trailing_slash_matches_directories_only():
+
+    ignore = rules(["out/"])
+    assert ignore.is_ignored("out", True)
+    assert ignore.is_ignored("pkg/out", True)
+    assert not ignore.is_ignored("out", False)
+
+def test_double_star_crosses_directories():
+
+    ignore = rules(["src/**/fixtures.py", "legacy/**"])
+    assert ignore.is_ignored("src/fixtures.py", False)
+    assert ignore.is_ignored("src/a/b/fixtures.py", False)
+    assert not ignore.is_ignored("tests/fixtures.py", False)
+    assert ignore.is_ignored("legacy/a/b.py", False)
+
+def test_rules_of_a_nested_ignore_file_apply_below_it_only():
+
+    ignore = rules(["*.py"], base="pkg")
+    assert ignore.is_ignored("pkg/a.py", False)
+    assert not ignore.is_ignored("a.py", False)
+    assert not ignore.is_ignored("pkgx/a.py", False)
+
+def test_scan_skips_hidden_build_and_ignored_files(tmp_path):
+
+    write_tree(tmp_path, {
+        ".gitignore": "secret_*.py\n",
+        "app.py": "", "secret_keys.py": "", "notes.txt": "",
+        ".venv/lib.py": "", "node_modules/x.js": "", "build/gen.py": "",
+        "pkg/.devmateignore": "*.js\n!keep.js\n", "pkg/core.py": "", "pkg/ui.js": "", "pkg/keep.js": "",
+    })
+    files, skipped = scan_project(str(tmp_path))
+    assert sorted(files) == ["app.py", "pkg/core.py", "pkg/keep.js"]
+    assert skipped == 0
+    files, skipped = scan_project(str(tmp_path), max_files=2)
+    assert len(files) == 2 and skipped == 1
+
+def test_import_order_puts_dependencies_first():
+
+    sources = {
+        "app.py": "from pkg import service\n",
+        "pkg/__init__.py": "",
+        "pkg/service.py": "from .models import User\nfrom . import util\n",
+        "pkg/models.py": "import os\n",
+        "pkg/util.py": "",
+    }
+    ordered = import_order(sources)
+    assert sorted(ordered) == sorted(sources)
+    position = {rel_path: index for index, rel_path in enumerate(ordered)}
+    assert position["pkg/models.py"] < position["pkg/service.py"] < position["app.py"]
+    assert position["pkg/util.py"] < position["pkg/service.py"]
+
+def test_import_cycles_keep_every_file_once():
+
+    sources = {"a.py": "import b\n", "b.py": "import c\n", "c.py": "import a\n", "d.py": "import a\n"}
+    ordered = import_order(sources)
+    assert sorted(ordered) == ["a.py", "b.py", "c.py", "d.py"]
+    assert ordered.index("a.py") < ordered.index("d.py")
+
+def test_repeated_blocks_become_references():
+
+    header = "# Copyright (c) Example\n# Licensed under MIT\n# See LICENSE\n# for details"
+    seen = {}
+    assert _dedup_blocks("a.py", f"{header}\n\nx = 1", seen) == f"{header}\n\nx = 1"
+    assert _dedup_blocks("b.py", f"{header}\n\ny = 2", seen) == "[... 4 lines identical to a.py:1 ...]\n\ny = 2"
+    assert _dedup_blocks("c.py", "x = 1\n\ny = 2", seen) == "x = 1\n\ny = 2" # Too short to count
+
+def test_long_files_are_cut_at_a_line_boundary(monkeypatch):
+
+    monkeypatch.setattr(context_pack, "PACK_MAX_FILE_CHARS", 20)
+    assert _cap_file("short") == ("short", False)
+    text, truncated = _cap_file("line one\nline two\nline three\nline four")
+    assert truncated
+    assert text == "line one\nline two\n[... truncated: 2 of 4 lines shown ...]"
+
+@pytest.fixture
+def counted_reads(monkeypatch):
+    # Counts read_sources calls, to see which builds had to read the tree.
+    calls = []
+    read_sources = context_pack.read_sources
+    monkeypatch.setattr(context_pack, "read_sources", lambda *args: calls.append(args) or read_sources(*args))
+    return calls
+
+def test_unchanged_tree_is_served_from_the_manifest_without_reading(tmp_path, counted_reads):
+
+    root = tmp_path / "project"
+    write_tree(root, {"a.py": "import b\n", "b.py": "VALUE = 1\n", "blob.py": bytes(range(256)) * 8})
+    cache = ContextPackCache(str(tmp_path / "cache"))
+    first = build_context_pack(str(root), cache)
+    assert not first.from_cache and first.file_count == 2
+    second = build_context_pack(str(root), cache)
+    assert second.from_cache and second.text == first.text
+    assert len(counted_reads) == 1 # The unreadable blob.py does not defeat the fast path
+
+def test_touched_files_are_hashed_again_but_reuse_the_pack(tmp_path, counted_reads):
+
+    root = tmp_path / "project"
+    write_tree(root, {"a.py": "VALUE = 1\n"})
+    cache = ContextPackCache(str(tmp_path / "cache"))
+    first = build_context_pack(str(root), cache)
+    stat = os.stat(root / "a.py")
+    os.utime(root / "a.py", ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+    second = build_context_pack(str(root), cache)
+    assert second.from_cache and second.text == first.text
+    assert len(counted_reads) == 2
+
+def test_changed_content_builds_a_new_pack(tmp_path):
+
+    root = tmp_path / "project"
+    write_tree(root, {"a.py": "VALUE = 1\n"})
+    cache = ContextPackCache(str(tmp_path / "cache"))
+    build_context_pack(str(root), cache)
+    write_tree(root, {"a.py": "VALUE = 22\n"})
+    pack = build_context_pack(str(root), cache)
+    assert not pack.from_cache and "VALUE = 22" in pack.text
+
+def test_a_folder_without_readable_sources_is_an_error(tmp_path):
+
+    write_tree(tmp_path, {"blob.py": bytes(range(256)) * 8, "notes.txt": "not source"})
+    with pytest.raises(ValueError):
+        build_context_pack(str(tmp_path))
@@ -0,0 +1,74 @@
+from core.docs_index import DocsIndex, chunk_document
+from core.token_counter import estimate_tokens
+
+DOCUMENTS = {
+    "signals.md": "# Signals\n\nConnect a pyqtSignal to a slot with connect. Signals cross threads safely.",
+    "layouts.md": "# Layouts\n\nQVBoxLayout stacks widgets vertically. QHBoxLayout places widgets side by side.",
+    "threads.md": "# Threads\n\nMove a worker QObject to a QThread. Emit a signal when the worker is done; "
+                  "the slot runs on the receiving thread. Never touch widgets from the worker thread.",
+}
+
+def build_index(documents=DOCUMENTS):
+
+    index = DocsIndex()
+    index.build(documents)
+    return index
+
+def test_best_matching_chunk_ranks_first():
+
+    index = build_index()
+    ranked = index.search("how do I stack widgets vertically")
+    assert index.chunks[ranked[0][1]]["source"] == "layouts.md"
+    assert [score for score, _ in ranked] == sorted((score for score, _ in ranked), reverse=True)
+
+def test_rare_terms_outweigh_common_ones():
+    # Same length and one match each; the chunk matching the term found in fewer chunks scores higher.
+    index = build_index({"a.md": "rare filler", "b.md": "common filler", "c.md": "common other"})
+    ranked = [index.chunks[chunk_id]["source"] for _, chunk_id in index.search("rare common")]
+    assert ranked[0] == "a.md"
+
+def test_unknown_terms_and_stopwords_match_nothing():
+
+    index = build_index()
+    assert index.search("the of and") == []
+    assert index.search("tkinter") == []
+    assert DocsIndex().search("signals") == []
+
+def test_select_context_keeps_to_the_token_budget():
+
+    index = build_index()
+    everything = index.select_context("widgets signals threads worker", top_k=10, token_budget=10_000)
+    assert everything.count("\n\n---\n\n") == 2 # All three documents fit
+
+    block_tokens = {
+        source: estimate_tokens(f"[{source}]\n{index.document_text(source)}") for source in DOCUMENTS
+    }
+    budget = max(block_tokens.values()) # Room for the largest block, not for two
+    selected = index.select_context("widgets signals threads worker", top_k=10, token_budget=budget)
+    assert selected
+    assert estimate_tokens(selected) <= budget
+    assert "---" not in selected
+
+def test_select_context_skips_a_block_that_does_not_fit_but_takes_smaller_ones():
+
+    big = "worker " * 170 # A strong match over the budget, in one chunk
+    index = build_index(dict(DOCUMENTS, **{"big.md": big}))
+    selected = index.select_context("worker", top_k=10, token_budget=200)
+    assert "[big.md]" not in selected
+    assert "[threads.md]" in selected
+
+def test_removed_documents_are_no_longer_found():
+
+    index = build_index()
+    index.remove_document("layouts.md")
+    assert index.search("QVBoxLayout") == []
+    index.set_document("layouts.md", DOCUMENTS["layouts.md"])
+    assert index.search("QVBoxLayout")
+
+def test_long_documents_are_split_at_headings_and_size():
+
+    text = "# One\n\n" + "\n\n".join(f"Paragraph {i} " + "x" * 300 for i in range(6)) + "\n\n# Two\n\nEnd."
+    chunks = chunk_document(text, max_chars=1000)
+    assert len(chunks) > 2
+    assert all(len(chunk) <= 1000 + 2 * 4 for chunk in chunks) # Joined paragraphs add their separators
+    assert chunks[-1].startswith("# Two")
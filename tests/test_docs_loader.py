@@ -0,0 +1,48 @@
+from PyQt5.QtCore import QEventLoop, QTimer
+
+from core.docs_loader import DocsLoader, scan_docs_tree
+
+def write_docs(docs_dir):
+
+    (docs_dir / "guides").mkdir(parents=True)
+    (docs_dir / ".hidden").mkdir()
+    (docs_dir / "intro.md").write_text("# Intro\n\nSignals and slots.", encoding="utf-8")
+    (docs_dir / "guides" / "threads.md").write_text("# Threads\n\nWorkers and QThread.", encoding="utf-8")
+    (docs_dir / ".hidden" / "skipped.md").write_text("Not indexed.", encoding="utf-8")
+    (docs_dir / "notes.rst").write_text("Not a docs file type.", encoding="utf-8")
+
+def wait_for_scan(loader, timeout_ms=5000):
+
+    loop = QEventLoop()
+    loader.docs_updated.connect(loop.quit)
+    QTimer.singleShot(timeout_ms, loop.quit)
+    loader.refresh()
+    loop.exec_()
+
+def test_scan_lists_doc_files_and_the_directories_walked(tmp_path):
+
+    docs_dir = tmp_path / "docs"
+    write_docs(docs_dir)
+    files, directories = scan_docs_tree(str(docs_dir))
+    assert sorted(files) == ["guides/threads.md", "intro.md"]
+    assert directories == [str(docs_dir), str(docs_dir / "guides")]
+    assert scan_docs_tree(str(tmp_path / "missing")) == ({}, [])
+
+def test_loader_watches_directories_only(qapp, tmp_path):
+
+    docs_dir = tmp_path / "docs"
+    write_docs(docs_dir)
+    loader = DocsLoader(str(docs_dir), str(tmp_path / "index.json"), str(tmp_path / "manifest.json"))
+    try:
+        wait_for_scan(loader)
+        assert loader.file_count() == 2
+        assert sorted(loader._watcher.directories()) == sorted([str(docs_dir), str(docs_dir / "guides")])
+        assert loader._watcher.files() == []
+
+        (docs_dir / "guides").joinpath("threads.md").write_text("# Threads\n\nChanged.", encoding="utf-8")
+        (docs_dir / "guides" / "deep").mkdir()
+        wait_for_scan(loader)
+        assert "Changed." in loader.docs_text() # Picked up from the manifest's mtime/size diff
+        assert str(docs_dir / "guides" / "deep") in loader._watcher.directories()
+    finally:
+        loader.stop()
@@ -0,0 +1,75 @@
+import codecs
+
+import pytest
+
+from core import file_loader
+from core.file_loader import BinaryFileError, FALLBACK_ENCODING, detect_encoding, iter_text_file, read_text_file
+
+TEXT = "# Größe: 5 €\nprint('déjà vu')\n"
+
+def write_bytes(tmp_path, data, name="sample.txt"):
+
+    path = tmp_path / name
+    path.write_bytes(data)
+    return str(path)
+
+@pytest.mark.parametrize("bom, encoding, expected", [
+    (codecs.BOM_UTF32_LE, "utf-32-le", "utf-32"), # Starts with the UTF-16 LE BOM, so it must be tried first
+    (codecs.BOM_UTF32_BE, "utf-32-be", "utf-32"),
+    (codecs.BOM_UTF16_LE, "utf-16-le", "utf-16"),
+    (codecs.BOM_UTF16_BE, "utf-16-be", "utf-16"),
+    (codecs.BOM_UTF8, "utf-8", "utf-8-sig"),
+])
+def test_bom_decides_the_encoding(tmp_path, bom, encoding, expected):
+
+    data = bom + TEXT.encode(encoding)
+    assert detect_encoding(data) == expected
+    text, detected, truncated = read_text_file(write_bytes(tmp_path, data))
+    assert (text, detected, truncated) == (TEXT, expected, False)
+
+def test_utf8_without_bom():
+
+    assert detect_encoding(TEXT.encode("utf-8")) == "utf-8"
+    assert detect_encoding(TEXT.encode("utf-8")[:4]) == "utf-8" # Cut inside "ö" at the end of the sample
+
+def test_legacy_code_page_text_is_read_back_intact(tmp_path):
+
+    text = "Café, naïve façade – “quotes” déjà vu. Œuvre à côté.\n" * 3
+    path = write_bytes(tmp_path, text.encode("cp1252"))
+    assert read_text_file(path) == (text, "cp1252", False)
+
+def test_cp1252_is_the_last_resort(monkeypatch):
+
+    monkeypatch.setattr(file_loader, "_guess_encoding", lambda sample: None)
+    assert detect_encoding("naïve".encode("cp1252")) == FALLBACK_ENCODING
+
+def test_nul_heavy_data_is_binary(tmp_path):
+
+    data = b"\x89PNG\r\n\x1a\n" + bytes(range(256)) * 8
+    with pytest.raises(BinaryFileError):
+        detect_encoding(data)
+    with pytest.raises(BinaryFileError):
+        next(iter_text_file(write_bytes(tmp_path, data, "blob.py")))
+
+def test_limit_drops_a_character_cut_in_half(tmp_path):
+
+    data = "aé€".encode("utf-8") # 1 + 2 + 3 bytes
+    path = write_bytes(tmp_path, data)
+    assert read_text_file(path, limit_bytes=4) == ("aé", "utf-8", True)
+    assert read_text_file(path, limit_bytes=len(data)) == ("aé€", "utf-8", False)
+
+@pytest.mark.parametrize("use_mmap", [False, True], ids=["read", "mmap"])
+def test_crlf_split_between_chunks_becomes_one_newline(tmp_path, monkeypatch, use_mmap):
+
+    if use_mmap:
+        monkeypatch.setattr(file_loader, "ATTACH_MMAP_THRESHOLD_BYTES", 1)
+    data = b"line one\r\nline two\r\n" * 50
+    path = write_bytes(tmp_path, data)
+    pieces = iter_text_file(path, chunk_bytes=9) # Every chunk boundary falls between "\r" and "\n"
+    assert next(pieces) == ("utf-8", len(data))
+    assert "".join(pieces) == "line one\nline two\n" * 50
+
+def test_lone_cr_at_the_end_is_a_newline(tmp_path):
+
+    path = write_bytes(tmp_path, b"old mac\r")
+    assert read_text_file(path)[0] == "old mac\n"
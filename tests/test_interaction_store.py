@@ -0,0 +1,51 @@
+import threading
+
+import pytest
+
+from core.interaction_store import InteractionStore, InteractionWriter
+
+@pytest.fixture
+def store(tmp_path):
+
+    store = InteractionStore(str(tmp_path / "interactions.db"), max_rows=3)
+    yield store
+    store.close()
+
+def test_the_oldest_rows_are_deleted_past_max_rows(store):
+
+    ids = [store.add("2026-01-01 00:00:00", f"prompt {index}", f"answer {index}") for index in range(5)]
+    assert store.count() == 3
+    assert [row[0] for row in store.page_ids()] == ids[:1:-1]
+    assert store.get(ids[0]) is None
+    assert store.count("prompt") == 3 # Deleted rows left the search index too
+
+def test_writer_stores_off_the_calling_thread_and_reports_the_row_queued(qapp, store, monkeypatch):
+
+    added, insert_threads = [], []
+    add = store.add
+    monkeypatch.setattr(store, "add", lambda *args, **kwargs: insert_threads.append(threading.current_thread())
+                        or add(*args, **kwargs))
+    writer = InteractionWriter(store)
+    writer.interaction_added.connect(lambda *row: added.append((row, threading.current_thread())))
+    writer.start()
+    writer.add("2026-01-01 00:00:00", "why", "because", tab="debug", latency_ms=12)
+    assert writer.flush(timeout_seconds=5)
+    assert insert_threads[0] is not threading.current_thread()
+    assert added == [] # Delivered by the event loop of the thread that connected, like a GUI slot
+    qapp.processEvents()
+    (interaction_id, text_length), slot_thread = added[0]
+    assert slot_thread is threading.current_thread()
+    row = store.get(interaction_id)
+    assert (row["prompt"], row["tab"], row["latency_ms"], text_length) == ("why", "debug", 12, len("whybecause"))
+    writer.close()
+
+def test_writer_close_stores_what_is_queued(store):
+
+    writer = InteractionWriter(store)
+    for index in range(3):
+        writer.add("2026-01-01 00:00:00", f"prompt {index}", "answer")
+    writer.start()
+    assert writer.close(timeout_seconds=5)
+    assert store.count() == 3
+    writer.add("2026-01-01 00:00:00", "after close", "answer") # Ignored
+    assert store.count("after") == 0
@@ -0,0 +1,109 @@
+from PyQt5.QtCore import QObject, pyqtSignal
+
+from core.job_scheduler import GeminiJobScheduler, PRIORITY_HIGH, PRIORITY_LOW
+
+class StubWorker(QObject):
+    # Runs on "the engine" (no thread) and only finishes when the test says so.
+
+    chunk_received = pyqtSignal(str)
+    usage_reported = pyqtSignal(int, int)
+    retrying = pyqtSignal(int, float)
+    finished = pyqtSignal(str)
+    error = pyqtSignal(str)
+    done = pyqtSignal()
+    runs_on_engine = True
+
+    def __init__(self, name, started):
+        super().__init__()
+        self.name = name
+        self.started = started
+        self.stopped = False
+
+    def run(self):
+
+        self.started.append(self.name)
+
+    def stop(self):
+
+        self.stopped = True
+
+    def complete(self):
+
+        self.finished.emit(self.name)
+        self.done.emit()
+
+def submit_all(scheduler, started, jobs, **kwargs):
+    # jobs: (group, name) pairs; returns name -> (job id, worker).
+    submitted = {}
+    for group, name in jobs:
+        worker = StubWorker(name, started)
+        submitted[name] = (scheduler.submit(group, worker, **kwargs), worker)
+    return submitted
+
+def test_groups_take_turns(qapp):
+
+    started = []
+    scheduler = GeminiJobScheduler(max_in_flight=1)
+    jobs = submit_all(scheduler, started, [("a", "a1"), ("a", "a2"), ("a", "a3"), ("b", "b1"), ("b", "b2")],
+                      serial=False)
+    for _ in range(4):
+        jobs[started[-1]][1].complete()
+    assert started == ["a1", "b1", "a2", "b2", "a3"]
+
+def test_priority_goes_before_turn_order(qapp):
+
+    started = []
+    scheduler = GeminiJobScheduler(max_in_flight=1)
+    jobs = submit_all(scheduler, started, [("a", "a1"), ("a", "a2")], priority=PRIORITY_LOW)
+    jobs.update(submit_all(scheduler, started, [("b", "b1")], priority=PRIORITY_HIGH))
+    jobs["a1"][1].complete()
+    assert started == ["a1", "b1"]
+
+def test_serial_jobs_of_a_group_never_overlap(qapp):
+
+    started = []
+    scheduler = GeminiJobScheduler(max_in_flight=3)
+    jobs = submit_all(scheduler, started, [("a", "a1"), ("a", "a2"), ("b", "b1")])
+    assert started == ["a1", "b1"]
+    assert scheduler.running_count() == 2 and scheduler.queued_count() == 1
+    jobs["a1"][1].complete()
+    assert started == ["a1", "b1", "a2"]
+
+def test_parallel_jobs_of_a_group_fill_the_slots(qapp):
+
+    started = []
+    scheduler = GeminiJobScheduler(max_in_flight=2)
+    submit_all(scheduler, started, [("a", "a1"), ("a", "a2"), ("a", "a3")], serial=False)
+    assert started == ["a1", "a2"]
+    assert scheduler.queued_count() == 1
+
+def test_cancel_group_stops_running_and_drops_queued_jobs(qapp):
+
+    started, cancelled = [], []
+    scheduler = GeminiJobScheduler(max_in_flight=1)
+    jobs = submit_all(scheduler, started, [("a", "a1"), ("a", "a2"), ("b", "b1")],
+                      on_cancelled=cancelled.append)
+    assert scheduler.cancel_group("a") == 2
+    assert jobs["a1"][1].stopped
+    assert sorted(cancelled) == sorted([jobs["a1"][0], jobs["a2"][0]])
+    assert started == ["a1", "b1"] # The freed slot goes to the other group right away
+    assert not scheduler.has_pending_jobs("a")
+    assert scheduler.has_pending_jobs("b")
+
+def test_results_of_a_cancelled_job_are_dropped(qapp):
+
+    started, results = [], []
+    scheduler = GeminiJobScheduler(max_in_flight=1)
+    jobs = submit_all(scheduler, started, [("a", "a1")], on_finished=results.append)
+    scheduler.cancel(jobs["a1"][0])
+    jobs["a1"][1].complete()
+    assert results == []
+
+def test_new_groups_are_served_in_the_order_they_arrived(qapp):
+
+    started = []
+    scheduler = GeminiJobScheduler(max_in_flight=1)
+    jobs = submit_all(scheduler, started, [("a", "a1"), ("a", "a2"), ("b", "b1"), ("c", "c1")], serial=False)
+    for _ in range(3):
+        jobs[started[-1]][1].complete()
+    assert started == ["a1", "b1", "c1", "a2"]
@@ -0,0 +1,89 @@
+import gzip
+
+import pytest
+
+from core.log_writer import BackgroundLogWriter
+
+@pytest.fixture
+def make_writer(tmp_path):
+    # Writers on tmp_path/chat.log that only write when flushed or closed, closed after the test.
+    writers = []
+
+    def make(start=True, **options):
+        options.setdefault("flush_interval", 60.0)
+        writer = BackgroundLogWriter(str(tmp_path / "chat.log"), **options)
+        if start:
+            writer.start()
+        writers.append(writer)
+        return writer
+
+    yield make
+    for writer in writers:
+        writer.close()
+
+def read_segment(path):
+
+    with gzip.open(path, 'rt', encoding='utf-8') as f:
+        return f.read()
+
+def test_flush_returns_once_the_entries_are_on_disk(make_writer, tmp_path):
+
+    writer = make_writer()
+    writer.write("first\n")
+    writer.write("second\n")
+    assert not (tmp_path / "chat.log").exists() # Queued only, until the flush interval or a flush
+    assert writer.flush(timeout_seconds=5)
+    assert (tmp_path / "chat.log").read_text(encoding="utf-8") == "first\nsecond\n"
+
+def test_close_drains_the_queue(make_writer, tmp_path):
+
+    writer = make_writer()
+    for index in range(100):
+        writer.write(f"entry {index}\n")
+    assert writer.close(timeout_seconds=5)
+    assert (tmp_path / "chat.log").read_text(encoding="utf-8").count("entry ") == 100
+    writer.write("after close\n") # Ignored
+    assert "after close" not in (tmp_path / "chat.log").read_text(encoding="utf-8")
+
+def test_a_full_batch_is_written_without_waiting_for_the_interval(make_writer, tmp_path):
+
+    writer = make_writer(batch_max_bytes=10)
+    writer.write("0123456789\n")
+    writer.flush(timeout_seconds=0.5) # A flush of its own is queued behind the batch, so this is quick
+    assert (tmp_path / "chat.log").read_text(encoding="utf-8") == "0123456789\n"
+
+def test_size_rotation_gzips_the_full_file(make_writer, tmp_path):
+
+    writer = make_writer(max_bytes=100)
+    writer.write("a" * 60 + "\n")
+    writer.flush(5)
+    writer.write("b" * 60 + "\n") # Would take the file over max_bytes
+    writer.flush(5)
+    segments = writer.rotated_segments()
+    assert len(segments) == 1 and segments[0].endswith(".gz")
+    assert read_segment(segments[0]) == "a" * 60 + "\n"
+    assert (tmp_path / "chat.log").read_text(encoding="utf-8") == "b" * 60 + "\n"
+
+def test_only_the_newest_segments_are_kept(make_writer, tmp_path):
+
+    writer = make_writer(max_bytes=10, keep_segments=2)
+    for index in range(5):
+        writer.write(f"entry {index}\n")
+        writer.flush(5)
+    segments = writer.rotated_segments()
+    assert [read_segment(path) for path in segments] == ["entry 2\n", "entry 3\n"]
+    assert (tmp_path / "chat.log").read_text(encoding="utf-8") == "entry 4\n"
+
+def test_entries_over_the_backlog_limit_are_dropped_with_a_note(make_writer, tmp_path):
+
+    writer = make_writer(start=False, max_pending_bytes=20) # Not started yet: the writer is "stalled"
+    writer.write("0123456789\n")
+    writer.write("abcdefghij\n") # Over the limit
+    writer.write("klmnopqrst\n")
+    writer.start()
+    assert writer.flush(5)
+    text = (tmp_path / "chat.log").read_text(encoding="utf-8")
+    assert text == "0123456789\n[... 2 log entries dropped while the disk was busy ...]\n"
+    writer.write("next\n")
+    writer.flush(5)
+    assert (tmp_path / "chat.log").read_text(encoding="utf-8").endswith("busy ...]\nnext\n") # Noted only once
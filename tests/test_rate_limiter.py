@@ -0,0 +1,126 @@
+import pytest
+
+from core.rate_limiter import TokenBucket, ModelRateLimiter, retry_hint_seconds, backoff_delay
+from core.constants import RETRY_MAX_DELAY_SECONDS
+
+class FakeClock:
+
+    def __init__(self, now=1000.0):
+        self.now = now
+
+    def __call__(self):
+
+        return self.now
+
+    def advance(self, seconds):
+
+        self.now += seconds
+
+def test_bucket_refills_at_its_rate_up_to_capacity():
+
+    bucket = TokenBucket(10, 2.0, now=0.0)
+    bucket.take(10, 0.0)
+    assert bucket.wait_time(1, 0.0) == pytest.approx(0.5)
+    assert bucket.wait_time(4, 1.0) == pytest.approx(1.0) # 2 tokens back after a second
+    assert bucket.wait_time(4, 2.0) == 0.0
+    assert bucket.wait_time(10, 100.0) == 0.0 # Never more than capacity
+    bucket.take(10, 100.0)
+    assert bucket.wait_time(1, 100.0) == pytest.approx(0.5)
+
+def test_requests_larger_than_the_bucket_wait_for_a_full_one():
+
+    bucket = TokenBucket(10, 1.0, now=0.0)
+    bucket.take(4, 0.0)
+    assert bucket.wait_time(25, 0.0) == pytest.approx(4.0)
+    bucket.take(25, 4.0)
+    assert bucket.wait_time(1, 4.0) == pytest.approx(1.0)
+
+def test_give_back_corrects_a_reservation():
+
+    bucket = TokenBucket(100, 1.0, now=0.0)
+    bucket.take(80, 0.0)
+    bucket.give_back(50, 0.0) # Only 30 were used
+    assert bucket.wait_time(70, 0.0) == 0.0
+    bucket.give_back(-40, 0.0) # 40 more than estimated
+    assert bucket.wait_time(70, 0.0) == pytest.approx(40.0)
+
+def test_requests_per_minute_limit():
+
+    clock = FakeClock()
+    limiter = ModelRateLimiter(requests_per_minute=3, tokens_per_minute=1_000_000, clock=clock)
+    assert all(limiter.try_acquire() for _ in range(3))
+    assert not limiter.try_acquire()
+    clock.advance(19.9)
+    assert not limiter.try_acquire()
+    clock.advance(0.2) # One request per 20 seconds comes back
+    assert limiter.try_acquire()
+    assert not limiter.try_acquire()
+
+def test_tokens_per_minute_limit_and_settle():
+
+    clock = FakeClock()
+    limiter = ModelRateLimiter(requests_per_minute=100, tokens_per_minute=6000, clock=clock)
+    assert limiter.try_acquire(5000)
+    assert not limiter.try_acquire(2000)
+    limiter.settle(5000, 1000) # The server counted fewer tokens than estimated
+    assert limiter.try_acquire(2000)
+    clock.advance(30) # 3000 tokens refilled
+    assert limiter.try_acquire(3000)
+
+def test_a_failed_try_reserves_nothing():
+
+    clock = FakeClock()
+    limiter = ModelRateLimiter(requests_per_minute=2, tokens_per_minute=1000, clock=clock)
+    assert limiter.try_acquire(800)
+    assert not limiter.try_acquire(500) # Only 200 tokens left...
+    assert limiter.try_acquire(200) # ...and the failed try took neither the last request nor tokens
+
+def test_pause_holds_back_every_request():
+
+    clock = FakeClock()
+    limiter = ModelRateLimiter(requests_per_minute=100, tokens_per_minute=100_000, clock=clock)
+    limiter.pause(5)
+    assert not limiter.try_acquire()
+    clock.advance(5)
+    assert limiter.try_acquire()
+
+def test_acquire_gives_up_when_cancelled():
+
+    clock = FakeClock()
+    limiter = ModelRateLimiter(requests_per_minute=1, tokens_per_minute=1000, clock=clock)
+    assert limiter.acquire()
+    checks = []
+
+    def should_continue():
+        checks.append(clock.now)
+        return len(checks) < 3
+
+    assert not limiter.acquire(should_continue=should_continue)
+    clock.advance(60)
+    assert limiter.try_acquire() # The cancelled wait reserved nothing
+
+def test_acquire_waits_until_the_quota_refills():
+
+    clock = FakeClock()
+    limiter = ModelRateLimiter(requests_per_minute=1, tokens_per_minute=1000, clock=clock)
+    assert limiter.acquire()
+
+    def should_continue(): # Each check moves the fake time on by 25 seconds
+        clock.advance(25)
+        return True
+
+    started_at = clock.now
+    assert limiter.acquire(should_continue=should_continue)
+    assert clock.now - started_at == 75 # Refilled after 60 seconds, noticed at the next check
+
+def test_retry_hint_is_read_from_the_error_message():
+
+    assert retry_hint_seconds(Exception("Quota exceeded. Please retry in 12.5s.")) == 12.5
+    assert retry_hint_seconds(Exception("retry_delay { seconds: 7 }")) == 7.0
+    assert retry_hint_seconds(Exception("Quota exceeded.")) is None
+
+def test_backoff_delay_is_capped():
+
+    assert 10.0 <= backoff_delay(0, retry_hint=10.0) <= 12.0
+    assert backoff_delay(0, retry_hint=10_000) <= RETRY_MAX_DELAY_SECONDS * 1.2
+    assert all(0 <= backoff_delay(attempt) <= RETRY_MAX_DELAY_SECONDS for attempt in range(20))
@@ -0,0 +1,84 @@
+import types
+
+import pytest
+
+from core import response_cache as response_cache_module
+from core.response_cache import ResponseCache
+
+MODEL = "gemini-2.0-flash"
+CONFIG = {"temperature": 0.2, "max_output_tokens": 8192}
+
+@pytest.fixture
+def clock(monkeypatch):
+    # Replaces the cache's wall clock, so entries get distinct, controlled access times.
+    now = {"time": 1_700_000_000.0}
+    monkeypatch.setattr(response_cache_module, "time", types.SimpleNamespace(time=lambda: now["time"]))
+    return now
+
+def entry_size(tmp_path, text):
+    # Bytes one entry with text takes on disk.
+    probe = ResponseCache(str(tmp_path / "probe"))
+    probe.put("probe", text, MODEL)
+    return probe.stats()["bytes"]
+
+def test_key_is_stable_and_covers_every_input():
+
+    key = ResponseCache.make_key(MODEL, "prompt", "docs", CONFIG)
+    assert key == ResponseCache.make_key(MODEL, "prompt", "docs", dict(reversed(list(CONFIG.items()))))
+    assert len(key) == 64 # A sha256 hex digest, also used as the entry's file name
+    variants = [
+        ResponseCache.make_key("gemini-1.5-pro", "prompt", "docs", CONFIG),
+        ResponseCache.make_key(MODEL, "prompt!", "docs", CONFIG),
+        ResponseCache.make_key(MODEL, "prompt", "other docs", CONFIG),
+        ResponseCache.make_key(MODEL, "prompt", "docs", dict(CONFIG, temperature=0.9)),
+    ]
+    assert key not in variants and len(set(variants)) == len(variants)
+
+def test_hits_and_misses_are_counted(tmp_path):
+
+    cache = ResponseCache(str(tmp_path))
+    assert cache.get("missing") is None
+    cache.put("key", "answer", MODEL)
+    assert cache.get("key") == "answer"
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["entries"]) == (1, 1, 1)
+    cache.invalidate("key")
+    assert cache.get("key") is None
+    assert cache.stats()["misses"] == 2 and cache.stats()["entries"] == 0
+
+def test_entries_survive_a_restart(tmp_path):
+
+    ResponseCache(str(tmp_path)).put("key", "answer", MODEL)
+    assert ResponseCache(str(tmp_path)).get("key") == "answer"
+
+def test_least_recently_used_entries_go_first_when_over_size(tmp_path, clock):
+
+    size = entry_size(tmp_path, "answer 0")
+    cache = ResponseCache(str(tmp_path / "cache"), max_bytes=size * 2)
+    cache.put("a", "answer 0", MODEL)
+    clock["time"] += 1
+    cache.put("b", "answer 1", MODEL)
+    clock["time"] += 1
+    assert cache.get("a") == "answer 0" # Now b is the least recently used
+    clock["time"] += 1
+    cache.put("c", "answer 2", MODEL)
+    assert cache.get("b") is None
+    assert cache.get("a") == "answer 0" and cache.get("c") == "answer 2"
+    assert cache.stats()["bytes"] <= size * 2
+
+def test_entries_older_than_max_age_expire(tmp_path, clock):
+
+    cache = ResponseCache(str(tmp_path), max_age_seconds=60)
+    cache.put("old", "answer", MODEL)
+    clock["time"] += 61
+    assert cache.get("old") is None
+    assert cache.stats()["entries"] == 0
+
+def test_unused_entries_are_evicted_on_the_next_write(tmp_path, clock):
+
+    cache = ResponseCache(str(tmp_path), max_age_seconds=60)
+    cache.put("old", "answer", MODEL)
+    clock["time"] += 61
+    cache.put("new", "answer", MODEL)
+    assert cache.stats()["entries"] == 1
+    assert not (tmp_path / "ol" / "old.json").exists()
@@ -0,0 +1,40 @@
+import os
+import sys
+import subprocess
+
+from core.constants import DEFAULT_STARTUP_BUDGET_MS, PROJECT_ROOT_ENV_VAR, STARTUP_CHECK_FLAG, SETTINGS_FILE_NAME
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFERRED_MODULES = ("google.generativeai", "google.api_core", "markdown2", "asyncio") # Loaded on first use only
+
+# Builds and paints the window like app.py does, then lists the deferred modules that got imported anyway.
+IMPORTED_MODULES_SCRIPT = """
+import sys
+import app
+from PyQt5.QtWidgets import QApplication
+qt_app = QApplication(sys.argv[:1])
+window = app.MainWindow(app.APP_VERSION_CONST, app.APP_DEVELOPER_CONST, project_root=app.DATA_ROOT)
+window.show()
+qt_app.processEvents()
+print(",".join(name for name in {modules!r} if name in sys.modules))
+"""
+
+def run_python(args, project_root):
+    # Runs Python in a fresh process (a cold start), headless and with settings, logs and caches in project_root.
+    env = dict(os.environ, QT_QPA_PLATFORM="offscreen", **{PROJECT_ROOT_ENV_VAR: str(project_root)})
+    return subprocess.run([sys.executable] + args, cwd=REPO_ROOT, env=env, capture_output=True, text=True,
+                          timeout=120)
+
+def test_cold_start_is_within_budget(tmp_path):
+
+    completed = run_python(["app.py", f"{STARTUP_CHECK_FLAG}={DEFAULT_STARTUP_BUDGET_MS}"], tmp_path)
+    assert completed.returncode == 0, completed.stderr
+    assert "budget" in completed.stderr
+
+def test_startup_defers_the_sdk_markdown_and_asyncio(tmp_path):
+    # The first-run notice about the docs folder is modal, so it is marked as shown already.
+    (tmp_path / SETTINGS_FILE_NAME).write_text("[General]\ndocs_loaded_once=true\n", encoding="utf-8")
+    completed = run_python(["-c", IMPORTED_MODULES_SCRIPT.format(modules=DEFERRED_MODULES)], tmp_path)
+    assert completed.returncode == 0, completed.stderr
+    imported = completed.stdout.splitlines()[-1] # The script's own line comes last, after any warnings
+    assert imported == "", f"Imported at startup: {imported}"
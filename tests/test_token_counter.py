@@ -0,0 +1,70 @@
+from core.token_counter import estimate_tokens, fit_input, truncate_to_tokens, TRUNCATION_MARKER
+from core.constants import OVERSIZE_STRATEGY_CHUNK, OVERSIZE_STRATEGY_TRUNCATE, OVERSIZE_STRATEGY_BLOCK
+
+def build_prompt(text):
+
+    return f"Review the following code and list its bugs.\n\n```python\n{text}\n```"
+
+def make_source(functions=60):
+    # Many small top-level functions, so the chunker has boundaries to split on.
+    return "".join(f"def function_{i}(value):\n    total = value * {i}\n    return total + {i}\n\n\n"
+                   for i in range(functions))
+
+def test_estimate_counts_words_and_punctuation():
+
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("print") == 2
+    assert estimate_tokens("a = b(c)") == 6
+    assert estimate_tokens("x" * 40) == 10
+
+def test_text_that_fits_is_sent_as_is():
+
+    source = make_source(3)
+    assert fit_input(source, build_prompt, 10_000, OVERSIZE_STRATEGY_BLOCK) == (None, source)
+
+def test_block_strategy_refuses_oversized_text():
+
+    assert fit_input(make_source(), build_prompt, 300, OVERSIZE_STRATEGY_BLOCK) == (OVERSIZE_STRATEGY_BLOCK, None)
+
+def test_every_strategy_blocks_when_the_prompt_alone_is_over_budget():
+
+    budget = estimate_tokens(build_prompt("")) - 1
+    for strategy in (OVERSIZE_STRATEGY_TRUNCATE, OVERSIZE_STRATEGY_CHUNK):
+        assert fit_input(make_source(), build_prompt, budget, strategy) == (OVERSIZE_STRATEGY_BLOCK, None)
+
+def test_truncate_strategy_keeps_leading_whole_lines_within_budget():
+
+    source = make_source()
+    strategy, payload = fit_input(source, build_prompt, 300, OVERSIZE_STRATEGY_TRUNCATE)
+    assert strategy == OVERSIZE_STRATEGY_TRUNCATE
+    assert payload.endswith(TRUNCATION_MARKER)
+    kept = payload[:-len(TRUNCATION_MARKER)]
+    assert kept and source.startswith(kept) and kept.endswith("\n")
+    assert estimate_tokens(build_prompt(payload)) <= 300
+
+def test_chunk_strategy_splits_into_prompts_that_each_fit():
+
+    source = make_source()
+    strategy, chunks = fit_input(source, build_prompt, 300, OVERSIZE_STRATEGY_CHUNK)
+    assert strategy == OVERSIZE_STRATEGY_CHUNK
+    assert len(chunks) > 1
+    assert all(estimate_tokens(build_prompt(chunk_text)) <= 300 for _, _, chunk_text in chunks)
+    assert [first for first, _, _ in chunks] == sorted(first for first, _, _ in chunks)
+    assert all(f"def function_{i}(" in "".join(text for _, _, text in chunks) for i in range(60))
+
+def test_chunk_strategy_truncates_when_chunking_is_not_allowed():
+
+    strategy, payload = fit_input(make_source(), build_prompt, 300, OVERSIZE_STRATEGY_CHUNK, allow_chunking=False)
+    assert strategy == OVERSIZE_STRATEGY_TRUNCATE
+    assert payload.endswith(TRUNCATION_MARKER)
+
+def test_chunk_strategy_truncates_text_that_cannot_be_split():
+
+    one_line = "values = [" + ", ".join(str(i) for i in range(2000)) + "]\n"
+    strategy, payload = fit_input(one_line, build_prompt, 300, OVERSIZE_STRATEGY_CHUNK)
+    assert strategy == OVERSIZE_STRATEGY_TRUNCATE
+    assert payload == TRUNCATION_MARKER # Not even its one line fits
+
+def test_truncate_leaves_text_within_budget_alone():
+
+    assert truncate_to_tokens("short text", 100) == "short text"
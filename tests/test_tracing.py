@@ -0,0 +1,28 @@
+import json
+
+from core.tracing import Tracer, span
+
+def test_finished_traces_are_exported_as_json_lines(tmp_path):
+
+    export_path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(export_path))
+    trace = tracer.start_trace("debug", "model-a")
+    with span(trace, "network"):
+        pass
+    tracer.finish(trace, prompt_tokens=3)
+    tracer.finish(trace) # Already finished: ignored
+    assert tracer.close(timeout_seconds=5)
+    lines = export_path.read_text(encoding="utf-8").splitlines()
+    assert len(lines) == 1
+    exported = json.loads(lines[0])
+    assert (exported["tab"], exported["status"], exported["prompt_tokens"]) == ("debug", "ok", 3)
+    assert [item["name"] for item in exported["spans"]] == ["network"]
+
+def test_export_can_be_turned_off(tmp_path):
+
+    export_path = tmp_path / "traces.jsonl"
+    tracer = Tracer(str(export_path))
+    tracer.set_export_path(None)
+    tracer.finish(tracer.start_trace("debug", "model-a"))
+    assert not export_path.exists()
+    assert len(tracer.recent()) == 1
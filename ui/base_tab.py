@@ -1,10 +1,18 @@
+import os
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QTextEdit, QLabel,
                              QPushButton, QHBoxLayout, QFileDialog, QMessageBox, QStyle)
 from PyQt5.QtWidgets import QApplication
+from PyQt5.QtGui import QTextCursor
 from core.translation import tr
+from core.file_loader import FileLoader, format_size
+from core.token_counter import fit_input, estimate_tokens
+from core.constants import (OVERSIZE_STRATEGY_BLOCK, OVERSIZE_STRATEGY_CHUNK, OVERSIZE_STRATEGY_TRUNCATE,
+                            CONTEXT_PACK_DIR_NAME)
 
 class BaseFeatureTab(QWidget):
 
+    attach_file_filter = "Python Files (*.py);;Text Files (*.txt);;All Files (*)"
+
     def __init__(self, main_window):
         super().__init__()
         self.main_window = main_window
@@ -15,12 +23,27 @@ class BaseFeatureTab(QWidget):
 
         self.last_prompt = None
         self.last_tab_name_for_log = ""
+        self.token_input_widget = None # Main input whose size is shown in the status bar
+        self._chunked_run = None
+        self._last_chunked_request = None
+        self.file_loader = FileLoader(self) # Attached files are read off the GUI thread
+        self.file_loader.piece_loaded.connect(self._on_attach_piece_loaded)
+        self.file_loader.finished.connect(self._on_attach_finished)
+        self.file_loader.error.connect(self._on_attach_failed)
+        self._attaching_path = None
+        self.context_pack_loader = None # Built when a folder is first attached
 
         self._init_specific_ui_elements()
         self._setup_layout_structure()
         self._populate_common_layout_elements()
         self._connect_signals()
         self._connect_common_signals()
+        if self.token_input_widget is not None:
+            self.token_input_widget.textChanged.connect(self.main_window.schedule_token_count_update)
+
+    def input_text(self):
+
+        return self.token_input_widget.toPlainText() if self.token_input_widget is not None else ""
 
     def _init_specific_ui_elements(self):
 
@@ -43,6 +66,11 @@ class BaseFeatureTab(QWidget):
         self.save_btn._translatable_key = "save_result_btn"
         self.save_btn.setIcon(self.style().standardIcon(QStyle.SP_DialogSaveButton))
 
+        self.cancel_btn = QPushButton(tr("cancel_request_btn"))
+        self.cancel_btn._translatable_key = "cancel_request_btn"
+        self.cancel_btn.setIcon(self.style().standardIcon(QStyle.SP_BrowserStop))
+        self.cancel_btn.setEnabled(False)
+
         self.regenerate_btn = QPushButton(tr("regenerate_btn"))
         self.regenerate_btn._translatable_key = "regenerate_btn"
         self.regenerate_btn.setIcon(self.style().standardIcon(QStyle.SP_BrowserReload))
@@ -51,6 +79,7 @@ class BaseFeatureTab(QWidget):
         self.layout.addWidget(self.result_display, 1) # Stretch factor for result display
 
         result_buttons_layout = QHBoxLayout()
+        result_buttons_layout.addWidget(self.cancel_btn)
         result_buttons_layout.addStretch()
         result_buttons_layout.addWidget(self.copy_btn)
         result_buttons_layout.addWidget(self.save_btn)
@@ -66,19 +95,251 @@ class BaseFeatureTab(QWidget):
         self.copy_btn.clicked.connect(self._copy_result)
         self.save_btn.clicked.connect(self._save_result)
         self.regenerate_btn.clicked.connect(self._regenerate_result)
+        self.cancel_btn.clicked.connect(self._cancel_request)
+        self.main_window.job_scheduler.queue_changed.connect(self._update_cancel_button)
+
+    def _attach_file(self):
+
+        options = QFileDialog.Options()
+        file_path, _ = QFileDialog.getOpenFileName(
+            self, tr("attach_file_btn"), "", self.attach_file_filter, options=options
+        )
+        if file_path:
+            self.attach_file(file_path)
+
+    def _attach_folder(self):
+
+        folder = QFileDialog.getExistingDirectory(self, tr("attach_folder_btn"))
+        if folder:
+            self.attach_folder(folder)
+
+    def attach_folder(self, folder):
+        # Puts a context pack of the source files under folder into the input editor: ignore rules applied,
+        # files in import order, duplicates dropped. Built in the background and cached by content.
+        if self.context_pack_loader is None:
+            from core.context_pack import ContextPackLoader, ContextPackCache # Only needed once a folder is attached
+            self.context_pack_loader = ContextPackLoader(
+                ContextPackCache(os.path.join(self.main_window.cache_dir, CONTEXT_PACK_DIR_NAME)), self
+            )
+            self.context_pack_loader.finished.connect(self._on_context_pack_built)
+            self.context_pack_loader.error.connect(self._on_attach_failed)
+        self.file_loader.stop(0)
+        self.token_input_widget.setReadOnly(True)
+        self._attaching_path = folder
+        self.context_pack_loader.load(folder)
+        self.main_window.statusBar().showMessage(tr("attach_folder_loading", name=os.path.basename(folder)))
+
+    def _on_context_pack_built(self, pack):
+
+        folder, self._attaching_path = self._attaching_path, None
+        self.token_input_widget.setPlainText(pack.text)
+        self._end_attach()
+        message = tr("attach_folder_done", name=os.path.basename(folder), files=pack.file_count,
+                     duplicates=pack.duplicate_count, truncated=pack.truncated_count, omitted=pack.omitted_count)
+        if pack.from_cache:
+            message += " " + tr("attach_folder_cached")
+        self.main_window.statusBar().showMessage(message, 8000)
+        self._on_folder_attached(pack)
+
+    def _on_folder_attached(self, pack):
+        # Hook for tabs that react to an attached folder's context pack.
+        pass
+
+    def stop_attach_loaders(self, timeout_ms=2000):
+
+        stopped = self.file_loader.stop(timeout_ms)
+        if self.context_pack_loader is not None:
+            stopped = self.context_pack_loader.stop(timeout_ms) and stopped
+        return stopped
+
+    def attach_file(self, file_path):
+        # Loads a file into the input editor in the background, piece by piece, so the window stays responsive.
+        # Files over the size limit ask whether to load only their first part.
+        try:
+            size = os.path.getsize(file_path)
+        except OSError as e:
+            QMessageBox.critical(self, tr("error_title"), tr("file_not_found_err", str(e)))
+            return
+        limit_bytes = None
+        max_bytes = self.main_window.attach_max_bytes
+        if size > max_bytes:
+            box = QMessageBox(QMessageBox.Question, tr("attach_large_title"), tr(
+                "attach_large_text", name=os.path.basename(file_path), size=format_size(size), limit=format_size(max_bytes)
+            ), parent=self)
+            preview_button = box.addButton(tr("attach_preview_btn", limit=format_size(max_bytes)), QMessageBox.AcceptRole)
+            full_button = box.addButton(tr("attach_full_btn"), QMessageBox.AcceptRole)
+            box.addButton(QMessageBox.Cancel)
+            box.setDefaultButton(preview_button)
+            box.exec_()
+            if box.clickedButton() not in (preview_button, full_button):
+                return
+            limit_bytes = max_bytes if box.clickedButton() is preview_button else None
+
+        if self.context_pack_loader is not None:
+            self.context_pack_loader.stop(0)
+        editor = self.token_input_widget
+        editor.clear()
+        editor.setReadOnly(True) # Until the whole file is in
+        editor.setUndoRedoEnabled(False)
+        self._attaching_path = file_path
+        self.file_loader.load(file_path, limit_bytes)
+        self.main_window.statusBar().showMessage(tr("attach_loading", name=os.path.basename(file_path)))
+
+    def _on_attach_piece_loaded(self, text):
+
+        cursor = QTextCursor(self.token_input_widget.document())
+        cursor.movePosition(QTextCursor.End)
+        cursor.insertText(text)
+
+    def _on_attach_finished(self, encoding, size, truncated):
+
+        file_path, self._attaching_path = self._attaching_path, None
+        self._end_attach()
+        self.token_input_widget.moveCursor(QTextCursor.Start)
+        name = os.path.basename(file_path)
+        if truncated:
+            message = tr("attach_truncated", name=name, loaded=format_size(self.main_window.attach_max_bytes),
+                         size=format_size(size), encoding=encoding)
+        else:
+            message = tr("attach_loaded", name=name, size=format_size(size), encoding=encoding)
+        self.main_window.statusBar().showMessage(message, 5000)
+        self._on_file_attached(file_path)
+
+    def _on_attach_failed(self, error_msg):
+
+        self._attaching_path = None
+        self._end_attach()
+        self.main_window.statusBar().clearMessage()
+        QMessageBox.critical(self, tr("error_title"), error_msg)
+
+    def _end_attach(self):
+
+        self.token_input_widget.setReadOnly(False)
+        self.token_input_widget.setUndoRedoEnabled(True)
+
+    def _on_file_attached(self, file_path):
+        # Hook for tabs that react to the attached file (e.g. guessing its language).
+        pass
 
     def store_last_prompt(self, prompt, tab_name_for_log):
 
         self.last_prompt = prompt
         self.last_tab_name_for_log = tab_name_for_log
 
+    def send_prompt(self, text, build_prompt, tab_name_for_log, build_chunk_prompt=None,
+                    build_reduce_prompt=None, allow_chunking=True):
+        # Sends build_prompt(text), applying the oversize strategy when it exceeds the input token budget.
+        # build_chunk_prompt(chunk_code, number, count, first_line, last_line) defaults to build_prompt.
+        budget = self.main_window.prompt_token_budget()
+        strategy, payload = fit_input(
+            text, build_prompt, budget, self.main_window.oversize_strategy, allow_chunking
+        )
+        if strategy == OVERSIZE_STRATEGY_BLOCK:
+            QMessageBox.warning(self, tr("error_title"), tr(
+                "input_over_budget_err", tokens=estimate_tokens(build_prompt(text)), budget=budget
+            ))
+            return
+        if strategy == OVERSIZE_STRATEGY_CHUNK:
+            if build_chunk_prompt is None:
+                build_chunk_prompt = lambda chunk_code, *chunk_position: build_prompt(chunk_code)
+            self.start_chunked_task(payload, build_chunk_prompt, tab_name_for_log, build_reduce_prompt)
+            return
+
+        self._last_chunked_request = None
+        prompt = build_prompt(payload)
+        self.store_last_prompt(prompt, tab_name_for_log)
+        self.main_window.start_gemini_task(prompt, self.result_display, tab_name_for_log)
+        if strategy == OVERSIZE_STRATEGY_TRUNCATE:
+            self.main_window.statusBar().showMessage(tr("input_truncated_info", budget=budget), 5000)
+
+    def start_chunked_task(self, chunks, build_chunk_prompt, tab_name_for_log, build_reduce_prompt=None,
+                           bypass_cache=False):
+        # Map step: one request per chunk, in parallel. The answers are then merged by a reduce request,
+        # or shown one after another (with their line ranges) when there is no reduce step.
+        self.main_window.cancel_gemini_tasks(self.result_display)
+        self._last_chunked_request = (chunks, build_chunk_prompt, tab_name_for_log, build_reduce_prompt)
+        run = {"chunks": chunks, "results": [None] * len(chunks), "done": 0, "failed": False,
+               "tab_name": tab_name_for_log, "build_reduce_prompt": build_reduce_prompt, "bypass_cache": bypass_cache}
+        self._chunked_run = run
+        for index, (first_line, last_line, chunk_code) in enumerate(chunks):
+            prompt = build_chunk_prompt(chunk_code, index + 1, len(chunks), first_line, last_line)
+            self.main_window.submit_gemini_job(
+                prompt, self.result_display,
+                on_finished=lambda result, index=index: self._on_chunk_finished(run, index, result),
+                on_error=lambda error_msg: self._on_chunk_failed(run, error_msg),
+                bypass_cache=bypass_cache
+            )
+        self._show_chunk_progress(run)
+
+    def _on_chunk_finished(self, run, index, result):
+
+        if run is not self._chunked_run or run["failed"]:
+            return
+        run["results"][index] = result
+        run["done"] += 1
+        if run["done"] < len(run["chunks"]):
+            self._show_chunk_progress(run)
+            return
+        self._chunked_run = None
+        if run["build_reduce_prompt"] is not None:
+            self.main_window.start_gemini_task(
+                run["build_reduce_prompt"](run["results"]), self.result_display, run["tab_name"],
+                bypass_cache=run["bypass_cache"]
+            )
+            return
+        combined = "\n\n".join(
+            f"### {tr('chunk_item', number=index + 1, first=first_line, last=last_line)}\n\n{result}"
+            for index, ((first_line, last_line, _), result) in enumerate(zip(run["chunks"], run["results"]))
+        )
+        self.main_window.show_gemini_result(
+            combined, self.result_display, tr("chunk_progress", done=len(run["chunks"]), total=len(run["chunks"])),
+            run["tab_name"]
+        )
+
+    def _on_chunk_failed(self, run, error_msg):
+
+        if run is not self._chunked_run or run["failed"]:
+            return
+        run["failed"] = True
+        self._chunked_run = None
+        self.main_window.cancel_gemini_tasks(self.result_display)
+        self.main_window.show_gemini_error(error_msg, self.result_display, run["tab_name"])
+
+    def _show_chunk_progress(self, run):
+
+        total = len(run["chunks"])
+        items = "".join(
+            f"<li>{tr('chunk_item', number=index + 1, first=first_line, last=last_line)}"
+            f"{' ✓' if run['results'][index] is not None else ' …'}</li>"
+            for index, (first_line, last_line, _) in enumerate(run["chunks"])
+        )
+        progress_text = tr("chunk_progress", done=run["done"], total=total)
+        self.result_display.setHtml(f"<p><i>{progress_text}</i></p><ul>{items}</ul>")
+        self.main_window.statusBar().showMessage(progress_text)
+
+    def _update_cancel_button(self, *_):
+
+        self.cancel_btn.setEnabled(self.main_window.job_scheduler.has_pending_jobs(self.result_display))
+
+    def _cancel_request(self):
+        # Aborts this tab's queued and in-flight requests (all chunks of a chunked run included).
+        self._chunked_run = None
+        if self.main_window.cancel_gemini_tasks(self.result_display):
+            self.result_display.append(f"<p><i>{tr('status_request_cancelled')}</i></p>")
+            self.main_window.statusBar().showMessage(tr("status_request_cancelled"), 3000)
+        self._update_cancel_button()
+
     def _regenerate_result(self):
 
-        if self.last_prompt:
+        if self._last_chunked_request:
+            chunks, build_chunk_prompt, tab_name_for_log, build_reduce_prompt = self._last_chunked_request
+            self.start_chunked_task(chunks, build_chunk_prompt, tab_name_for_log, build_reduce_prompt, bypass_cache=True)
+        elif self.last_prompt:
             self.main_window.start_gemini_task(
                 self.last_prompt,
                 self.result_display,
-                self.last_tab_name_for_log
+                self.last_tab_name_for_log,
+                bypass_cache=True
             )
         else:
             QMessageBox.information(self, tr("regenerate_btn"), tr("status_no_previous_request"))
@@ -90,6 +351,7 @@ class BaseFeatureTab(QWidget):
         self.copy_btn.setText(tr(self.copy_btn._translatable_key))
         self.save_btn.setText(tr(self.save_btn._translatable_key))
         self.regenerate_btn.setText(tr(self.regenerate_btn._translatable_key))
+        self.cancel_btn.setText(tr(self.cancel_btn._translatable_key))
 
     def _copy_result(self):
 
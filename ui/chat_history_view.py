@@ -0,0 +1,238 @@
+import html
+from collections import OrderedDict
+from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QLabel, QLineEdit, QListView, QStyledItemDelegate,
+                             QAbstractItemView, QAction, QApplication, QStyle)
+from PyQt5.QtGui import QTextDocument, QAbstractTextDocumentLayout, QPalette
+from PyQt5.QtCore import Qt, QAbstractListModel, QModelIndex, QPersistentModelIndex, QSize, QTimer
+
+from core.translation import tr
+from core.markdown_render import render_markdown, RESULT_STYLE
+from core.constants import HISTORY_PAGE_SIZE, HISTORY_MAX_RENDERED_ENTRIES
+
+InteractionIdRole = Qt.UserRole + 1
+TextLengthRole = Qt.UserRole + 2
+
+ESTIMATED_CHARS_PER_LINE = 90
+ESTIMATED_LINE_HEIGHT = 18
+ENTRY_CHROME_HEIGHT = 110 # Timestamp, labels, boxes and separator around the two texts
+
+def interaction_html(row):
+    # Builds the chat history HTML for one stored interaction.
+    query_text = f"({row['tab']}) {row['prompt']}" if row["tab"] else row["prompt"]
+    query_html = html.escape(query_text).replace('\n', '<br>')
+    response_html_for_chat = render_markdown(row["response"]) # Same HTML as the result pane, memoized
+    return (
+        f"{RESULT_STYLE}"
+        f'<p style="color: #aaa;"><b>--- {row["timestamp"]} ---</b></p>'
+        f"<p><b>{tr('user_label_chat')}:</b></p>"
+        f'<div style="background-color: #2A2A2A; padding: 8px; border-radius: 4px; margin-bottom: 5px; word-wrap: break-word;">{query_html}</div>'
+        f"<p><b>Gemini ({row['model']}):</b></p>"
+        f'<div style="background-color: #2A2A2A; padding: 8px; border-radius: 4px; margin-bottom: 10px; word-wrap: break-word;">{response_html_for_chat}</div>'
+        f'<hr style="border-color: #444;">'
+    )
+
+class InteractionListModel(QAbstractListModel):
+    # Newest-first list of interaction ids, fetched from the store in batches as the view scrolls.
+
+    def __init__(self, store, batch_size=HISTORY_PAGE_SIZE, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.batch_size = batch_size
+        self.query = ""
+        self._rows = [] # (interaction id, prompt + response length)
+        self._exhausted = False
+
+    def rowCount(self, parent=QModelIndex()):
+
+        return 0 if parent.isValid() else len(self._rows)
+
+    def data(self, index, role=Qt.DisplayRole):
+
+        if not index.isValid() or index.row() >= len(self._rows):
+            return None
+        interaction_id, text_length = self._rows[index.row()]
+        if role == InteractionIdRole:
+            return interaction_id
+        if role == TextLengthRole:
+            return text_length
+        return None
+
+    def canFetchMore(self, parent=QModelIndex()):
+
+        return not parent.isValid() and not self._exhausted
+
+    def fetchMore(self, parent=QModelIndex()):
+
+        if parent.isValid():
+            return
+        batch = self.store.page_ids(len(self._rows), self.batch_size, self.query)
+        if len(batch) < self.batch_size:
+            self._exhausted = True
+        if not batch:
+            return
+        self.beginInsertRows(QModelIndex(), len(self._rows), len(self._rows) + len(batch) - 1)
+        self._rows.extend(batch)
+        self.endInsertRows()
+
+    def set_query(self, query):
+
+        self.beginResetModel()
+        self.query = query
+        self._rows = []
+        self._exhausted = False
+        self.endResetModel()
+
+    def add_interaction(self, interaction_id, text_length):
+        # New interactions go on top; filtered views are refreshed by the next search instead.
+        if self.query:
+            return
+        self.beginInsertRows(QModelIndex(), 0, 0)
+        self._rows.insert(0, (interaction_id, text_length))
+        self.endInsertRows()
+
+class InteractionDelegate(QStyledItemDelegate):
+    # Renders rows as rich text on demand and keeps at most max_rendered documents alive.
+
+    def __init__(self, store, max_rendered=HISTORY_MAX_RENDERED_ENTRIES, parent=None):
+        super().__init__(parent)
+        self.store = store
+        self.max_rendered = max_rendered
+        self.width = 600
+        self._documents = OrderedDict() # interaction id -> QTextDocument, least recently used first
+        self._heights = {} # interaction id -> (width, height) measured when last rendered
+
+    def set_width(self, width):
+
+        self.width = max(100, width)
+
+    def clear_cache(self):
+
+        self._documents.clear()
+        self._heights.clear()
+
+    def rendered_count(self):
+
+        return len(self._documents)
+
+    def sizeHint(self, option, index):
+
+        interaction_id = index.data(InteractionIdRole)
+        measured = self._heights.get(interaction_id)
+        if measured and measured[0] == self.width:
+            return QSize(self.width, measured[1])
+        text_length = index.data(TextLengthRole) or 0
+        estimated_lines = max(2, text_length // ESTIMATED_CHARS_PER_LINE)
+        return QSize(self.width, ENTRY_CHROME_HEIGHT + estimated_lines * ESTIMATED_LINE_HEIGHT)
+
+    def paint(self, painter, option, index):
+
+        interaction_id = index.data(InteractionIdRole)
+        document = self._document(interaction_id)
+        if document is None:
+            return
+        document.setTextWidth(option.rect.width())
+        painter.save()
+        painter.translate(option.rect.topLeft())
+        painter.setClipRect(0, 0, option.rect.width(), option.rect.height())
+        context = QAbstractTextDocumentLayout.PaintContext()
+        context.palette.setColor(QPalette.Text, option.palette.color(QPalette.Text))
+        document.documentLayout().draw(painter, context)
+        painter.restore()
+
+        height = int(document.size().height())
+        if self._heights.get(interaction_id) != (self.width, height):
+            self._heights[interaction_id] = (self.width, height)
+            persistent_index = QPersistentModelIndex(index)
+            QTimer.singleShot(0, lambda: self._emit_size_hint_changed(persistent_index)) # Not from inside paint
+
+    def _emit_size_hint_changed(self, persistent_index):
+
+        if persistent_index.isValid():
+            self.sizeHintChanged.emit(QModelIndex(persistent_index))
+
+    def _document(self, interaction_id):
+
+        document = self._documents.get(interaction_id)
+        if document is not None:
+            self._documents.move_to_end(interaction_id)
+            return document
+        row = self.store.get(interaction_id)
+        if row is None:
+            return None
+        document = QTextDocument()
+        document.setHtml(interaction_html(row))
+        document.setTextWidth(self.width)
+        self._documents[interaction_id] = document
+        while len(self._documents) > self.max_rendered:
+            self._documents.popitem(last=False)
+        return document
+
+class ChatHistoryListView(QListView):
+
+    def resizeEvent(self, event):
+
+        super().resizeEvent(event)
+        delegate = self.itemDelegate()
+        if isinstance(delegate, InteractionDelegate) and delegate.width != self.viewport().width():
+            delegate.set_width(self.viewport().width())
+            self.scheduleDelayedItemsLayout()
+
+class ChatHistoryView(QWidget):
+    # Searchable, virtualized view over the interaction store.
+
+    def __init__(self, store, parent=None):
+        super().__init__(parent)
+        self.store = store
+        layout = QVBoxLayout(self)
+        layout.setContentsMargins(0, 0, 0, 0)
+
+        self.label = QLabel(tr("chat_history_label"))
+        layout.addWidget(self.label)
+
+        self.search_input = QLineEdit(self)
+        self.search_input.setPlaceholderText(tr("history_search_placeholder"))
+        self.search_input.returnPressed.connect(self._on_search)
+        layout.addWidget(self.search_input)
+
+        self.model = InteractionListModel(store, parent=self)
+        self.delegate = InteractionDelegate(store, parent=self)
+        self.list_view = ChatHistoryListView(self)
+        self.list_view.setModel(self.model)
+        self.list_view.setItemDelegate(self.delegate)
+        self.list_view.setVerticalScrollMode(QAbstractItemView.ScrollPerPixel)
+        self.list_view.setSelectionMode(QAbstractItemView.SingleSelection)
+        self.list_view.setLayoutMode(QListView.Batched)
+        self.list_view.setBatchSize(HISTORY_PAGE_SIZE)
+        self.list_view.setContextMenuPolicy(Qt.ActionsContextMenu)
+        layout.addWidget(self.list_view)
+
+        self.copy_action = QAction(tr("copy_result_btn"), self.list_view)
+        self.copy_action.setIcon(self.style().standardIcon(QStyle.SP_FileLinkIcon))
+        self.copy_action.triggered.connect(self._copy_selected)
+        self.list_view.addAction(self.copy_action)
+
+    def add_interaction(self, interaction_id, text_length):
+
+        self.model.add_interaction(interaction_id, text_length)
+
+    def retranslate_ui(self):
+
+        self.label.setText(tr("chat_history_label"))
+        self.search_input.setPlaceholderText(tr("history_search_placeholder"))
+        self.copy_action.setText(tr("copy_result_btn"))
+        self.delegate.clear_cache() # Rendered rows embed translated labels
+        self.list_view.viewport().update()
+
+    def _on_search(self):
+
+        self.delegate.clear_cache()
+        self.model.set_query(self.search_input.text().strip())
+
+    def _copy_selected(self):
+
+        index = self.list_view.currentIndex()
+        if not index.isValid():
+            return
+        row = self.store.get(index.data(InteractionIdRole))
+        if row:
+            QApplication.clipboard().setText(f"{row['prompt']}\n\n{row['response']}")
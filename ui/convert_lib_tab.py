@@ -1,13 +1,19 @@
-from PyQt5.QtWidgets import (QPushButton, QLabel, QPlainTextEdit, QHBoxLayout, QLineEdit, QFormLayout, QFileDialog, QMessageBox)
+from PyQt5.QtWidgets import (QPushButton, QLabel, QPlainTextEdit, QHBoxLayout, QLineEdit, QFormLayout, QMessageBox)
 from PyQt5.QtGui import QFont
 from ui.base_tab import BaseFeatureTab
 from core.translation import tr
+from core.prompts import build_convert_prompt
+from core.token_counter import estimate_tokens
+from core.targeted_convert import (plan_targeted_conversion, apply_targeted_conversion, affected_line_count,
+                                   converted_file_markdown)
 
 class ConvertLibraryTab(BaseFeatureTab):
 
     def _init_specific_ui_elements(self):
+        self._targeted_run = None; self._last_targeted_request = None
         self.attach_button = QPushButton(); self.source_code_label_widget = QLabel()
         self.input_code = QPlainTextEdit(); self.source_lib_label = QLabel()
+        self.token_input_widget = self.input_code
         self.source_lib_input = QLineEdit(); self.target_lib_label = QLabel()
         self.target_lib_input = QLineEdit(); self.convert_button = QPushButton()
         self.attach_button._translatable_key = "attach_file_btn"
@@ -40,26 +46,44 @@ class ConvertLibraryTab(BaseFeatureTab):
         self.target_lib_input.setPlaceholderText(tr(self.target_lib_input._translatable_placeholder_key))
         self.convert_button.setText(tr(self.convert_button._translatable_key))
     def retranslate_ui(self): super().retranslate_ui(); self._retranslate_specific_ui()
-    def _attach_file(self):
-        options = QFileDialog.Options(); file_path, _ = QFileDialog.getOpenFileName(self, tr("attach_file_btn"), "", "Python Files (*.py);;Text Files (*.txt);;All Files (*)", options=options)
-        if file_path:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f: self.input_code.setPlainText(f.read())
-            except Exception as e: QMessageBox.critical(self, tr("error_title"), tr("file_not_found_err", str(e)))
     def _convert_library(self):
         code = self.input_code.toPlainText().strip()
         source_lib = self.source_lib_input.text().strip(); target_lib = self.target_lib_input.text().strip()
         if not code or not source_lib or not target_lib: QMessageBox.warning(self, tr("error_title"), tr("empty_input_err")); return
-        prompt = (
-            f"You are an expert in converting Python code between different libraries. "
-            f"Your task is to convert the following code from using the '{source_lib}' "
-            f"library to using the '{target_lib}' library. Provide only the converted "
-            f"code, enclosed in a ```python ... ``` fenced code block (Markdown). Do not "
-            f"include any additional explanations or text before or after the code block, "
-            f"unless essential to clarify a critical point. Try to maintain the same "
-            f"functionality as much as possible.\n\n"
-            f"Original code (using {source_lib}):\n```python\n{code}\n```\n\n"
-            f"Requested code (using {target_lib}, within a Markdown code block):\n"
+        self._last_targeted_request = None; self._targeted_run = None
+        plan = plan_targeted_conversion(code, source_lib, target_lib) # Only the regions using source_lib, if that pays off
+        if plan is not None and estimate_tokens(plan[0]) <= self.main_window.prompt_token_budget():
+            self._start_targeted_conversion(code, plan); return
+        self.send_prompt(code, lambda text: build_convert_prompt(text, source_lib, target_lib), tr("convert_lib_tab"))
+    def _start_targeted_conversion(self, code, plan, bypass_cache=False):
+        # Sends the regions that use the source library in one request and splices the answer into the file.
+        prompt, regions = plan
+        self.main_window.cancel_gemini_tasks(self.result_display)
+        self._chunked_run = None; self._last_chunked_request = None
+        run = {"code": code, "prompt": prompt, "regions": regions}
+        self._targeted_run = run; self._last_targeted_request = (code, plan)
+        progress_text = tr("targeted_convert_progress", regions=len(regions), lines=affected_line_count(regions),
+                           total=len(code.splitlines()))
+        self.result_display.setHtml(f"<p><i>{progress_text}</i></p>"); self.main_window.statusBar().showMessage(progress_text)
+        self.main_window.submit_gemini_job(
+            prompt, self.result_display, on_finished=lambda result: self._on_targeted_conversion_finished(run, result),
+            on_error=lambda error_msg: self._on_targeted_conversion_failed(run, error_msg), bypass_cache=bypass_cache
         )
-        self.store_last_prompt(prompt, tr("convert_lib_tab"))
-        self.main_window.start_gemini_task(prompt, self.result_display, tr("convert_lib_tab"))
+    def _on_targeted_conversion_finished(self, run, result):
+        if run is not self._targeted_run: return
+        self._targeted_run = None
+        try: converted_code = apply_targeted_conversion(run["code"], run["regions"], result)
+        except ValueError as e: # Returning False keeps the malformed answer out of the response cache
+            self.main_window.show_gemini_error(tr("targeted_convert_merge_err", error=str(e)), self.result_display, tr("convert_lib_tab")); return False
+        note = tr("targeted_convert_note", regions=len(run["regions"]), lines=affected_line_count(run["regions"]),
+                  total=len(run["code"].splitlines()))
+        self.main_window.show_gemini_result(f"{note}\n\n{converted_file_markdown(converted_code)}", self.result_display,
+                                            run["prompt"], tr("convert_lib_tab"))
+    def _on_targeted_conversion_failed(self, run, error_msg):
+        if run is not self._targeted_run: return
+        self._targeted_run = None
+        self.main_window.show_gemini_error(error_msg, self.result_display, tr("convert_lib_tab"))
+    def _regenerate_result(self):
+        if not self._last_targeted_request: super()._regenerate_result(); return
+        code, plan = self._last_targeted_request
+        self._start_targeted_conversion(code, plan, bypass_cache=True)
@@ -2,11 +2,13 @@ from PyQt5.QtWidgets import QLabel, QTextEdit, QLineEdit, QPushButton, QFormLayo
 from PyQt5.QtGui import QFont
 from ui.base_tab import BaseFeatureTab
 from core.translation import tr
+from core.prompts import build_generate_prompt
 
 class GenerateFunctionTab(BaseFeatureTab):
 
     def _init_specific_ui_elements(self):
         self.func_desc_label = QLabel(); self.func_desc_input = QTextEdit()
+        self.token_input_widget = self.func_desc_input
         self.optional_libs_label = QLabel(); self.optional_libs_input = QLineEdit()
         self.generate_button = QPushButton()
         self.func_desc_label._translatable_key = "func_desc_label"
@@ -29,16 +31,7 @@ class GenerateFunctionTab(BaseFeatureTab):
         description = self.func_desc_input.toPlainText().strip()
         libraries = self.optional_libs_input.text().strip()
         if not description: QMessageBox.warning(self, tr("error_title"), tr("empty_input_err")); return
-        prompt_lines = [
-            "You are an expert programming assistant. Your task is to create a Python ",
-            "function based on the following description. Provide only the code, ",
-            "enclosed in a ```python ... ``` fenced code block (Markdown). Do not ",
-            "include any additional explanations or text before or after the code block, ",
-            "unless explicitly requested in the description. If libraries are specified, use them.",
-            f"\nDescription: {description}"
-        ]
-        if libraries: prompt_lines.append(f"Required/Suggested libraries: {libraries}")
-        prompt_lines.append("\nRequested code (Python only, within a Markdown code block):\n")
-        prompt = "\n".join(prompt_lines)
-        self.store_last_prompt(prompt, tr("generate_func_tab"))
-        self.main_window.start_gemini_task(prompt, self.result_display, tr("generate_func_tab"))
+        self.send_prompt(
+            description, lambda text: build_generate_prompt(text, libraries), tr("generate_func_tab"),
+            allow_chunking=False # A description cannot be split into independent requests
+        )
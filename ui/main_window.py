@@ -1,46 +1,97 @@
 import os
+import time
 import datetime
-import markdown2
 import textwrap
 from PyQt5.QtWidgets import (QMainWindow, QWidget, QVBoxLayout, QTabWidget,
-                             QLabel, QTextEdit, QMessageBox, QSplitter, QAction)
+                             QMessageBox, QSplitter, QAction, QLabel)
 from PyQt5.QtGui import QTextCursor, QIcon
-from PyQt5.QtCore import QSettings, QThread, Qt
+from PyQt5.QtCore import QSettings, QTimer, Qt
 
 from core.translation import tr, load_translations, current_language as translation_current_language
-from core.gemini_worker import GeminiWorker
+from core.gemini_worker import GeminiWorker, build_full_prompt, resolve_model_name, set_request_timeout_override
+from core.response_cache import ResponseCache
+from core.docs_loader import DocsLoader
+from core.interaction_store import InteractionStore, InteractionWriter
+from core.markdown_render import styled_result_html
+from core.job_scheduler import GeminiJobScheduler, PRIORITY_NORMAL
+from core.rate_limiter import set_rate_limit_overrides
+from core.hedging import set_hedging_options
+from core.client_pool import model_pool
+from core.context_cache import context_cache
+from core.token_counter import ExactTokenCounter, estimate_tokens, input_token_limit
+from core.tracing import Tracer, span
+from core.log_writer import BackgroundLogWriter
 from core.settings_dialog import SettingsDialog
 from core.constants import (DEFAULT_MODEL, SETTINGS_FILE_NAME, APP_NAME_KEY, APP_ICON_NAME,
-                            ASSETS_DIR_NAME, DOCS_DIR_NAME, LOGS_DIR_NAME, CHAT_HISTORY_FILE_NAME)
-
-from ui.summarize_tab import SummarizeCodeTab
-from ui.generate_func_tab import GenerateFunctionTab
-from ui.debug_code_tab import DebugCodeTab
-from ui.convert_lib_tab import ConvertLibraryTab
-from ui.translate_code_tab import TranslateCodeTab
+                            ASSETS_DIR_NAME, DOCS_DIR_NAME, LOGS_DIR_NAME, CHAT_HISTORY_FILE_NAME,
+                            DEFAULT_MAX_CONCURRENT_REQUESTS, GENERATION_CONFIG, CACHE_DIR_NAME,
+                            RESPONSE_CACHE_DIR_NAME, DOCS_INDEX_FILE_NAME, DOCS_MANIFEST_FILE_NAME,
+                            DEFAULT_DOCS_TOP_K, DEFAULT_DOCS_TOKEN_BUDGET, INTERACTIONS_DB_FILE_NAME,
+                            RATE_LIMIT_MAX_RETRIES, DEFAULT_OVERSIZE_STRATEGY, TOKEN_COUNT_DEBOUNCE_MS,
+                            TRACES_FILE_NAME, TRACE_RECENT_LIMIT, DEFAULT_HEDGE_BACKUP_MODEL,
+                            DEFAULT_HEDGE_PERCENTILE, DEFAULT_ATTACH_MAX_SIZE_MB,
+                            DEFAULT_CONTEXT_CACHE_TTL_MINUTES)
+
+from ui.tab_registry import registered_tabs
+from ui.chat_history_view import ChatHistoryView
+from ui.performance_panel import PerformancePanel
+from ui.base_tab import BaseFeatureTab
 
 class MainWindow(QMainWindow):
     # Main application window.
-    def __init__(self, app_version_str, developer_name_str):
+    def __init__(self, app_version_str, developer_name_str, project_root=None):
         super().__init__()
         self.app_version = app_version_str
         self.app_developer = developer_name_str
         
         ui_dir = os.path.dirname(os.path.abspath(__file__))
-        self.project_root = os.path.dirname(ui_dir)
+        self.project_root = project_root or os.path.dirname(ui_dir) # Another root keeps settings, logs and caches apart
         
         self.assets_dir = os.path.join(self.project_root, ASSETS_DIR_NAME)
         self.app_icon_path = os.path.join(self.assets_dir, APP_ICON_NAME)
         self.docs_dir = os.path.join(self.project_root, DOCS_DIR_NAME)
         self.logs_dir = os.path.join(self.project_root, LOGS_DIR_NAME)
         self.chat_history_file = os.path.join(self.logs_dir, CHAT_HISTORY_FILE_NAME)
+        self.traces_file = os.path.join(self.logs_dir, TRACES_FILE_NAME)
+        self.cache_dir = os.path.join(self.project_root, CACHE_DIR_NAME)
         self.settings_file_path = os.path.join(self.project_root, SETTINGS_FILE_NAME)
 
         self.settings = QSettings(self.settings_file_path, QSettings.IniFormat)
+        self.interaction_store = None
+        self.interaction_writer = None
         self.docs_content_cache = ""
+        self.docs_loader = DocsLoader(
+            self.docs_dir,
+            os.path.join(self.cache_dir, DOCS_INDEX_FILE_NAME),
+            os.path.join(self.cache_dir, DOCS_MANIFEST_FILE_NAME),
+            self
+        )
+        self.docs_loader.docs_updated.connect(self._on_docs_updated)
+        self._docs_refresh_silent = True
+        self.docs_retrieval_enabled = True
+        self.docs_top_k = DEFAULT_DOCS_TOP_K
+        self.docs_token_budget = DEFAULT_DOCS_TOKEN_BUDGET
+        self.attach_max_bytes = DEFAULT_ATTACH_MAX_SIZE_MB * 1024 * 1024
         self.current_model_name = DEFAULT_MODEL
-        self.thread = None
-        self.worker = None
+        self.stream_responses = True
+        self.async_engine_enabled = False
+        self.async_engine = None # core.async_engine.async_engine, once a request has used it
+        self.response_cache_enabled = True
+        self.response_cache = ResponseCache(os.path.join(self.cache_dir, RESPONSE_CACHE_DIR_NAME))
+        self.job_scheduler = GeminiJobScheduler(DEFAULT_MAX_CONCURRENT_REQUESTS, self)
+        self.job_scheduler.queue_changed.connect(self._on_job_queue_changed)
+        self.job_scheduler.job_retrying.connect(self._on_job_retrying)
+        self.max_input_tokens = 0
+        self.oversize_strategy = DEFAULT_OVERSIZE_STRATEGY
+        self.exact_token_count = False
+        self.token_count_timer = QTimer(self)
+        self.token_count_timer.setSingleShot(True)
+        self.token_count_timer.setInterval(TOKEN_COUNT_DEBOUNCE_MS)
+        self.token_count_timer.timeout.connect(self._update_token_count)
+        self.exact_token_counter = ExactTokenCounter(self)
+        self.exact_token_counter.counted.connect(self._on_exact_token_count)
+        self.tracer = Tracer(max_recent=TRACE_RECENT_LIMIT, parent=self)
+        self.performance_panel = None # Built the first time it is shown
         
         self._load_initial_language_and_translations()
         self._init_folders()
@@ -58,6 +109,14 @@ class MainWindow(QMainWindow):
         os.makedirs(self.docs_dir, exist_ok=True)
         os.makedirs(self.logs_dir, exist_ok=True)
         os.makedirs(self.assets_dir, exist_ok=True)
+        os.makedirs(self.cache_dir, exist_ok=True)
+        self.interaction_store = InteractionStore(os.path.join(self.logs_dir, INTERACTIONS_DB_FILE_NAME))
+        self.interaction_writer = InteractionWriter(self.interaction_store, parent=self)
+        self.interaction_writer.write_failed.connect(lambda _error: self.statusBar().showMessage(tr("log_error"), 3000))
+        self.interaction_writer.start()
+        self.log_writer = BackgroundLogWriter(self.chat_history_file, parent=self)
+        self.log_writer.write_failed.connect(lambda _error: self.statusBar().showMessage(tr("log_error"), 3000))
+        self.log_writer.start()
 
     def _retranslate_ui(self):
         # Updates UI texts when language changes.
@@ -68,24 +127,21 @@ class MainWindow(QMainWindow):
         self.file_menu.setTitle(tr("file_menu"))
         self.settings_action.setText(tr("settings_menu"))
         self.exit_action.setText(tr("exit_menu"))
+        self.view_menu.setTitle(tr("view_menu"))
+        self.performance_panel_action.setText(tr("performance_panel_menu"))
         self.help_menu.setTitle(tr("help_menu"))
         self.about_action.setText(tr("about_menu"))
+        if self.performance_panel is not None:
+            self.performance_panel.retranslate_ui()
 
-        tab_widgets_map = {
-            self.summarize_tab_widget: "summarize_tab",
-            self.generate_func_tab_widget: "generate_func_tab",
-            self.debug_code_tab_widget: "debug_code_tab",
-            self.convert_lib_tab_widget: "convert_lib_tab",
-            self.translate_code_tab_widget: "translate_code_tab"
-        }
-        for widget, key in tab_widgets_map.items():
-            index = self.tabs.indexOf(widget)
-            if index != -1:
-                self.tabs.setTabText(index, tr(key))
+        for index, registration in enumerate(self.tab_registrations):
+            self.tabs.setTabText(index, tr(registration.title_key))
+            widget = self.feature_tabs.get(index) # Tabs not built yet pick up the language when created
             if hasattr(widget, 'retranslate_ui'):
                  widget.retranslate_ui()
         
-        self.chat_history_display_label.setText(tr("chat_history_label"))
+        self.chat_history_widget.retranslate_ui()
+        self._update_token_count()
         current_status = self.statusBar().currentMessage()
         if not any(error_key in current_status for error_key in [
             tr("status_api_key_missing"), 
@@ -176,6 +232,9 @@ class MainWindow(QMainWindow):
         splitter.addWidget(self.chat_history_widget)
         
         splitter.setSizes([int(self.height() * 0.65), int(self.height() * 0.35)])
+        self.token_count_label = QLabel()
+        self.statusBar().addPermanentWidget(self.token_count_label)
+        self.tabs.currentChanged.connect(self.schedule_token_count_update)
         self.statusBar().showMessage(tr("status_ready"))
 
     # ... (بقية دوال MainWindow تبقى كما هي) ...
@@ -194,47 +253,98 @@ class MainWindow(QMainWindow):
         self.exit_action.triggered.connect(self.close)
         self.file_menu.addAction(self.exit_action)
 
+        self.view_menu = menubar.addMenu(tr("view_menu"))
+        self.performance_panel_action = QAction(tr("performance_panel_menu"), self)
+        self.performance_panel_action.setCheckable(True)
+        self.performance_panel_action.toggled.connect(self._toggle_performance_panel)
+        self.view_menu.addAction(self.performance_panel_action)
+
         self.help_menu = menubar.addMenu(tr("help_menu"))
         self.about_action = QAction(tr("about_menu"), self)
         self.about_action.triggered.connect(self._show_about_dialog)
         self.help_menu.addAction(self.about_action)
 
     def _create_tabs(self):
-        # Creates the tab widget and individual feature tabs.
+        # Creates the tab widget with an empty page per registered tab; only the visible tab is built.
         self.tabs_container = QWidget()
         tabs_layout = QVBoxLayout(self.tabs_container)
         tabs_layout.setContentsMargins(0,0,0,0)
         self.tabs = QTabWidget()
         tabs_layout.addWidget(self.tabs)
 
-        self.summarize_tab_widget = SummarizeCodeTab(self)
-        self.generate_func_tab_widget = GenerateFunctionTab(self)
-        self.debug_code_tab_widget = DebugCodeTab(self)
-        self.convert_lib_tab_widget = ConvertLibraryTab(self)
-        self.translate_code_tab_widget = TranslateCodeTab(self)
-
-        self.tabs.addTab(self.summarize_tab_widget, tr("summarize_tab"))
-        self.tabs.addTab(self.generate_func_tab_widget, tr("generate_func_tab"))
-        self.tabs.addTab(self.debug_code_tab_widget, tr("debug_code_tab"))
-        self.tabs.addTab(self.convert_lib_tab_widget, tr("convert_lib_tab"))
-        self.tabs.addTab(self.translate_code_tab_widget, tr("translate_code_tab"))
+        self.tab_registrations = registered_tabs()
+        self.feature_tabs = {} # tab index -> built tab widget
+        for registration in self.tab_registrations:
+            page = QWidget()
+            page_layout = QVBoxLayout(page)
+            page_layout.setContentsMargins(0,0,0,0)
+            self.tabs.addTab(page, tr(registration.title_key))
+        self.tabs.currentChanged.connect(self.feature_tab)
+        self.feature_tab(self.tabs.currentIndex())
+
+    def feature_tab(self, index=None):
+        # Returns the tab at index (default: the current one), building it on first use.
+        index = self.tabs.currentIndex() if index is None else index
+        if index < 0 or index >= len(self.tab_registrations):
+            return None
+        widget = self.feature_tabs.get(index)
+        if widget is None:
+            widget = self.tab_registrations[index].factory(self)
+            self.tabs.widget(index).layout().addWidget(widget)
+            self.feature_tabs[index] = widget
+        return widget
+
+    def _toggle_performance_panel(self, visible):
+        # Shows or hides the dockable performance panel, creating it on first use.
+        if self.performance_panel is None:
+            if not visible:
+                return
+            self.performance_panel = PerformancePanel(self.tracer, self)
+            self.performance_panel.visibilityChanged.connect(self.performance_panel_action.setChecked)
+            self.addDockWidget(Qt.RightDockWidgetArea, self.performance_panel)
+        self.performance_panel.setVisible(visible)
 
     def _create_chat_history_area(self):
-        # Creates the chat history display area.
-        self.chat_history_widget = QWidget()
-        chat_layout = QVBoxLayout(self.chat_history_widget)
-        
-        self.chat_history_display_label = QLabel(tr("chat_history_label"))
-        chat_layout.addWidget(self.chat_history_display_label)
-        
-        self.chat_history_display = QTextEdit(self)
-        self.chat_history_display.setReadOnly(True)
-        chat_layout.addWidget(self.chat_history_display)
+        # Creates the chat history area as a virtualized view over the interaction store.
+        self.chat_history_widget = ChatHistoryView(self.interaction_store, self)
+        self.interaction_writer.interaction_added.connect(self.chat_history_widget.add_interaction) # Queued
 
     def _load_api_key_and_model(self):
         # Loads API key and selected model from settings.
         self.api_key = self.settings.value("api_key", "")
         self.current_model_name = self.settings.value("gemini_model", DEFAULT_MODEL)
+        self.stream_responses = self.settings.value("stream_responses", True, type=bool)
+        self.async_engine_enabled = self.settings.value("async_engine_enabled", False, type=bool)
+        self.response_cache_enabled = self.settings.value("response_cache_enabled", True, type=bool)
+        self.docs_retrieval_enabled = self.settings.value("docs_retrieval_enabled", True, type=bool)
+        self.docs_top_k = self.settings.value("docs_top_k", DEFAULT_DOCS_TOP_K, type=int)
+        self.docs_token_budget = self.settings.value("docs_token_budget", DEFAULT_DOCS_TOKEN_BUDGET, type=int)
+        self.attach_max_bytes = self.settings.value("attach_max_size_mb", DEFAULT_ATTACH_MAX_SIZE_MB, type=int) * 1024 * 1024
+        self.job_scheduler.set_max_in_flight(
+            self.settings.value("max_concurrent_requests", DEFAULT_MAX_CONCURRENT_REQUESTS, type=int)
+        )
+        set_rate_limit_overrides(
+            self.settings.value("rate_limit_rpm", 0, type=int), self.settings.value("rate_limit_tpm", 0, type=int)
+        )
+        set_request_timeout_override(self.settings.value("request_timeout_seconds", 0, type=int))
+        set_hedging_options(
+            self.settings.value("hedging_enabled", False, type=bool),
+            self.settings.value("hedge_backup_model", DEFAULT_HEDGE_BACKUP_MODEL),
+            self.settings.value("hedge_percentile", DEFAULT_HEDGE_PERCENTILE, type=int)
+        )
+        self.max_input_tokens = self.settings.value("max_input_tokens", 0, type=int)
+        self.oversize_strategy = self.settings.value("oversize_strategy", DEFAULT_OVERSIZE_STRATEGY)
+        self.exact_token_count = self.settings.value("exact_token_count", False, type=bool)
+        context_cache.configure(
+            self.settings.value("context_cache_enabled", True, type=bool),
+            self.settings.value("context_cache_ttl_minutes", DEFAULT_CONTEXT_CACHE_TTL_MINUTES, type=int)
+        )
+        self.tracer.set_export_path(
+            self.traces_file if self.settings.value("trace_export_enabled", True, type=bool) else None
+        )
+        self.schedule_token_count_update()
+        # Opens the connection now so the first request doesn't pay for the handshake
+        model_pool.warm_up_in_background(self.api_key, resolve_model_name(self.current_model_name))
         if not self.api_key:
             self.statusBar().showMessage(tr("status_api_key_missing"))
         elif not self.current_model_name:
@@ -280,135 +390,285 @@ class MainWindow(QMainWindow):
             self._read_docs_folder(silent=True)
 
     def _read_docs_folder(self, silent=False):
-        # Reads documentation files to provide context to Gemini.
-        self.docs_content_cache = ""
-        doc_files_content = []
-        if os.path.exists(self.docs_dir) and os.path.isdir(self.docs_dir):
-            for filename in os.listdir(self.docs_dir):
-                if filename.endswith((".txt", ".md")):
-                    try:
-                        with open(os.path.join(self.docs_dir, filename), 'r', encoding='utf-8') as f:
-                            doc_files_content.append(f.read())
-                    except Exception as e:
-                        print(f"Error reading doc file '{filename}': {e}")
-            if doc_files_content:
-                self.docs_content_cache = "\\n\\n---\\n\\n".join(doc_files_content)
-                if not silent:
-                    self.statusBar().showMessage(tr("docs_loaded_info", len(doc_files_content)), 5000)
-                return
-        if not silent:
-            if not os.path.exists(self.docs_dir):
-                QMessageBox.information(self, tr("docs_not_found_info"), tr("docs_created_info"))
-                self.statusBar().showMessage(tr("docs_created_info"), 5000)
-            elif not doc_files_content:
+        # Refreshes the documentation context incrementally in the background (docs/ and subfolders).
+        self._docs_refresh_silent = silent
+        self.docs_loader.refresh()
+
+    def _on_docs_updated(self, changed_count, total_count):
+        # Picks up the refreshed docs context once a background scan has finished.
+        self.docs_content_cache = self.docs_loader.docs_text()
+        if changed_count:
+            context_cache.invalidate() # Cached docs prefixes now hold outdated docs
+        self.schedule_token_count_update() # The docs context counts against the prompt budget
+        if not self._docs_refresh_silent:
+            self._docs_refresh_silent = True # Later refreshes come from the file watcher
+            if total_count:
+                self.statusBar().showMessage(tr("docs_loaded_info", total_count), 5000)
+            else:
                 QMessageBox.information(self, tr("docs_not_found_info"), tr("docs_not_found_info"))
                 self.statusBar().showMessage(tr("docs_not_found_info"), 5000)
+        elif changed_count:
+            self.statusBar().showMessage(tr("docs_updated_info", changed_count), 5000)
+
+    def _sends_all_docs(self):
+        # Every doc goes with every prompt when retrieval is off, or when the docs are (or are about to be)
+        # cached on the server: a cached prefix is the same for all prompts, so it is uploaded only once.
+        # After a failed upload, retrieval takes over again until the cache may be retried.
+        return (not self.docs_retrieval_enabled or not self.docs_loader.has_index()
+                or context_cache.will_cache(self.api_key, resolve_model_name(self.current_model_name),
+                                            self.docs_content_cache))
+
+    def _select_docs_context(self, prompt_text):
+        # Picks the docs context sent with a prompt: the most relevant chunks, or everything.
+        if not self.docs_content_cache:
+            return ""
+        if self._sends_all_docs():
+            return self.docs_content_cache
+        return self.docs_loader.select_context(prompt_text, self.docs_top_k, self.docs_token_budget)
+
+    def prompt_token_budget(self):
+        # Tokens left for a tab's prompt once the docs context that will be attached is accounted for.
+        limit = input_token_limit(resolve_model_name(self.current_model_name), self.max_input_tokens)
+        if not self.docs_content_cache:
+            docs_tokens = 0
+        elif self._sends_all_docs():
+            docs_tokens = estimate_tokens(self.docs_content_cache)
+        else:
+            docs_tokens = min(self.docs_token_budget, estimate_tokens(self.docs_content_cache))
+        return max(0, limit - docs_tokens)
+
+    def schedule_token_count_update(self, *_):
+
+        self.token_count_timer.start()
+
+    def _update_token_count(self):
+        # Shows the estimated token count of the current tab's input against the prompt budget.
+        tab = self.feature_tab()
+        text = tab.input_text() if isinstance(tab, BaseFeatureTab) else ""
+        self._show_token_count(estimate_tokens(text), exact=False)
+        if self.exact_token_count and self.api_key and text:
+            self.exact_token_counter.request(text, self.api_key, resolve_model_name(self.current_model_name))
 
-    def start_gemini_task(self, prompt_text, result_display_widget, tab_name_for_log=""):
-        # Starts a new Gemini API task in a separate thread.
-        if self.thread and self.thread.isRunning():
-            QMessageBox.information(self, tr("status_loading"), tr("task_already_running"))
-            return
+    def _on_exact_token_count(self, request_id, token_count):
 
+        self._show_token_count(token_count, exact=True)
+
+    def _show_token_count(self, token_count, exact):
+
+        budget = self.prompt_token_budget()
+        key = "status_token_count_exact" if exact else "status_token_count"
+        self.token_count_label.setText(tr(key, tokens=f"{token_count:,}", budget=f"{budget:,}"))
+        self.token_count_label.setStyleSheet("color: red;" if token_count > budget else "")
+
+    def start_gemini_task(self, prompt_text, result_display_widget, tab_name_for_log="", priority=PRIORITY_NORMAL,
+                          bypass_cache=False):
+        # Queues a Gemini API task on the job scheduler; results are routed to the calling tab's display.
+        # Identical requests are answered from the response cache unless bypass_cache is set (Regenerate).
         if not self.api_key:
             QMessageBox.warning(self, tr("error_title"), tr("status_api_key_missing"))
             result_display_widget.setHtml(f"<p style='color:red;'>{tr('status_api_key_missing')}</p>")
             self.statusBar().showMessage(tr("status_api_key_missing"))
-            return
+            return None
         if not self.current_model_name:
             QMessageBox.warning(self, tr("error_title"), tr("status_model_not_selected"))
             result_display_widget.setHtml(f"<p style='color:red;'>{tr('status_model_not_selected')}</p>")
             self.statusBar().showMessage(tr("status_model_not_selected"))
-            return
+            return None
+
+        trace = self.tracer.start_trace(tab_name_for_log, resolve_model_name(self.current_model_name))
+        job_state = {"started": False, "started_at": None, "usage": (None, None), "trace": trace}
+        docs_context, cache_key = self._prepare_request(prompt_text, trace)
+        with span(trace, "cache_lookup"):
+            cached_result = self._cached_response(cache_key, bypass_cache)
+        if cached_result is not None:
+            trace.set(cached=True)
+            self._on_gemini_finished(cached_result, result_display_widget, prompt_text, tab_name_for_log,
+                                     job_state=job_state)
+            self._show_cache_hit_status()
+            return None
+
+        worker = self._create_worker(prompt_text, docs_context, self.stream_responses, trace)
+        job_state["queued_at"] = time.perf_counter()
+        job_id = self.job_scheduler.submit(
+            result_display_widget, worker, priority=priority,
+            on_started=lambda _job_id: self._on_gemini_started(result_display_widget, job_state),
+            on_chunk=lambda chunk_text: self._on_gemini_chunk(chunk_text, result_display_widget, job_state),
+            on_usage=lambda usage: job_state.update(usage=usage),
+            on_finished=lambda result: self._on_gemini_finished(
+                result, result_display_widget, prompt_text, tab_name_for_log,
+                self._answer_cache_key(cache_key, worker, prompt_text, docs_context), job_state
+            ),
+            on_error=lambda error_msg: self._on_gemini_error(
+                error_msg, result_display_widget, tab_name_for_log, job_state
+            ),
+            on_cancelled=lambda _job_id: self.tracer.finish(trace, status="cancelled")
+        )
+        if job_id is not None and self.job_scheduler.is_queued(job_id):
+            result_display_widget.setHtml(f"<p><i>{tr('status_queued')}</i></p>")
+        return job_id
+
+    def submit_gemini_job(self, prompt_text, group, on_finished, on_error, priority=PRIORITY_NORMAL,
+                          serial=False, bypass_cache=False):
+        # Runs a prompt without a result display (e.g. map steps of a chunked summary).
+        # Callbacks receive the response text or error message; cache hits are delivered asynchronously too.
+        # The response is cached after on_finished has handled it, unless on_finished returns False.
+        if not self.api_key:
+            QTimer.singleShot(0, lambda: on_error(tr("status_api_key_missing")))
+            return None
+        docs_context, cache_key = self._prepare_request(prompt_text)
+        cached_result = self._cached_response(cache_key, bypass_cache)
+        if cached_result is not None:
+            QTimer.singleShot(0, lambda: on_finished(cached_result))
+            return None
+
+        def on_job_finished(result):
+            if on_finished(result) is not False and cache_key:
+                self.response_cache.put(
+                    self._answer_cache_key(cache_key, worker, prompt_text, docs_context), result, worker.answered_by
+                )
+
+        worker = self._create_worker(prompt_text, docs_context, stream=False)
+        return self.job_scheduler.submit(
+            group, worker, priority=priority, serial=serial, on_finished=on_job_finished, on_error=on_error
+        )
+
+    def _create_worker(self, prompt_text, docs_context, stream, trace=None):
+        # Creates the worker for one request: a GeminiWorker on its own thread, or a worker on the asyncio engine.
+        if not self.async_engine_enabled:
+            return GeminiWorker(self.api_key, self.current_model_name, prompt_text, docs_context, stream=stream,
+                                trace=trace)
+        from core.async_engine import AsyncGeminiWorker, async_engine # asyncio is slow to import; load it on use
+        self.async_engine = async_engine
+        return AsyncGeminiWorker(self.api_key, self.current_model_name, prompt_text, docs_context, stream=stream,
+                                 trace=trace, engine=async_engine)
+
+    def _prepare_request(self, prompt_text, trace=None):
+        # Returns the docs context for a prompt and its response cache key (None if caching is off).
+        with span(trace, "docs_context"):
+            docs_context = self._select_docs_context(prompt_text)
+        if not self.response_cache_enabled:
+            return docs_context, None
+        with span(trace, "cache_key"):
+            cache_key = self._response_cache_key(resolve_model_name(self.current_model_name), prompt_text, docs_context)
+        return docs_context, cache_key
+
+    def _response_cache_key(self, model_name, prompt_text, docs_context):
+
+        return ResponseCache.make_key(
+            model_name, build_full_prompt(prompt_text, docs_context), docs_context, GENERATION_CONFIG
+        )
+
+    def _answer_cache_key(self, cache_key, worker, prompt_text, docs_context):
+        # Key to cache a worker's answer under. After the backup model won a hedge it is that model's key,
+        # so the answer is never served later as the selected model's.
+        if cache_key is None or worker.answered_by == worker.model_name:
+            return cache_key
+        return self._response_cache_key(worker.answered_by, prompt_text, docs_context)
+
+    def _cached_response(self, cache_key, bypass_cache=False):
+
+        if cache_key is None or bypass_cache:
+            return None
+        return self.response_cache.get(cache_key)
 
+    def _show_cache_hit_status(self):
+
+        stats = self.response_cache.stats()
+        self.statusBar().showMessage(tr("status_cache_hit", hits=stats["hits"], misses=stats["misses"]), 3000)
+
+    def cancel_gemini_tasks(self, result_display_widget):
+        # Cancels queued and running tasks routed to the given result display.
+        return self.job_scheduler.cancel_group(result_display_widget)
+
+    def _on_gemini_started(self, result_display_widget, job_state):
+        # Shows the loading state once a queued task gets a worker slot.
+        job_state["started_at"] = time.monotonic()
+        trace = job_state.get("trace")
+        if trace is not None:
+            trace.add_span("queue_wait", job_state["queued_at"])
         self.statusBar().showMessage(tr("status_loading"))
         result_display_widget.setHtml(f"<p><i>{tr('status_loading')}</i></p>")
 
-        self.thread = QThread(self)
-        self.worker = GeminiWorker(
-            self.api_key, self.current_model_name, prompt_text, self.docs_content_cache
+    def _on_job_queue_changed(self, running_count, queued_count):
+        # Reflects scheduler load in the status bar while more than one task is pending.
+        if running_count + queued_count > 1:
+            self.statusBar().showMessage(
+                tr("status_jobs_running", running=running_count, queued=queued_count)
+            )
+
+    def _on_job_retrying(self, job_id, attempt, delay):
+        # Shows that a rate-limited request is waiting to be retried automatically.
+        self.statusBar().showMessage(
+            tr("status_rate_limited_retry", attempt=attempt, max_attempts=RATE_LIMIT_MAX_RETRIES,
+               seconds=f"{delay:.1f}"),
+            int(delay * 1000) + 1000
         )
-        self.worker.moveToThread(self.thread)
 
-        self.worker.finished.connect(self.thread.quit)
-        self.worker.error.connect(self.thread.quit)
-        self.thread.finished.connect(self.worker.deleteLater) 
-        self.thread.finished.connect(self.thread.deleteLater)
+    def _on_gemini_chunk(self, chunk_text, result_display_widget, job_state):
+        # Appends a streamed chunk as plain text; the final Markdown render replaces it on finish.
+        if not job_state["started"]:
+            job_state["started"] = True
+            result_display_widget.clear()
+            self.statusBar().showMessage(tr("status_streaming"))
+        result_display_widget.moveCursor(QTextCursor.End)
+        result_display_widget.insertPlainText(chunk_text)
 
-        self.worker.finished.connect(
-            lambda result: self._on_gemini_finished(
-                result, result_display_widget, prompt_text, tab_name_for_log
-            )
-        )
-        self.worker.error.connect(
-            lambda error_msg: self._on_gemini_error(error_msg, result_display_widget)
-        )
-        
-        self.thread.started.connect(self.worker.run)
-        self.thread.start()
+    def show_gemini_result(self, result_markdown, result_display_widget, original_query, tab_name_for_log=""):
+        # Displays and logs a result assembled by a tab (e.g. from several chunk requests).
+        self._on_gemini_finished(result_markdown, result_display_widget, original_query, tab_name_for_log)
 
-    def _on_gemini_finished(self, result_markdown, result_display_widget, original_query, tab_name_for_log=""):
+    def show_gemini_error(self, error_msg, result_display_widget, tab_name_for_log=""):
+
+        self._on_gemini_error(error_msg, result_display_widget, tab_name_for_log)
+
+    def _on_gemini_finished(self, result_markdown, result_display_widget, original_query, tab_name_for_log="",
+                            cache_key=None, job_state=None):
         # Handles successful Gemini API response.
-        html_output = markdown2.markdown(result_markdown, extras=["fenced-code-blocks", "codehilite"])
-        html_output_styled = (
-            "<style>"
-            "pre { background-color: #2b2b2b; color: #f0f0f0; padding: 10px; "
-            "border-radius: 5px; overflow-x: auto; font-family: Consolas, monospace; } "
-            "code { font-family: Consolas, monospace; }"
-            "</style>"
-            f"{html_output}"
-        )
-        result_display_widget.setHtml(html_output_styled)
+        trace = job_state.get("trace") if job_state else None
+        if cache_key:
+            with span(trace, "cache_store"):
+                self.response_cache.put(cache_key, result_markdown, resolve_model_name(self.current_model_name))
+        with span(trace, "display"):
+            result_display_widget.setHtml(styled_result_html(result_markdown)) # Already rendered by the worker
         self.statusBar().showMessage(tr("status_ready"), 3000)
-        self._log_interaction(
-            f"({tab_name_for_log}) {original_query}" if tab_name_for_log else original_query,
-            result_markdown
-        )
-        self._cleanup_thread_references()
+        latency_ms, prompt_tokens, response_tokens = 0, None, None
+        if job_state and job_state["started_at"] is not None:
+            latency_ms = int((time.monotonic() - job_state["started_at"]) * 1000)
+            prompt_tokens, response_tokens = job_state["usage"]
+        with span(trace, "log_write"):
+            self._log_interaction(
+                original_query, result_markdown, tab_name_for_log,
+                latency_ms=latency_ms, prompt_tokens=prompt_tokens, response_tokens=response_tokens
+            )
+        if trace is not None:
+            self.tracer.finish(trace, prompt_tokens=prompt_tokens, response_tokens=response_tokens)
 
-    def _on_gemini_error(self, error_msg, result_display_widget):
+    def _on_gemini_error(self, error_msg, result_display_widget, tab_name_for_log="", job_state=None):
         # Handles errors from Gemini API task.
         safe_error_msg = error_msg.replace('<', '<').replace('>', '>')
         error_html = f"<p style='color:red;'><b>{tr('error_title')}:</b> {safe_error_msg}</p>"
         result_display_widget.setHtml(error_html)
         self.statusBar().showMessage(tr("status_error"), 5000)
-        self._log_interaction("API Error", error_msg)
-        self._cleanup_thread_references()
-
-    def _cleanup_thread_references(self):
-        # Clears references to finished thread and worker.
-        self.thread = None
-        self.worker = None
+        self._log_interaction("API Error", error_msg, tab_name_for_log, is_error=True)
+        if job_state and job_state.get("trace") is not None:
+            self.tracer.finish(job_state["trace"], status="error", error=error_msg)
 
-    def _log_interaction(self, query, response_markdown):
-        # Logs user query and Gemini response to a file and the UI chat history.
+    def _log_interaction(self, query, response_markdown, tab_name="", is_error=False,
+                         latency_ms=None, prompt_tokens=None, response_tokens=None):
+        # Logs user query and Gemini response to the text log and the interaction store.
         timestamp = datetime.datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        logged_query = f"({tab_name}) {query}" if tab_name else query
         log_entry = (
-            f"--- {timestamp} ---\\n"
-            f"User ({translation_current_language}):\\n{query}\\n\\n"
-            f"Gemini ({self.current_model_name}):\\n{response_markdown}\\n\\n"
+            f"--- {timestamp} ---\n"
+            f"User ({translation_current_language}):\n{logged_query}\n\n"
+            f"Gemini ({self.current_model_name}):\n{response_markdown}\n\n"
         )
-        try:
-            with open(self.chat_history_file, 'a', encoding='utf-8') as f:
-                f.write(log_entry)
-        except Exception as e:
-            print(f"Error writing to log file: {e}")
-            self.statusBar().showMessage(tr("log_error"), 3000)
-        
-        query_html = query.replace('<', '<').replace('>', '>').replace('\\n', '<br>')
-        response_html_for_chat = markdown2.markdown(response_markdown, extras=["fenced-code-blocks"])
-        
-        html_entry = (
-            f'<p style="color: #aaa;"><b>--- {timestamp} ---</b></p>'
-            f"<p><b>{tr('user_label_chat')}:</b></p>"
-            f'<div style="background-color: #2A2A2A; padding: 8px; border-radius: 4px; margin-bottom: 5px; word-wrap: break-word;">{query_html}</div>'
-            f"<p><b>Gemini ({self.current_model_name}):</b></p>"
-            f'<div style="background-color: #2A2A2A; padding: 8px; border-radius: 4px; margin-bottom: 10px; word-wrap: break-word;">{response_html_for_chat}</div>'
-            f'<hr style="border-color: #444;">'
+        self.log_writer.write(log_entry) # Written in batches by the log writer thread
+        self.interaction_writer.add( # Stored by the interaction writer thread, which then adds it to the history
+            timestamp, query, response_markdown, tab=tab_name, model=self.current_model_name,
+            language=translation_current_language, is_error=is_error, latency_ms=latency_ms,
+            prompt_tokens=prompt_tokens, response_tokens=response_tokens
         )
-        self.chat_history_display.moveCursor(QTextCursor.End)
-        self.chat_history_display.insertHtml(html_entry)
-        self.chat_history_display.moveCursor(QTextCursor.End)
 
     def closeEvent(self, event):
         # Handles the main window close event, ensuring threads are stopped.
@@ -420,12 +680,23 @@ class MainWindow(QMainWindow):
             QMessageBox.No
         )
         if reply == QMessageBox.Yes:
-            if self.worker:
-                self.worker.stop()
-            if self.thread and self.thread.isRunning():
-                self.thread.quit()
-                if not self.thread.wait(2000):
-                    print("Warning: Gemini Worker thread did not terminate gracefully.")
+            if not self.job_scheduler.shutdown(2000):
+                print("Warning: Gemini Worker thread did not terminate gracefully.")
+            if self.async_engine is not None and not self.async_engine.shutdown(2.0):
+                print("Warning: Async request engine did not terminate gracefully.")
+            if not self.docs_loader.stop(2000):
+                print("Warning: Docs scan thread did not terminate gracefully.")
+            if not all(tab.stop_attach_loaders(2000) for tab in self.feature_tabs.values()):
+                print("Warning: File attach thread did not terminate gracefully.")
+            if not self.log_writer.close(2.0):
+                print("Warning: Log writer thread did not terminate gracefully.")
+            if not self.interaction_writer.close(2.0):
+                print("Warning: Interaction writer thread did not terminate gracefully.")
+            if not self.tracer.close(2.0):
+                print("Warning: Trace export thread did not terminate gracefully.")
+            if not context_cache.close(2.0):
+                print("Warning: Cached docs context was not deleted in time; it expires on its own.")
+            self.interaction_store.close()
             event.accept()
         else:
             event.ignore()
\ No newline at end of file
@@ -0,0 +1,165 @@
+from PyQt5.QtWidgets import (QDockWidget, QWidget, QVBoxLayout, QLabel, QTableWidget, QTableWidgetItem,
+                             QAbstractItemView, QHeaderView, QScrollArea, QSplitter)
+from PyQt5.QtGui import QPainter, QColor, QPalette
+from PyQt5.QtCore import Qt, QRectF
+from core.translation import tr
+from core.tracing import TRACE_TOTAL
+
+RECENT_COLUMN_KEYS = ["perf_col_time", "perf_col_tab", "perf_col_model", "perf_col_status", "perf_col_total_ms",
+                      "perf_col_prompt_tokens", "perf_col_response_tokens"]
+PERCENTILE_COLUMN_KEYS = ["perf_col_stage", "perf_col_count", "perf_col_p50", "perf_col_p95"]
+SPAN_COLORS = ["#4e79a7", "#f28e2b", "#59a14f", "#e15759", "#76b7b2", "#edc948", "#b07aa1", "#ff9da7", "#9c755f"]
+
+class TimelineView(QWidget):
+    # Draws one trace's spans as bars on a shared time axis, one row per span.
+
+    ROW_HEIGHT = 20
+    LABEL_WIDTH = 130
+    VALUE_WIDTH = 70
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._trace = None
+        self._span_colors = {}
+
+    def set_trace(self, trace):
+
+        self._trace = trace
+        self.setMinimumHeight(self.ROW_HEIGHT * (len(trace.spans) if trace else 0) + 4)
+        self.update()
+
+    def paintEvent(self, event):
+
+        if self._trace is None or not self._trace.spans:
+            return
+        painter = QPainter(self)
+        painter.setPen(self.palette().color(QPalette.WindowText))
+        total_ms = self._trace.stage_totals().get(TRACE_TOTAL) or max(
+            start_ms + duration_ms for _, start_ms, duration_ms in self._trace.spans
+        )
+        total_ms = max(total_ms, 1.0)
+        bar_area = max(10, self.width() - self.LABEL_WIDTH - self.VALUE_WIDTH)
+        for row, (name, start_ms, duration_ms) in enumerate(self._trace.spans):
+            top = row * self.ROW_HEIGHT
+            painter.drawText(QRectF(4, top, self.LABEL_WIDTH - 8, self.ROW_HEIGHT), Qt.AlignVCenter, name)
+            left = self.LABEL_WIDTH + start_ms / total_ms * bar_area
+            width = max(2.0, duration_ms / total_ms * bar_area)
+            color = self._span_colors.setdefault(name, QColor(SPAN_COLORS[len(self._span_colors) % len(SPAN_COLORS)]))
+            painter.fillRect(QRectF(left, top + 4, width, self.ROW_HEIGHT - 8), color)
+            painter.drawText(QRectF(left + width + 4, top, self.VALUE_WIDTH, self.ROW_HEIGHT), Qt.AlignVCenter,
+                             f"{duration_ms:.0f} ms")
+
+class PerformancePanel(QDockWidget):
+    # Dockable view of recent request traces: list, selected request's timeline and rolling percentiles.
+
+    def __init__(self, tracer, parent=None):
+        super().__init__(parent)
+        self.tracer = tracer
+        self._traces = [] # Newest first, parallel to the rows of recent_table
+        self.setObjectName("performance_panel")
+
+        content = QWidget(self)
+        layout = QVBoxLayout(content)
+        splitter = QSplitter(Qt.Vertical)
+        layout.addWidget(splitter)
+
+        recent_box = QWidget()
+        recent_layout = QVBoxLayout(recent_box)
+        recent_layout.setContentsMargins(0, 0, 0, 0)
+        self.recent_label = QLabel()
+        self.recent_table = self._create_table(len(RECENT_COLUMN_KEYS))
+        self.recent_table.itemSelectionChanged.connect(self._show_selected_timeline)
+        recent_layout.addWidget(self.recent_label)
+        recent_layout.addWidget(self.recent_table)
+        splitter.addWidget(recent_box)
+
+        timeline_box = QWidget()
+        timeline_layout = QVBoxLayout(timeline_box)
+        timeline_layout.setContentsMargins(0, 0, 0, 0)
+        self.timeline_label = QLabel()
+        self.timeline_view = TimelineView()
+        timeline_scroll = QScrollArea()
+        timeline_scroll.setWidgetResizable(True)
+        timeline_scroll.setWidget(self.timeline_view)
+        timeline_layout.addWidget(self.timeline_label)
+        timeline_layout.addWidget(timeline_scroll)
+        splitter.addWidget(timeline_box)
+
+        percentiles_box = QWidget()
+        percentiles_layout = QVBoxLayout(percentiles_box)
+        percentiles_layout.setContentsMargins(0, 0, 0, 0)
+        self.percentiles_label = QLabel()
+        self.percentile_table = self._create_table(len(PERCENTILE_COLUMN_KEYS))
+        percentiles_layout.addWidget(self.percentiles_label)
+        percentiles_layout.addWidget(self.percentile_table)
+        splitter.addWidget(percentiles_box)
+
+        self.setWidget(content)
+        self.retranslate_ui()
+        for trace in tracer.recent(): # Requests finished before the panel was opened
+            self._add_trace(trace)
+        self._update_percentiles()
+        tracer.trace_finished.connect(self._on_trace_finished)
+
+    def _create_table(self, column_count):
+
+        table = QTableWidget(0, column_count)
+        table.setEditTriggers(QAbstractItemView.NoEditTriggers)
+        table.setSelectionBehavior(QAbstractItemView.SelectRows)
+        table.setSelectionMode(QAbstractItemView.SingleSelection)
+        table.verticalHeader().setVisible(False)
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.ResizeToContents)
+        table.horizontalHeader().setStretchLastSection(True)
+        return table
+
+    def retranslate_ui(self):
+
+        self.setWindowTitle(tr("performance_panel_title"))
+        self.recent_label.setText(tr("perf_recent_label"))
+        self.timeline_label.setText(tr("perf_timeline_label"))
+        self.percentiles_label.setText(tr("perf_percentiles_label", count=len(self.tracer.recent())))
+        self.recent_table.setHorizontalHeaderLabels([tr(key) for key in RECENT_COLUMN_KEYS])
+        self.percentile_table.setHorizontalHeaderLabels([tr(key) for key in PERCENTILE_COLUMN_KEYS])
+
+    def _on_trace_finished(self, trace):
+
+        self._add_trace(trace)
+        self._update_percentiles()
+
+    def _add_trace(self, trace):
+
+        attributes = trace.attributes
+        values = [
+            trace.timestamp, trace.tab, trace.model, attributes.get("status", ""),
+            f"{trace.stage_totals().get(TRACE_TOTAL, 0):.0f}",
+            attributes.get("prompt_tokens"), attributes.get("response_tokens")
+        ]
+        self.recent_table.insertRow(0)
+        for column, value in enumerate(values):
+            self.recent_table.setItem(0, column, QTableWidgetItem("" if value is None else str(value)))
+        self._traces.insert(0, trace)
+        max_rows = self.tracer.max_recent
+        while len(self._traces) > max_rows:
+            self._traces.pop()
+            self.recent_table.removeRow(self.recent_table.rowCount() - 1)
+        if self.recent_table.currentRow() < 0:
+            self.timeline_view.set_trace(trace) # Follow the newest request until one is selected
+
+    def _show_selected_timeline(self):
+
+        row = self.recent_table.currentRow()
+        if 0 <= row < len(self._traces):
+            self.timeline_view.set_trace(self._traces[row])
+
+    def _update_percentiles(self):
+
+        percentiles = self.tracer.percentiles()
+        stages = sorted(name for name in percentiles if name != TRACE_TOTAL)
+        if TRACE_TOTAL in percentiles:
+            stages.append(TRACE_TOTAL)
+        self.percentile_table.setRowCount(len(stages))
+        for row, name in enumerate(stages):
+            stats = percentiles[name]
+            for column, value in enumerate([name, stats["count"], f"{stats[50]:.1f}", f"{stats[95]:.1f}"]):
+                self.percentile_table.setItem(row, column, QTableWidgetItem(str(value)))
+        self.percentiles_label.setText(tr("perf_percentiles_label", count=len(self.tracer.recent())))
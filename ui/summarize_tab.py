@@ -1,18 +1,24 @@
-from PyQt5.QtWidgets import QPushButton, QLabel, QPlainTextEdit, QHBoxLayout, QFileDialog, QMessageBox
+from PyQt5.QtWidgets import QPushButton, QLabel, QPlainTextEdit, QHBoxLayout, QMessageBox
 from PyQt5.QtGui import QFont
 from ui.base_tab import BaseFeatureTab
 from core.translation import tr
+from core.prompts import build_summarize_prompt, build_summarize_chunk_prompt, build_summarize_reduce_prompt
+from core.code_chunker import split_source
+from core.constants import SUMMARY_CHUNK_THRESHOLD_CHARS, SUMMARY_CHUNK_MAX_CHARS
 
 class SummarizeCodeTab(BaseFeatureTab):
 
     def _init_specific_ui_elements(self):
 
         self.attach_button = QPushButton()
+        self.attach_folder_button = QPushButton()
         self.source_code_label_widget = QLabel()
         self.input_code = QPlainTextEdit()
+        self.token_input_widget = self.input_code
         self.summarize_button = QPushButton()
 
         self.attach_button._translatable_key = "attach_file_btn"
+        self.attach_folder_button._translatable_key = "attach_folder_btn"
         self.summarize_button._translatable_key = "summarize_btn"
         self.source_code_label_widget._translatable_key = "source_code_label"
         self.input_code._translatable_placeholder_key = "code_input_placeholder"
@@ -26,6 +32,7 @@ class SummarizeCodeTab(BaseFeatureTab):
 
         hbox_attach = QHBoxLayout()
         hbox_attach.addWidget(self.attach_button)
+        hbox_attach.addWidget(self.attach_folder_button)
         hbox_attach.addStretch(1)
         self.layout.addLayout(hbox_attach)
 
@@ -36,11 +43,13 @@ class SummarizeCodeTab(BaseFeatureTab):
     def _connect_signals(self):
 
         self.attach_button.clicked.connect(self._attach_file)
+        self.attach_folder_button.clicked.connect(self._attach_folder)
         self.summarize_button.clicked.connect(self._summarize_code)
 
     def _retranslate_specific_ui(self):
 
         self.attach_button.setText(tr(self.attach_button._translatable_key))
+        self.attach_folder_button.setText(tr(self.attach_folder_button._translatable_key))
         self.source_code_label_widget.setText(tr(self.source_code_label_widget._translatable_key))
         self.input_code.setPlaceholderText(tr(self.input_code._translatable_placeholder_key))
         self.summarize_button.setText(tr(self.summarize_button._translatable_key))
@@ -50,21 +59,6 @@ class SummarizeCodeTab(BaseFeatureTab):
         super().retranslate_ui()
         self._retranslate_specific_ui()
 
-    def _attach_file(self):
-
-        options = QFileDialog.Options()
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, tr("attach_file_btn"), "",
-            "Python Files (*.py);;Text Files (*.txt);;All Files (*)",
-            options=options
-        )
-        if file_path:
-            try:
-                with open(file_path, 'r', encoding='utf-8') as f:
-                    self.input_code.setPlainText(f.read())
-            except Exception as e:
-                QMessageBox.critical(self, tr("error_title"), tr("file_not_found_err", str(e)))
-
     def _summarize_code(self):
 
         code = self.input_code.toPlainText().strip()
@@ -72,16 +66,14 @@ class SummarizeCodeTab(BaseFeatureTab):
             QMessageBox.warning(self, tr("error_title"), tr("empty_input_err"))
             return
 
-        prompt = (
-            "You are an expert programming assistant. Your task is to summarize the "
-            "following code. The summary should focus on the main functionality, its "
-            "most important parts, and how it works in general. The response should "
-            "be in Markdown format. Do not include the original code in your response, "
-            "only the summary.\n\n"
-            "Code:\n```\n"
-            f"{code}\n"
-            "```\n\n"
-            "Summary (Markdown):"
+        if len(code) > SUMMARY_CHUNK_THRESHOLD_CHARS: # Parallel map-reduce is faster even when one request would fit
+            chunks = split_source(code, SUMMARY_CHUNK_MAX_CHARS)
+            if len(chunks) > 1:
+                self.start_chunked_task(
+                    chunks, build_summarize_chunk_prompt, tr("summarize_tab"), build_summarize_reduce_prompt
+                )
+                return
+        self.send_prompt(
+            code, build_summarize_prompt, tr("summarize_tab"),
+            build_summarize_chunk_prompt, build_summarize_reduce_prompt
         )
-        self.store_last_prompt(prompt, tr("summarize_tab"))
-        self.main_window.start_gemini_task(prompt, self.result_display, tr("summarize_tab"))
@@ -0,0 +1,27 @@
+import importlib
+from collections import namedtuple
+
+TabRegistration = namedtuple("TabRegistration", ["title_key", "factory"]) # factory(main_window) -> tab widget
+
+_registrations = []
+
+def register_tab(title_key, factory):
+    # Adds a tab to every MainWindow created afterwards, after the ones already registered.
+    # The factory only runs when the tab is first shown, so registering a tool costs nothing at launch.
+    _registrations.append(TabRegistration(title_key, factory))
+
+def registered_tabs():
+
+    return list(_registrations)
+
+def lazy_tab_class(module_name, class_name):
+    # Factory that imports the tab's module on first use and builds the tab.
+    def factory(main_window):
+        return getattr(importlib.import_module(module_name), class_name)(main_window)
+    return factory
+
+register_tab("summarize_tab", lazy_tab_class("ui.summarize_tab", "SummarizeCodeTab"))
+register_tab("generate_func_tab", lazy_tab_class("ui.generate_func_tab", "GenerateFunctionTab"))
+register_tab("debug_code_tab", lazy_tab_class("ui.debug_code_tab", "DebugCodeTab"))
+register_tab("convert_lib_tab", lazy_tab_class("ui.convert_lib_tab", "ConvertLibraryTab"))
+register_tab("translate_code_tab", lazy_tab_class("ui.translate_code_tab", "TranslateCodeTab"))